@@ -0,0 +1,185 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the run analytics of temperature logs in Python.
+ A log (tab-separated time/set/control/periphery text or binary_log format) is
+ loaded into NumPy arrays in one call and segmented into steps at every set
+ point change. Per step, with direction d = sign(set - start temperature):
+
+	ramp_rate  - control slope between 10% and 90% of the step (C/s)
+	overshoot  - largest excursion d * (control - set) beyond set point (C)
+	settle     - time until control is first within tolerance of set point (s)
+	hold_rms   - rms control error from then on (C)
+	offset     - mean control - periphery difference from then on (C)
+
+ All statistics are computed over the whole log at once with ufunc.reduceat.
+ Cycles start at every step of the highest (denaturation) set point.
+
+ Usage: python analytics.py steps|cycles|summary <logs or directories...>
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import ConfigParser
+
+import numpy
+
+def load(path):
+	"Returns (time, set, control, periphery) arrays of text or binary temperature log-file"
+
+	if path.endswith('.bin'):
+		import binary_log
+		metadata, records = binary_log.load(path)
+		return records['time'], records['set'] / 100.0, records['control'] / 100.0, records['periphery'] / 100.0
+
+	text = open(path).read()
+	first = text.split('\n', 1)[0]
+	width = len(first.split('\t'))
+
+	values = numpy.fromstring(text, sep=' ')  # tabs and newlines are white space, parsed in C
+	if width >= 4 and values.size % width == 0 and values.size // width == text.count('\n') + (not text.endswith('\n')):
+		rows = values.reshape(-1, width)
+	else:  # ragged or commented log, parse line by line
+		rows = numpy.genfromtxt(path, delimiter='\t', usecols=(0, 1, 2, 3), invalid_raise=False).reshape(-1, 4)
+		rows = rows[~numpy.isnan(rows).any(axis=1)]
+
+	return rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+
+def steps(columns, tolerance=1.0):
+	"""Returns dictionary of per-step arrays (start, set, duration, ramp_rate, overshoot, settle, hold_rms,
+	offset, cycle) of log columns; undefined values are NaN"""
+
+	t, st, ct, gt = columns
+	n = len(t)
+	if n == 0:
+		return dict([(key, numpy.zeros(0)) for key in ('start', 'set', 'duration', 'ramp_rate', 'overshoot', 'settle', 'hold_rms', 'offset', 'cycle')])
+
+	starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(st) != 0) + 1))
+	ends = numpy.append(starts[1:], n)
+	lengths = ends - starts
+	index = numpy.arange(n)
+
+	target = st[starts]
+	span = target - ct[starts]
+	direction = numpy.sign(span)
+
+	error = ct - numpy.repeat(target, lengths)
+	overshoot = numpy.maximum(numpy.maximum.reduceat(numpy.repeat(direction, lengths) * error, starts), 0)
+
+	within = numpy.abs(error) <= tolerance
+	first = numpy.minimum.reduceat(numpy.where(within, index, n), starts)
+	settled = first < ends
+	first_time = t[numpy.minimum(first, n - 1)]
+	settle = numpy.where(settled, first_time - t[starts], numpy.nan)
+
+	hold = index >= numpy.repeat(first, lengths)
+	count = numpy.add.reduceat(hold, starts).astype(float)
+	count[count == 0] = numpy.nan
+	hold_rms = numpy.sqrt(numpy.add.reduceat(numpy.where(hold, error ** 2, 0), starts) / count)
+	offset = numpy.add.reduceat(numpy.where(hold, ct - gt, 0), starts) / count
+
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		progress = (ct - numpy.repeat(ct[starts], lengths)) / numpy.repeat(span, lengths)
+		t10 = numpy.minimum.reduceat(numpy.where(progress >= 0.1, index, n), starts)
+		t90 = numpy.minimum.reduceat(numpy.where(progress >= 0.9, index, n), starts)
+		ramp = (t90 < ends) & (t10 < t90) & (numpy.abs(span) >= 2 * tolerance)
+		ramp_rate = numpy.where(ramp, 0.8 * span / (t[numpy.minimum(t90, n - 1)] - t[numpy.minimum(t10, n - 1)]), numpy.nan)
+
+	cycle = numpy.cumsum(target == target.max())  # denaturation steps open a cycle
+
+	return {'start': t[starts], 'set': target, 'duration': t[ends - 1] - t[starts], 'ramp_rate': ramp_rate,
+		'overshoot': overshoot, 'settle': settle, 'hold_rms': hold_rms, 'offset': offset, 'cycle': cycle}
+
+def cycles(step):
+	"Returns dictionary of per-cycle arrays (cycle, duration, overshoot, settle, hold_rms) of step dictionary"
+
+	numbers, first = numpy.unique(step['cycle'], return_index=True)
+	if len(numbers) == 0:
+		return {'cycle': numbers, 'duration': numbers, 'overshoot': numbers, 'settle': numbers, 'hold_rms': numbers}
+
+	ends = numpy.append(step['start'][first[1:]], step['start'][-1] + step['duration'][-1])
+	settle = numpy.nan_to_num(step['settle'])
+	return {'cycle': numbers, 'duration': ends - step['start'][first],
+		'overshoot': numpy.maximum.reduceat(step['overshoot'], first),
+		'settle': numpy.add.reduceat(settle, first),
+		'hold_rms': numpy.sqrt(numpy.add.reduceat(numpy.nan_to_num(step['hold_rms']) ** 2, first) / numpy.diff(numpy.append(first, len(settle))))}
+
+def summary(step):
+	"Returns dictionary of run totals of step dictionary: heating and cooling ramp rate means, largest overshoot, ..."
+
+	rate = step['ramp_rate']
+	return {'steps': len(step['set']), 'heating': mean(rate[rate > 0]), 'cooling': mean(rate[rate < 0]),
+		'overshoot': step['overshoot'].max() if len(rate) else numpy.nan, 'settle': mean(step['settle']),
+		'hold_rms': mean(step['hold_rms']), 'offset': mean(step['offset'])}
+
+def mean(values):
+	"Returns mean of values leaving out NaNs, NaN if there are none"
+
+	values = numpy.asarray(values)
+	values = values[~numpy.isnan(values)]
+	if len(values) == 0:
+		return numpy.nan
+	return values.mean()
+
+def find_logs(paths):
+	"Returns list of (group, log path) pairs, directories expanded to their temperature logs"
+
+	logs = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, dirs, files in sorted(os.walk(path)):
+				for name in sorted(files):
+					if name.endswith('temperature.log') or name.endswith('.bin'):
+						logs.append((path, os.path.join(root, name)))
+		else:
+			logs.append((path, path))
+	return logs
+
+if __name__ == '__main__':
+
+	if len(sys.argv) < 3 or sys.argv[1] not in ('steps', 'cycles', 'summary'):
+		print '\n--> Error: not correct input!\n--> Usage: python analytics.py steps|cycles|summary <logs or directories...>\n'
+		sys.exit()
+
+	tolerance = 1.0
+	config = ConfigParser.ConfigParser()
+	if config.read('config.txt'):
+		tolerance = float(config.get("pcr_parameters","temp_tolerance"))
+
+	mode = sys.argv[1]
+	groups = {}
+
+	if mode == 'summary':
+		print "%-50s %5s %9s %9s %9s %8s %8s %8s" % ('log', 'steps', 'heat C/s', 'cool C/s', 'overshoot', 'settle s', 'hold rms', 'offset')
+
+	for group, path in find_logs(sys.argv[2:]):
+		step = steps(load(path), tolerance)
+
+		if mode == 'steps':
+			print "\n%s\n%5s %8s %8s %10s %10s %9s %9s %9s %8s" % (path, 'cycle', 'start s', 'set C', 'duration s', 'ramp C/s', 'overshoot', 'settle s', 'hold rms', 'offset')
+			for i in range(len(step['set'])):
+				print "%5i %8.1f %8.2f %10.1f %10.3f %9.2f %9.1f %9.3f %8.2f" % (step['cycle'][i], step['start'][i] - step['start'][0], step['set'][i], step['duration'][i],
+					step['ramp_rate'][i], step['overshoot'][i], step['settle'][i], step['hold_rms'][i], step['offset'][i])
+
+		elif mode == 'cycles':
+			cycle = cycles(step)
+			print "\n%s\n%5s %10s %9s %9s %9s" % (path, 'cycle', 'duration s', 'overshoot', 'settle s', 'hold rms')
+			for i in range(len(cycle['cycle'])):
+				print "%5i %10.1f %9.2f %9.1f %9.3f" % (cycle['cycle'][i], cycle['duration'][i], cycle['overshoot'][i], cycle['settle'][i], cycle['hold_rms'][i])
+
+		else:
+			s = summary(step)
+			groups.setdefault(group, []).append(s)
+			print "%-50s %5i %9.3f %9.3f %9.2f %8.1f %8.3f %8.2f" % (path[-50:], s['steps'], s['heating'], s['cooling'], s['overshoot'], s['settle'], s['hold_rms'], s['offset'])
+
+	if mode == 'summary' and len(groups) > 1:
+		print
+		for group in sys.argv[2:]:
+			rows = groups.get(group)
+			if not rows:
+				continue
+			values = dict([(key, mean([row[key] for row in rows])) for key in ('heating', 'cooling', 'overshoot', 'settle', 'hold_rms', 'offset')])
+			print "%-50s %5i %9.3f %9.3f %9.2f %8.1f %8.3f %8.2f" % ((group + ' [mean]')[-50:], sum([row['steps'] for row in rows]), values['heating'], values['cooling'],
+				values['overshoot'], values['settle'], values['hold_rms'], values['offset'])
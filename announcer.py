@@ -0,0 +1,124 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Announcer, the
+ background speech worker playing preloaded speech/*.wav clips without blocking
+ temperature control, and class Null_announcer, its silent stand-in for headless
+ or test runs, in Python.
+-------------------------------------------------------------------------------
+"""
+
+import os
+import glob
+import time
+import shlex
+import subprocess
+import threading
+
+from collections import deque
+
+class Null_announcer:
+
+	active = False
+
+	def say(self, name):
+		"Discards announcement"
+		pass
+
+	def close(self, wait=False):
+		"Nothing to release"
+		pass
+
+class Announcer(threading.Thread):
+
+	active = True
+
+	def __init__(self, speech_dir, player, max_pending=3, max_age=10, logger=None):
+		"""Initialize speech worker: loads every WAV clip of speech directory into memory once. Clips
+		are piped into the player command, at most max_pending announcements are kept waiting and
+		the ones older than max_age (s) are dropped as stale."""
+
+		threading.Thread.__init__(self)
+		self.daemon = True  # never keep process alive on exit
+
+		self.player = shlex.split(player)
+		self.max_pending = max_pending
+		self.max_age = max_age
+		self.logging = logger
+
+		self.clips = {}  # clip name -> WAV file content
+		for path in glob.glob(os.path.join(speech_dir, '*.wav')):
+			f = open(path, 'rb')
+			self.clips[os.path.splitext(os.path.basename(path))[0]] = f.read()
+			f.close()
+
+		self.pending = deque()  # (clip name, time stamp) announcements waiting to be played
+		self.condition = threading.Condition()
+		self.closed = False
+		self.dropped = 0  # number of stale or missing announcements discarded
+
+	def say(self, name):
+		"""Queues announcement of clip name and returns immediately. An announcement already waiting
+		is merged, if the queue is full the oldest waiting one is dropped."""
+
+		if name not in self.clips:
+			with self.condition:
+				self.dropped += 1
+			if self.logging is not None:
+				self.logging.debug("-\t--> No speech clip: %s.wav" % name)
+			return
+
+		with self.condition:
+			if name in [n for (n, t) in self.pending]:
+				return
+
+			if len(self.pending) >= self.max_pending:
+				self.pending.popleft()
+				self.dropped += 1
+
+			self.pending.append((name, time.time()))
+			self.condition.notify()
+
+	def run(self):
+		"Worker loop: plays queued announcements one after another, skipping stale ones"
+
+		while True:
+			with self.condition:
+				while not self.pending and not self.closed:
+					self.condition.wait()
+
+				if not self.pending:
+					return
+
+				name, t = self.pending.popleft()
+
+				if time.time() - t > self.max_age:
+					self.dropped += 1
+					continue
+
+			self.play(self.clips[name])
+
+	def play(self, clip):
+		"Pipes preloaded clip into player process and waits until it is played"
+
+		try:
+			devnull = open(os.devnull, 'w')
+			player = subprocess.Popen(self.player, stdin=subprocess.PIPE, stdout=devnull, stderr=devnull)
+			player.communicate(clip)
+			devnull.close()
+		except OSError, e:
+			if self.logging is not None:
+				self.logging.warn("-\t--> Speech player failed: %s" % e)
+
+	def close(self, wait=False):
+		"Stops worker after the waiting announcements are played, or discards them unless wait is set"
+
+		with self.condition:
+			if not wait:
+				self.dropped += len(self.pending)
+				self.pending.clear()
+
+			self.closed = True
+			self.condition.notify()
+
+		if wait:
+			self.join()
@@ -0,0 +1,252 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Archive, the indexed
+ run archive in Python. Every finished run gets a directory of its own holding
+ its temperature log, its part of the process log and its configuration
+ snapshot. A SQLite index (index.db) keeps the run metadata, every configuration
+ parameter and the per-step statistics of analytics.py, so past runs are found
+ without parsing raw logs again:
+
+ runs       (id, name, start, end, duration, config_hash, protocol, cycles, status, directory, chip)
+ parameters (run, section, key, value)
+ steps      (run, step, cycle, name, start, set, duration, ramp_rate, overshoot, settle, hold_rms, offset)
+
+ Conditions select runs by run field, configuration parameter or step field of
+ a named step (outer_denaturation, denaturation, annealing, elongation,
+ final_hold), e.g.:
+
+ python archive.py find I_gain3=10 annealing.overshoot>1 cycles>=5
+ python archive.py find chip=A17
+
+ Usage: python archive.py list
+        python archive.py find <conditions...>
+        python archive.py add <temperature log> [process log]
+-------------------------------------------------------------------------------
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import sqlite3
+import hashlib
+import ConfigParser
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, name TEXT, start REAL, end REAL, duration REAL,
+	config_hash TEXT, protocol TEXT, cycles INTEGER, status TEXT, directory TEXT, chip TEXT);
+CREATE TABLE IF NOT EXISTS parameters (run INTEGER, section TEXT, key TEXT, value TEXT);
+CREATE TABLE IF NOT EXISTS steps (run INTEGER, step INTEGER, cycle INTEGER, name TEXT, start REAL, "set" REAL,
+	duration REAL, ramp_rate REAL, overshoot REAL, settle REAL, hold_rms REAL, "offset" REAL);
+CREATE INDEX IF NOT EXISTS parameter_key ON parameters (key, value);
+CREATE INDEX IF NOT EXISTS step_name ON steps (name, run);
+"""
+
+RUN_FIELDS = ['id', 'name', 'start', 'end', 'duration', 'config_hash', 'protocol', 'cycles', 'status', 'directory', 'chip']
+STEP_FIELDS = ['step', 'cycle', 'start', 'set', 'duration', 'ramp_rate', 'overshoot', 'settle', 'hold_rms', 'offset']
+STEP_NAMES = [('temp2', 'denaturation'), ('temp3', 'annealing'), ('temp4', 'elongation'), ('temp1', 'outer_denaturation'), ('temp5', 'final_hold')]  # first match names a set point of an imported log
+STEP_ALIASES = {'inner_denaturation': 'denaturation', 'inner_elongation': 'elongation'}  # protocol step clip -> step name
+CONDITION = re.compile(r'^([A-Za-z_][\w.]*)\s*(<=|>=|!=|=|<|>)\s*(.+)$')
+
+class Archive:
+
+	def __init__(self, directory):
+		"Initialize run archive in directory, creating it and its SQLite index if missing"
+
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self.directory = directory
+		self.db = sqlite3.connect(os.path.join(directory, 'index.db'))
+		self.db.executescript(SCHEMA)
+
+		columns = [row[1] for row in self.db.execute("PRAGMA table_info(runs)")]
+		if 'chip' not in columns:  # index of an earlier version
+			self.db.execute("ALTER TABLE runs ADD COLUMN chip TEXT")
+			self.db.commit()
+
+	def close(self):
+		self.db.close()
+
+#------------------------------------ Add run ------------------------------------------
+
+	def add_run(self, config, temperature_log, process_log=None, process_offset=0, start=None, end=None,
+		    cycles=None, protocol=None, status='finished', chip=None, set_points=None):
+		"""Archives run of configuration, temperature log-file and process log-file (from byte offset
+		process_offset on, where this run's records begin) on chip ID into a run directory of its own and
+		indexes its metadata, parameters and step statistics. Steps are named by the (set point, step
+		name) changes recorded during the run (Temperature_control.set_points), or by the temperature
+		parameters of the configuration if there are none. Returns run id."""
+
+		import analytics
+
+		columns = analytics.load(temperature_log)
+		tolerance = float(config.get("pcr_parameters","temp_tolerance"))
+		step = analytics.steps(columns, tolerance)
+
+		if start is None:
+			start = time.time()
+			if len(columns[0]) > 0:
+				start = float(columns[0][0])
+		if end is None:
+			end = start
+			if len(columns[0]) > 0:
+				end = float(columns[0][-1])
+		if cycles is None:
+			cycles = 0
+			if len(step['cycle']) > 0:
+				cycles = int(step['cycle'].max())
+
+		snapshot = []
+		for section in config.sections():
+			for key, value in config.items(section):
+				snapshot.append((section, key, value))
+		config_hash = hashlib.sha1(repr(sorted(snapshot))).hexdigest()
+
+		name = time.strftime('%Y%m%d-%H%M%S', time.localtime(start)) + '-' + config_hash[:8]
+		directory = os.path.join(self.directory, name)
+
+		suffix = 1
+		while os.path.exists(directory):  # same start second and configuration
+			suffix += 1
+			directory = os.path.join(self.directory, '%s-%i' % (name, suffix))
+		name = os.path.basename(directory)
+		os.makedirs(directory)
+
+		shutil.copy(temperature_log, directory)
+
+		if process_log is not None and os.path.exists(process_log):
+			source = open(process_log, 'rb')
+			source.seek(process_offset)
+			target = open(os.path.join(directory, os.path.basename(process_log)), 'wb')
+			shutil.copyfileobj(source, target)
+			source.close()
+			target.close()
+
+		f = open(os.path.join(directory, 'config.txt'), 'w')
+		config.write(f)
+		f.close()
+
+		cursor = self.db.execute("INSERT INTO runs (name, start, end, duration, config_hash, protocol, cycles, status, directory, chip) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+					 (name, start, end, end - start, config_hash, protocol, cycles, status, directory, chip))
+		run = cursor.lastrowid
+
+		self.db.executemany("INSERT INTO parameters VALUES (?, ?, ?, ?)", [(run,) + row for row in snapshot])
+
+		if set_points:
+			names = name_steps(step['set'], set_points)
+		else:
+			names = {}
+			for key, step_name in STEP_NAMES:
+				if config.has_option("pcr_parameters", key):
+					names.setdefault(float(config.get("pcr_parameters", key)), step_name)
+			names = [names.get(float(s)) for s in step['set']]
+
+		rows = []
+		for i in range(len(step['set'])):
+			values = [step[field][i] for field in STEP_FIELDS[3:]]
+			rows.append([run, i, int(step['cycle'][i]), names[i], float(step['start'][i])] +
+				    [float(v) if v == v else None for v in values])  # NaN -> NULL
+		self.db.executemany('INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+		self.db.commit()
+		return run
+
+#------------------------------------ Queries ------------------------------------------
+
+	def find(self, conditions):
+		"""Returns list of run dictionaries meeting all conditions, strings '<field><op><value>' where field
+		is a run field, '<step name>.<step field>' or a configuration parameter key"""
+
+		where, args = [], []
+		for condition in conditions:
+			match = CONDITION.match(condition)
+			if match is None:
+				raise ValueError("Not a condition: %s" % condition)
+
+			field, op, value = match.groups()
+			value = number(value)
+
+			if '.' in field:
+				name, column = field.split('.', 1)
+				if column not in STEP_FIELDS:
+					raise ValueError("Unknown step field: %s" % column)
+				where.append('EXISTS (SELECT 1 FROM steps s WHERE s.run = runs.id AND s.name = ? AND s."%s" %s ?)' % (column, op))
+				args.extend([name, value])
+			elif field in RUN_FIELDS:
+				where.append('runs.%s %s ?' % (field, op))
+				args.append(value)
+			else:
+				cast = isinstance(value, float) and '+0' or ''  # numeric comparison of parameter text
+				where.append('EXISTS (SELECT 1 FROM parameters p WHERE p.run = runs.id AND lower(p.key) = lower(?) AND p.value%s %s ?)' % (cast, op))
+				args.extend([field, value])
+
+		sql = 'SELECT %s FROM runs' % ', '.join(RUN_FIELDS)
+		if where:
+			sql += ' WHERE ' + ' AND '.join(where)
+
+		return [dict(zip(RUN_FIELDS, row)) for row in self.db.execute(sql + ' ORDER BY start', args)]
+
+	def steps(self, run):
+		"Returns list of step dictionaries of run id"
+
+		fields = ['step', 'cycle', 'name', 'start', '"set"', 'duration', 'ramp_rate', 'overshoot', 'settle', 'hold_rms', '"offset"']
+		rows = self.db.execute('SELECT %s FROM steps WHERE run = ? ORDER BY step' % ', '.join(fields), (run,))
+		return [dict(zip([f.strip('"') for f in fields], row)) for row in rows]
+
+def name_steps(sets, set_points):
+	"""Returns list of step names of logged set temperatures sets, matched in order against the recorded
+	(set point, step name) changes; a set temperature without record (e.g. before the first write) is
+	left unnamed"""
+
+	names = []
+	j = 0  # first record not matched yet
+	for s in sets:
+		k = j
+		while k < len(set_points) and abs(set_points[k][0] - s) > 0.01:  # register holds centi-degrees
+			k += 1
+
+		if k < len(set_points):
+			name = set_points[k][1]
+			names.append(STEP_ALIASES.get(name, name))
+			j = k + 1
+		else:
+			names.append(None)
+	return names
+
+def number(value):
+	"Returns value as float if it is numeric, otherwise as string"
+
+	try:
+		return float(value)
+	except ValueError:
+		return value
+
+if __name__ == '__main__':
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+	archive = Archive(config.get("communication","archive_dir"))
+
+	if len(sys.argv) >= 2 and sys.argv[1] in ('list', 'find'):
+		runs = archive.find(sys.argv[2:])
+		print "\n%-4s %-25s %-20s %7s %6s %-12s %-8s %s" % ('id', 'name', 'start', 'minutes', 'cycles', 'status', 'chip', 'protocol')
+		for run in runs:
+			print "%-4i %-25s %-20s %7.1f %6i %-12s %-8s %s" % (run['id'], run['name'], time.strftime('%m-%d-%y %H:%M:%S', time.localtime(run['start'])),
+				run['duration'] / 60, run['cycles'], run['status'], run['chip'] or '-', run['protocol'])
+		print "\nINFO\t -\t--> %i run(s)\n" % len(runs)
+
+	elif len(sys.argv) in (3, 4) and sys.argv[1] == 'add':
+		process_log = None
+		if len(sys.argv) == 4:
+			process_log = sys.argv[3]
+		run = archive.add_run(config, sys.argv[2], process_log, status='imported')
+		print "\nINFO\t -\t--> Archived run %i: %s\n" % (run, sys.argv[2])
+
+	else:
+		print '\n--> Error: not correct input!\n--> Usage: python archive.py list | find <conditions...> | add <temperature log> [process log]\n'
+
+	archive.close()
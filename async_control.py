@@ -0,0 +1,376 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Async_control, the
+ non-blocking 5R7-001 temperature controller driver in Python. It runs on the
+ cooperative event loop of cooperative.py: every method below is a task (a
+ generator) that yields instead of blocking, waiting on serial input with
+ select and on sampling deadlines with loop sleeps. Several controllers, and
+ any other device or service written as a task, share one thread:
+
+	loop = Event_loop(clock)
+	chip1 = Async_control(Temperature_control(config1, serial1, logger), loop)
+	chip2 = Async_control(Temperature_control(config2, serial2, logger), loop)
+	loop.gather(chip1.pcr_wo_trigger(), chip2.run_protocol('touchdown.txt'))
+
+ The driver wraps a Temperature_control object for its configuration, shadow
+ registers, temperature log, telemetry, announcer and checkpoint; its serial
+ port is switched to non-blocking reads and must not be shared with a sampler
+ thread. Inside a task, call a method as 'value = yield chip1.method(...)'.
+-------------------------------------------------------------------------------
+"""
+
+import sys
+import math
+
+import auxil
+import codec
+
+from protocol import Protocol
+from step_loops import Steady_state_wait, Trigger_wait, Incubation
+from cooperative import Event_loop, Return, Sleep, Readable
+from temperature_control import TEMPERATURE_REGISTERS, SHADOW_REGISTERS
+
+class Async_control:
+
+	def __init__(self, temperature_control, loop=None):
+		"""Initialize non-blocking driver of temperature controller object, run on event loop [default:
+		new loop on the controller clock]"""
+
+		tc = temperature_control
+		if tc.on_sampler():
+			raise RuntimeError("Serial port of %s is owned by its sampler thread" % tc.serial.port)
+
+		if loop is None:
+			loop = Event_loop(tc.clock)
+
+		self.temperature_control = tc
+		self.loop = loop
+		self.clock = loop.clock
+		self.serial = tc.serial
+		self.serial.timeout = 0  # read returns what has arrived, never waits
+
+		self.quit = False  # set by quit_final_hold, ends final hold of protocol
+		self.busy = False  # set while a register transfer is in progress
+
+	def __getattr__(self, name):
+		"Returns configuration parameter or state (cycle, target_temp, logging, ...) of temperature controller"
+
+		return getattr(self.temperature_control, name)
+
+#--------------------------------------------------------------------------------------#
+#				COMMUNICATION   				       #
+#--------------------------------------------------------------------------------------#
+
+#----------------------------- Read response frame -------------------------------------
+
+	def read_response(self, deadline):
+		"""Returns decimal value of the first complete and checksum-valid response frame, waiting for
+		input on the loop. Raises IOError if none arrived before deadline (monotonic time)."""
+
+		frame = ''
+		while True:
+			frame += self.serial.read(codec.RESPONSE_LENGTH - len(frame))
+
+			start = frame.find('*')  # synchronize on start-of-frame character
+			if start < 0:
+				frame = ''
+			elif start > 0:
+				frame = frame[start:]
+
+			if len(frame) == codec.RESPONSE_LENGTH:
+				try:
+					raise Return(codec.decode(frame))
+				except ValueError:
+					frame = frame[1:]  # corrupted frame, drop start character and resynchronize
+					continue
+
+			remaining = deadline - self.clock.monotonic()
+			if remaining <= 0:
+				raise IOError("No valid 5R7-001 response within %0.3f s [received: %r]" % (self.response_timeout, frame))
+
+			yield Readable(self.serial, remaining)
+
+#-------------------------- Read multiple register values ------------------------------
+
+	def read_registers(self, frames):
+		"""Sends all read command frames in one pipelined write and returns the list of raw register
+		values, matched to commands by position. Transfers of concurrent tasks of this controller are
+		serialized, so one never reads the responses of the other."""
+
+		while self.busy:
+			yield Sleep(0)
+		self.busy = True
+
+		try:
+			t0 = self.clock.monotonic()
+			deadline = t0 + self.response_timeout
+			self.serial.flushInput()  # flush input buffer
+			self.serial.write(''.join(frames))
+
+			values = []
+			for frame in frames:
+				value = yield self.read_response(deadline)
+				values.append(value)
+
+			self.temperature_control.response_time = self.clock.monotonic() - t0
+		finally:
+			self.busy = False
+
+		raise Return(values)
+
+	def read_register(self, command):
+		"Sends read command frame and returns raw register value of its response, a float"
+
+		values = yield self.read_registers([command])
+		raise Return(values[0])
+
+#------------------------------- Write register value ----------------------------------
+
+	def write_command(self, command):
+		"Sends command frame to controller, between the transfers of concurrent tasks"
+
+		while self.busy:
+			yield Sleep(0)
+
+		self.serial.flushInput()  # flush input buffer
+		self.serial.write(command)
+
+	def write_register(self, command, value):
+		"""Writes decimal value (rounded up to integer) to writable register of command, unless its
+		shadow copy shows the controller already holds it. Returns True if a write was sent."""
+
+		value = int(math.ceil(value))
+
+		if self.shadow.get(command) == value:
+			raise Return(False)
+
+		yield self.write_command(auxil.set_command(command, value))
+		self.shadow[command] = value
+		raise Return(True)
+
+	def resync_registers(self):
+		"Reloads shadow copy of every writable register from controller in one pipelined read-out"
+
+		values = yield self.read_registers([codec.read_frame(read) for (write, read) in SHADOW_REGISTERS])
+
+		shadow = self.temperature_control.shadow
+		shadow.clear()
+		for (write, read), value in zip(SHADOW_REGISTERS, values):
+			shadow[write] = int(value)
+
+		self.logging.debug("%i\t--> Resynchronized shadow registers: %s" % (self.cycle, shadow))
+
+#--------------------------------------------------------------------------------------#
+#				BASIC SETTINGS   				       #
+#--------------------------------------------------------------------------------------#
+
+	def set_control_on(self):
+		"Sets RUN flag in regulator, so main output is opened"
+
+		self.announcer.say('control_on')
+		self.publish('control_on')
+
+		yield self.write_command(auxil.set_command('2d', 1))  # set RUN flag command
+		self.logging.info("%i\t--> Set temperature control ON" % self.cycle)
+
+	def set_control_off(self):
+		"Clears RUN flag in regulator, so main output is blocked"
+
+		self.announcer.say('control_off')
+		self.publish('control_off')
+
+		yield self.write_command(auxil.set_command('2d', 0))  # clear RUN flag command
+		self.logging.info("%i\t--> Set temperature control OFF" % self.cycle)
+
+#--------------------------------------------------------------------------------------#
+#				REGULATOR SETTINGS				       #
+#--------------------------------------------------------------------------------------#
+
+	def set_temperature(self, temperature):
+		"Sets main temperature reference (C), a float"
+
+		clip = 'set_to_target'
+		for i in range(1, 7):
+			if temperature == getattr(self.temperature_control, 'temp%i' % i, None):
+				clip = 'set_to_temp%i' % i
+				break
+		self.announcer.say(clip)
+		self.publish('set_temperature', '%.2f' % temperature)
+
+		self.temperature_control.target_temp = temperature
+		self.temperature_control.record_set_point(temperature)
+
+		if (yield self.write_register('1c', temperature * 100)):
+			self.logging.info("%i\t--> Set target temperature to %.2f C" % (self.cycle, temperature))
+		else:
+			self.logging.debug("%i\t--> Target temperature already %.2f C" % (self.cycle, temperature))
+
+	def set_P_bandwidth(self, pb):
+		"Sets proportional bandwidth in PID control, a float"
+
+		if (yield self.write_register('1d', pb * 50)):
+			self.logging.info("%i\t--> Set proportional bandwidth to %.2f" % (self.cycle, pb))
+		else:
+			self.logging.debug("%i\t--> Proportional bandwidth already %.2f" % (self.cycle, pb))
+
+	def set_I_gain(self, ig):
+		"Sets integral gain in PID control, a float"
+
+		if (yield self.write_register('1e', ig * 100)):
+			self.logging.info("%i\t--> Set integral gain to %.2f" % (self.cycle, ig))
+		else:
+			self.logging.debug("%i\t--> Integral gain already %.2f" % (self.cycle, ig))
+
+	def set_D_gain(self, dg):
+		"Sets derivative gain in PID control, a float"
+
+		if (yield self.write_register('1f', dg * 100)):
+			self.logging.info("%i\t--> Set derivative gain to %.2f" % (self.cycle, dg))
+		else:
+			self.logging.debug("%i\t--> Derivative gain already %.2f" % (self.cycle, dg))
+
+#--------------------------------------------------------------------------------------#
+#				 STATUS CHECKING				       #
+#--------------------------------------------------------------------------------------#
+
+	def get_control_temperature(self):
+		"Gets control temperature sensor reading, a float"
+
+		value = yield self.read_register(codec.read_frame('01'))
+		raise Return(value/100)
+
+	def get_periphery_temperature(self):
+		"Gets periphery temperature sensor reading, a float"
+
+		value = yield self.read_register(codec.read_frame('06'))
+		raise Return(value/100)
+
+	def get_set_temperature(self):
+		"Gets set temperature value of temperature controller, a float"
+
+		value = yield self.read_register(codec.read_frame('03'))
+		raise Return(value/100)
+
+	def get_temperatures(self):
+		"Gets (time, set, control, periphery) temperature snapshot of one pipelined read-out, a tuple of floats"
+
+		st, pt, gt = yield self.read_registers(TEMPERATURE_REGISTERS)
+		sample = (self.temperature_control.clock.time(), st/100, pt/100, gt/100)
+		self.telemetry.sample(sample)  # every acquired snapshot is published once
+		raise Return(sample)
+
+#--------------------------------------------------------------------------------------#
+#				COMPLEX FUNCTIONS				       #
+#--------------------------------------------------------------------------------------#
+
+#------------------------- Steady-state temperature waiting ----------------------------
+
+	def wait_for_SS(self, channel_target, tolerance=None, window=None, max_slope=None, max_std=None, channel=False):
+		"""Waits until steady-state temperature is reached, or the time limit is exceeded, on the
+		criteria of Temperature_control.wait_for_SS (estimated channel temperature, if channel is set)."""
+
+		wait = Steady_state_wait(self, channel_target, tolerance, window, max_slope, max_std, channel)
+		schedule = self.adaptive_schedule('wait_for_SS', wait.window / 4)  # keep detector window filled
+		t0 = self.clock.monotonic()
+
+		while True:
+			sample = yield self.get_temperatures()  # get temperature snapshot
+			if wait.add(sample, self.clock.monotonic() - t0):  # log sample, check steady state and time limit
+				break
+			yield Sleep(schedule.advance(sample))  # wait for next sampling deadline
+
+		wait.finish(schedule, self.clock.monotonic() - t0)
+
+#------------------------------ Pulling trigger point ----------------------------------
+
+	def pull_trigger(self, poll_temp, tolerance=None):
+		"Returns once control temperature ramped to within tolerance (C) [default: 1] of trigger point poll_temp"
+
+		trigger = Trigger_wait(self, self.target_temp, poll_temp, tolerance)
+		schedule = self.adaptive_schedule('pull_trigger')
+		t0 = self.clock.monotonic()
+
+		while True:
+			sample = yield self.get_temperatures()  # get temperature snapshot
+			if not trigger.pending(sample[2]):  # control temperature reached or passed
+				break
+			if trigger.add(sample, self.clock.monotonic() - t0):  # log sample, check time limit
+				break
+			yield Sleep(schedule.advance(sample))  # wait for next sampling deadline
+
+		trigger.finish(schedule, self.clock.monotonic() - t0)
+
+#------------------------- Incubate and count elapsed time ----------------------------
+
+	def incubate_reagent(self, time_sec, elapsed=0):
+		"Incubates reagent for given amount of time (s), of which elapsed seconds are behind it already if resumed"
+
+		incubation = Incubation(self, time_sec, elapsed)
+		schedule = self.adaptive_schedule('incubate_reagent')
+		delta = elapsed  # elapsed time in seconds
+		t0 = self.clock.monotonic() - elapsed
+
+		while delta <= time_sec:  # incubation time loop
+			sample = yield self.get_temperatures()  # get temperature snapshot
+			yield Sleep(schedule.advance(sample))  # wait for next sampling deadline
+			delta = self.clock.monotonic() - t0
+			incubation.add(sample, delta)  # log sample, save checkpoint
+
+		schedule.report(self.cycle)
+
+#----------------------------- Hold final cooling step ---------------------------------
+
+	def quit_final_hold(self):
+		"Ends final cooling step of a running protocol"
+
+		self.quit = True
+
+	def press_q_to_exit(self):
+		"""Holds final cooling step until the operator enters 'Q' on the console, or quit_final_hold is
+		called, then turns control off"""
+
+		self.announcer.say('press_q_to_exit')
+		sys.stdout.write("PROMPT\t %i\t--> Press 'Q' to quit final cooling step: " % self.cycle)
+		sys.stdout.flush()
+
+		console = True  # console still open
+		while not self.quit:
+			if not console:
+				yield Sleep(self.sampling_slow)
+			elif (yield Readable(sys.stdin, self.sampling_slow)):
+				line = sys.stdin.readline()
+				if line.strip() in ('Q', 'q'):
+					break
+				console = line != ''  # end of input: wait for quit_final_hold only
+				sys.stdout.write("PROMPT\t %i\t--> Press 'Q' to quit final cooling step: " % self.cycle)
+				sys.stdout.flush()
+
+		self.quit = False
+		yield self.set_control_off()
+		self.clear_checkpoint()  # run complete
+
+#------------------------------ Run PCR protocol ---------------------------------------
+
+	def run(self, protocol, start=0, hold=0):
+		"""Executes execution plan of protocol, from action index start on, as Protocol.run does. If the
+		plan resumes at an incubation, hold seconds of it have elapsed already."""
+
+		for method, args in protocol.actions(self.temperature_control, start, hold):
+			yield getattr(self, method)(*args)
+
+	def run_protocol(self, path):
+		"Loads declarative PCR protocol from file and runs it"
+
+		protocol = Protocol.load(path, self.triggers, self.gain_table, self.calibration)
+		self.logging.info("%i\t--> Loaded protocol %s from %s" % (self.cycle, protocol.name, path))
+		yield self.run(protocol)
+
+	def pcr_wo_trigger(self):
+		"Performs PCR cycle of configuration file without trigger points, see Temperature_control.pcr_wo_trigger"
+
+		yield self.run(Protocol.from_config(self.temperature_control, trigger=False))
+
+	def pcr_wi_trigger(self):
+		"Performs PCR cycle of configuration file with trigger points, see Temperature_control.pcr_wi_trigger"
+
+		yield self.run(Protocol.from_config(self.temperature_control, trigger=True))
@@ -0,0 +1,92 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the PID gain identification of the auto-tune
+ mode (Temperature_control.auto_tune) in Python. A recorded step or relay
+ experiment of a PCR transition is fitted by a thermal plant model (see
+ simulator.py); then the (P_bandwidth, I_gain, D_gain) triple with the shortest
+ simulated settling time whose overshoot stays within the given limit is chosen.
+ Tuned gains are kept in a gain table, which the PCR run loads in place of the
+ numbered P_bandwidthN / I_gainN / D_gainN configuration parameters.
+
+ The 5R7-001 has no relay output mode, so a relay experiment is emulated by a
+ PID set of RELAY_BAND proportional bandwidth and no integral or derivative
+ action, which switches the output between its limits around the set point.
+-------------------------------------------------------------------------------
+"""
+
+from planner import Transition_table
+
+RELAY_BAND = 0.5  # proportional bandwidth of emulated relay (C)
+HORIZON = 300.0  # longest simulated step response (s)
+
+P_GRID = [2, 3, 5, 8, 12, 16, 22, 30, 40, 50, 60]  # proportional bandwidth candidates (C)
+I_GRID = [0, 1, 2, 5, 10, 20, 40, 60]  # integral gain candidates (repeats/min)
+D_GRID = [0, 0.05, 0.1, 0.2]  # derivative gain candidates (min)
+
+class Gain_table(Transition_table):
+
+	KEYS = ('start', 'target', 'P_bandwidth', 'I_gain', 'D_gain', 'settling_time', 'overshoot')
+
+	def lookup(self, start, target):
+		"Returns tuned (P_bandwidth, I_gain, D_gain) of closest transition to ramp from start to target, or None"
+
+		transition = self.nearest(start, target)
+		if transition is None:
+			return None
+
+		return (transition['P_bandwidth'], transition['I_gain'], transition['D_gain'])
+
+def step_response(parameters, start, target, gains, tolerance, criteria, sampling_time, horizon):
+	"""Returns (settling time, overshoot) of simulated step from start to target temperature (C) under PID
+	gains (pb, ig, dg): time (s) until the steady-state detector fires, or None if not within horizon (s),
+	and largest excursion (C) beyond target"""
+
+	from simulator import Thermal_plant, STEP
+	from steady_state import Steady_state
+
+	pb, ig, dg = gains
+	plant = Thermal_plant(parameters, start)
+	plant.hold(pb, ig)
+
+	detector = Steady_state(target, tolerance, *criteria)
+	direction = cmp(target, start)
+	overshoot = 0.0
+
+	t = 0.0
+	next_sample = 0.0
+	while t < horizon:
+		plant.step(STEP, target, pb, ig, dg)
+		t += STEP
+		overshoot = max(overshoot, direction * (plant.control - target))
+
+		if t < next_sample:
+			continue
+		next_sample += sampling_time
+
+		if detector.add(t, plant.control):
+			return t, overshoot
+
+	return None, overshoot
+
+def tune_gains(parameters, start, target, overshoot_limit, tolerance, criteria, sampling_time):
+	"""Returns transition dictionary with the PID gains of shortest settling time from start to target
+	within overshoot limit (C), searched over P_GRID x I_GRID x D_GRID on plant parameters"""
+
+	best = None
+	for pb in P_GRID:
+		for ig in I_GRID:
+			for dg in D_GRID:
+				horizon = HORIZON
+				if best is not None:
+					horizon = best[0]  # give up once slower than best so far
+
+				t, overshoot = step_response(parameters, start, target, (pb, ig, dg), tolerance, criteria, sampling_time, horizon)
+				if t is not None and overshoot <= overshoot_limit and (best is None or t < best[0]):
+					best = (t, overshoot, pb, ig, dg)
+
+	if best is None:
+		return None
+
+	t, overshoot, pb, ig, dg = best
+	return {'start': start, 'target': target, 'P_bandwidth': pb, 'I_gain': ig, 'D_gain': dg,
+		'settling_time': t, 'overshoot': overshoot}
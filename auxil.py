@@ -21,88 +21,51 @@
 ------------------------------------------------------------------------------- 
 """
 
-import math
 import time
 
+import codec
+
 def set_command(command, value):
 	"""Return the controlling ASCII string of commands in hexadecimal format translated 
 	from command and decimal value arguments"""
-	
-	value = int(math.ceil(value))
-
-	sum = 0
-	cmd = '*00' + command + '0000000000\r'
-	cml = list(cmd)
-
-	if (value == 0 or value == 1):  
-		h = hex(value).split('x')[1]
-		cml[12] = h[-1]
-
-	elif value != 'NA':
-		h = hex(value).split('x')[1]
-
-		if len(h) == 4:
-			cml[9] = h[-4]
-			cml[10] = h[-3]
-			cml[11] = h[-2]
-
-		if len(h) == 3:
-			cml[10] = h[-3]
-			cml[11] = h[-2]
-
-		if len(h) == 2:
-			cml[11] = h[-2]
 
-		cml[12] = h[-1]
-
-	for x in range(1, 13):
-		sum += ord(cml[x])
-
-	cs = hex(sum%256).split('x')[1]
-
-	if len(cs) == 1:
-		cml[14] = cs[0]
-
-	else:
-		cml[13] = cs[0]
-		cml[14] = cs[1]
-
-	return "".join(cml)
+	return codec.encode(command, value)
 
 def get_response(response):
 	"""Return the ASCII string of response in decimal format translated 
 	from serial port response in hexadecimal format"""
 
-	time.sleep(0.1)
-	res = '****'
-	rel = list(res)
-
-	rel[0] = response[-7]
-	rel[1] = response[-6]
-	rel[2] = response[-5]
-	rel[3] = response[-4]
-
-	return '%.4f' % (float(int("".join(rel), 16)))
+	return '%.4f' % codec.decode(response)
 
 def check_sum(command):
 		"""Return the controlling ASCII string of commands in hexadecimal format translated 
 		from read command argument"""
 
-		sum = 0
-		cmd = '*00' + command + '0000000000\r'
-		cml = list(cmd)
+		return codec.read_frame(command)
 
-		for x in range(1, 13):
-			sum += ord(cml[x])
+def read_response(serial, timeout=1.0):
+	"""Return the (decimal value, elapsed seconds) tuple of the first complete and checksum-valid 
+	response frame read from serial port, without waiting any longer than the frame takes to arrive.
+	Raises IOError if no valid frame is received before the timeout (s) deadline expires"""
 
-		cs = hex(sum%256).split('x')[1]
+	t0 = time.time()
+	deadline = t0 + timeout
+	frame = ''
 
-		if len(cs) == 1:
-			cml[14] = cs[0]
+	while True:
+		frame += serial.read(codec.RESPONSE_LENGTH - len(frame))  # returns as soon as frame is complete
 
-		else:
-			cml[13] = cs[0]
-			cml[14] = cs[1]
+		start = frame.find('*')  # synchronize on start-of-frame character
+		if start < 0:
+			frame = ''
+		elif start > 0:
+			frame = frame[start:]
 
-		return "".join(cml)
+		if len(frame) == codec.RESPONSE_LENGTH:
+			try:
+				return codec.decode(frame), time.time() - t0
+			except ValueError:
+				frame = frame[1:]  # corrupted frame, drop start character and resynchronize
 
+		if time.time() >= deadline:
+			raise IOError("No valid 5R7-001 response within %0.3f s [received: %r]" % (timeout, frame))
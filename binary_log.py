@@ -0,0 +1,152 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the compact binary temperature log in Python.
+ A log file starts with a header - magic 'PCRLOG01', metadata length (uint32),
+ record size (uint32) and the run metadata as JSON text, padded to a multiple of
+ the record size - followed by fixed-width little-endian records:
+
+	time (float64, s) | set, control, periphery (int16, 0.01 C) | padding (2)
+
+ The reader memory-maps the records as a NumPy structured array, so each column
+ is a view into the file and reloading a day of samples copies nothing.
+
+ Usage: python binary_log.py convert <text log> <binary log>
+        python binary_log.py info <binary log>
+-------------------------------------------------------------------------------
+"""
+
+import sys
+import json
+import struct
+
+MAGIC = 'PCRLOG01'
+HEADER = struct.Struct('<8sII')  # magic, metadata length, record size
+RECORD = struct.Struct('<dhhhxx')  # time, set, control, periphery temperatures, padding
+LIMIT = 32767  # largest int16 centi-degree value
+
+def dtype():
+	"Returns NumPy structured data type of a log record"
+
+	import numpy
+	return numpy.dtype([('time', '<f8'), ('set', '<i2'), ('control', '<i2'), ('periphery', '<i2'), ('pad', 'V2')])
+
+def centi(temperature):
+	"Returns temperature (C) in int16 centi-degrees, clipped to int16 range"
+
+	return max(-LIMIT, min(LIMIT, int(round(temperature * 100))))
+
+def header(metadata):
+	"Returns header string of metadata dictionary, padded so records start at a record size multiple"
+
+	text = json.dumps(metadata, sort_keys=True)
+	length = HEADER.size + len(text)
+	text += ' ' * (-length % RECORD.size)
+	return HEADER.pack(MAGIC, len(text), RECORD.size) + text
+
+class Binary_log:
+
+	def __init__(self, file, metadata=None):
+		"Initialize binary log-file writing into open file object, starting with header of run metadata dictionary"
+
+		if metadata is None:
+			metadata = {}
+
+		self.file = file
+		self.file.write(header(metadata))
+		self.count = 0  # number of records written
+
+	def append(self, sample):
+		"Writes (time, set, control, periphery) temperature snapshot as one record"
+
+		t, st, pt, gt = sample
+		self.file.write(RECORD.pack(t, centi(st), centi(pt), centi(gt)))
+		self.count += 1
+
+	def flush(self):
+		self.file.flush()
+
+	def close(self):
+		self.file.close()
+
+	@property
+	def closed(self):
+		return self.file.closed
+
+#--------------------------------------------------------------------------------------#
+#				READER AND CONVERTER				       #
+#--------------------------------------------------------------------------------------#
+
+def read_header(path):
+	"Returns (metadata dictionary, record offset) of binary log-file"
+
+	f = open(path, 'rb')
+	magic, length, size = HEADER.unpack(f.read(HEADER.size))
+
+	if magic != MAGIC or size != RECORD.size:
+		f.close()
+		raise IOError("Not a binary temperature log: %s" % path)
+
+	metadata = json.loads(f.read(length))
+	f.close()
+	return metadata, HEADER.size + length
+
+def load(path):
+	"""Returns (metadata dictionary, records) of binary log-file, where records is a read-only NumPy
+	structured array memory-mapped onto the file: records['time'] in s, records['set'], records['control']
+	and records['periphery'] in 0.01 C. A partially written last record is left out."""
+
+	import os
+	import numpy
+
+	metadata, offset = read_header(path)
+	count = (os.path.getsize(path) - offset) // RECORD.size
+
+	if count == 0:
+		return metadata, numpy.zeros(0, dtype=dtype())
+
+	return metadata, numpy.memmap(path, dtype=dtype(), mode='r', offset=offset, shape=(count,))
+
+def convert(text_path, binary_path, metadata=None):
+	"""Converts tab-separated (time, set, control, periphery) text temperature log into binary log-file,
+	returns number of records written"""
+
+	import numpy
+
+	rows = numpy.genfromtxt(text_path, delimiter='\t', usecols=(0, 1, 2, 3), invalid_raise=False)
+	rows = rows.reshape(-1, 4)
+	rows = rows[~numpy.isnan(rows).any(axis=1)]
+
+	if metadata is None:
+		metadata = {}
+	metadata.setdefault('source', text_path)
+
+	records = numpy.zeros(len(rows), dtype=dtype())
+	records['time'] = rows[:, 0]
+	for i, name in enumerate(('set', 'control', 'periphery')):
+		records[name] = numpy.clip(numpy.round(rows[:, i + 1] * 100), -LIMIT, LIMIT)
+
+	f = open(binary_path, 'wb')
+	f.write(header(metadata))
+	records.tofile(f)
+	f.close()
+	return len(records)
+
+if __name__ == '__main__':
+
+	if len(sys.argv) == 4 and sys.argv[1] == 'convert':
+		n = convert(sys.argv[2], sys.argv[3])
+		print "INFO\t -\t--> Converted %i records: %s -> %s" % (n, sys.argv[2], sys.argv[3])
+
+	elif len(sys.argv) == 3 and sys.argv[1] == 'info':
+		metadata, records = load(sys.argv[2])
+		print "INFO\t -\t--> %i records" % len(records)
+		if len(records):
+			print "INFO\t -\t--> %0.2f s from %f" % (records['time'][-1] - records['time'][0], records['time'][0])
+		for key in sorted(metadata):
+			if key != 'config':
+				print "INFO\t -\t--> %s: %s" % (key, metadata[key])
+
+	else:
+		print '\n--> Error: not correct input!\n--> Usage: python binary_log.py convert <text log> <binary log> | info <binary log>\n'
@@ -0,0 +1,223 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the control-to-channel calibration in Python,
+ the calibration curve of auxil.py. The glass slide (channel) temperature is
+ modelled as a polynomial of the Peltier surface (control) temperature some lag
+ earlier:
+
+	channel(t) = p(control(t - lag))
+
+ fitted to recorded runs (INPUT 1 and INPUT 2 columns of temperature logs) by
+ least squares, solved for every lag on a grid at once. The fit is saved per
+ chip type (chip_type in config.txt) as a lookup table of control and channel
+ temperature, calibration/<chip_type>.cal in home_dir.
+
+ With calibration_option set, protocol temperatures are channel temperatures:
+ each step's set point is the control temperature holding the channel at its
+ temperature, and wait_for_SS watches the estimated channel temperature, so
+ set_temp/temp offsets no longer compensate by hand.
+
+ Usage: python calibration.py <chip type> [logs...]  (default: steady-state logs)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import numpy
+import ConfigParser
+
+from collections import deque
+
+DEGREE = 2  # polynomial degree
+MAX_LAG = 45.0  # longest lag fitted (s)
+LAG_STEP = 0.25  # lag grid step (s)
+LUT_STEP = 0.1  # control temperature step of lookup table (C)
+CENTER = 50.0  # polynomial variable is (control - CENTER) / SCALE, for conditioning
+SCALE = 50.0
+VALID = (-20.0, 150.0)  # plausible sensor range (C), a disconnected sensor reads outside
+
+class Calibration:
+
+	def __init__(self, coefficients, lag, low, high, rms=0.0, samples=0, chip_type=None):
+		"""Initialize calibration channel = p(control(t - lag)) of polynomial coefficients (highest power
+		first, in scaled control temperature), valid for control temperatures from low to high (C)"""
+
+		self.coefficients = numpy.asarray(coefficients, dtype=float)
+		self.lag = float(lag)
+		self.low = float(low)
+		self.high = float(high)
+		self.rms = float(rms)
+		self.samples = int(samples)
+		self.chip_type = chip_type
+
+		self.control_table = numpy.arange(self.low, self.high + LUT_STEP / 2, LUT_STEP)  # lookup table
+		self.channel_table = self.channel(self.control_table)
+
+		if numpy.any(numpy.diff(self.channel_table) <= 0):
+			raise ValueError("Calibration of %s is not monotonic between %0.1f and %0.1f C" % (chip_type, self.low, self.high))
+
+	def channel(self, control):
+		"Returns steady-state channel temperature (C) at control temperature, a float or array"
+
+		return numpy.polyval(self.coefficients, (numpy.asarray(control, dtype=float) - CENTER) / SCALE)
+
+	def control(self, channel):
+		"""Returns control temperature (C) holding channel at given temperature, looked up in table and
+		extrapolated along its end slope outside it"""
+
+		c, g = self.control_table, self.channel_table
+
+		if channel < g[0]:
+			return float(c[0] + (channel - g[0]) * (c[1] - c[0]) / (g[1] - g[0]))
+		if channel > g[-1]:
+			return float(c[-1] + (channel - g[-1]) * (c[-1] - c[-2]) / (g[-1] - g[-2]))
+		return float(numpy.interp(channel, g, c))
+
+	def estimate(self):
+		"Returns channel temperature estimator fed with control samples, see Channel_estimate"
+
+		return Channel_estimate(self)
+
+#-------------------------------- Lookup table file ------------------------------------
+
+	@classmethod
+	def load(cls, path):
+		"Returns calibration read from lookup table file"
+
+		if not os.path.exists(path):
+			raise IOError("Cannot read calibration: %s" % path)
+
+		header = {}
+		for line in open(path):
+			if line.startswith('#') and '=' in line:
+				key, value = line[1:].split('=', 1)
+				header[key.strip()] = value.strip()
+
+		coefficients = [float(c) for c in header['coefficients'].split(',')]
+		return cls(coefficients, header['lag'], header['low'], header['high'], header.get('rms', 0), header.get('samples', 0), header.get('chip_type'))
+
+	def save(self, path):
+		"Writes fit parameters and lookup table (control, channel temperature rows) into file"
+
+		directory = os.path.dirname(path)
+		if directory and not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		f = open(path, 'w')
+		f.write("# chip_type = %s\n" % self.chip_type)
+		f.write("# coefficients = %s\n" % ', '.join(['%r' % c for c in self.coefficients]))
+		f.write("# lag = %0.2f\n" % self.lag)
+		f.write("# low = %0.2f\n" % self.low)
+		f.write("# high = %0.2f\n" % self.high)
+		f.write("# rms = %0.4f\n" % self.rms)
+		f.write("# samples = %i\n" % self.samples)
+		for c, g in zip(self.control_table, self.channel_table):
+			f.write("%0.2f\t%0.3f\n" % (c, g))
+		f.close()
+
+class Channel_estimate:
+
+	def __init__(self, calibration):
+		"Initialize estimator of channel temperature from the control samples of calibration lag"
+
+		self.calibration = calibration
+		self.history = deque()  # (time, control) samples back to lag before latest one
+
+	def add(self, t, control):
+		"Adds control temperature sample at time t (s), returns estimated channel temperature at t"
+
+		self.history.append((t, control))
+		lag = self.calibration.lag
+
+		while len(self.history) > 2 and self.history[1][0] <= t - lag:
+			self.history.popleft()  # keep one sample before t - lag
+
+		times = [s[0] for s in self.history]
+		controls = [s[1] for s in self.history]
+		return float(self.calibration.channel(numpy.interp(t - lag, times, controls)))  # oldest sample until history reaches back
+
+#--------------------------------------------------------------------------------------#
+#				CALIBRATION FIT					       #
+#--------------------------------------------------------------------------------------#
+
+def fit(traces, degree=DEGREE, max_lag=MAX_LAG, chip_type=None):
+	"""Returns calibration fitted to list of (time, control, periphery) array traces. For every lag of the
+	grid the delayed control temperatures are interpolated at once and the normal equations of all lags
+	solved as one stacked system; the lag of least squared error wins. Samples of implausible sensor
+	readings, and samples less than a lag into their trace, are left out."""
+
+	lags = numpy.arange(0, max_lag + LAG_STEP / 2, LAG_STEP)
+
+	rows, targets, weights = [], [], []
+	low, high = None, None
+	for t, control, periphery in traces:
+		t, control, periphery = [numpy.asarray(column, dtype=float) for column in (t, control, periphery)]
+		valid = (control > VALID[0]) & (control < VALID[1]) & (periphery > VALID[0]) & (periphery < VALID[1])
+		t, control, periphery = t[valid], control[valid], periphery[valid]
+		if len(t) < degree + 2:
+			continue
+
+		delayed = numpy.interp((t[None, :] - lags[:, None]).ravel(), t, control).reshape(len(lags), len(t))
+		rows.append(numpy.power(((delayed - CENTER) / SCALE)[:, :, None], numpy.arange(degree, -1, -1)))  # lag x sample x power
+		targets.append(periphery)
+		weights.append((t[None, :] - lags[:, None] >= t[0]).astype(float))  # delayed sample inside trace
+
+		if low is None:
+			low, high = control.min(), control.max()
+		low, high = min(low, control.min()), max(high, control.max())
+
+	if not rows:
+		raise ValueError("No trace with valid control and periphery temperatures to calibrate")
+
+	V = numpy.concatenate(rows, axis=1)
+	g = numpy.concatenate(targets)
+	w = numpy.concatenate(weights, axis=1)
+
+	normal = numpy.einsum('kn,kni,knj->kij', w, V, V)
+	right = numpy.einsum('kn,kni,n->ki', w, V, g)
+	coefficients = numpy.linalg.solve(normal, right[:, :, None])[:, :, 0]
+
+	residuals = numpy.einsum('kni,ki->kn', V, coefficients) - g[None, :]
+	counts = w.sum(axis=1)
+	errors = (w * residuals ** 2).sum(axis=1) / numpy.maximum(counts, 1)
+
+	best = int(numpy.argmin(errors))
+	return Calibration(coefficients[best], lags[best], numpy.floor(low), numpy.ceil(high), numpy.sqrt(errors[best]), counts[best], chip_type)
+
+def calibration_path(config):
+	"Returns lookup table file of the chip type of configuration"
+
+	return os.path.join(config.get("communication","home_dir"), config.get("pcr_parameters","calibration_dir"),
+			    config.get("pcr_parameters","chip_type") + '.cal')
+
+if __name__ == '__main__':
+
+	import analytics
+	from simulator import STEADY_STATE
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+
+	if len(sys.argv) < 2:
+		print '--> Usage: python calibration.py <chip type> [logs...]'
+		sys.exit()
+
+	config.set("pcr_parameters", "chip_type", sys.argv[1])
+	paths = sys.argv[2:] or [path for (path, gains) in STEADY_STATE]
+
+	traces = []
+	for path in paths:
+		t, st, ct, gt = analytics.load(path)
+		traces.append((t, ct, gt))
+
+	calibration = fit(traces, chip_type=sys.argv[1])
+	path = calibration_path(config)
+	calibration.save(path)
+
+	print "\nINFO\t -\t--> Calibrated %s on %i samples of %i log(s): lag %0.2f s, rms error %0.3f C" % (sys.argv[1], calibration.samples, len(paths), calibration.lag, calibration.rms)
+	print "\nCHANNEL (C)\tCONTROL (C)"
+	for channel in range(int(numpy.ceil(calibration.channel_table[0] / 5) * 5), int(calibration.channel_table[-1]) + 1, 5):
+		print "%i\t\t%0.2f" % (channel, calibration.control(channel))
+	print "\nINFO\t -\t--> Saved calibration: %s\n" % path
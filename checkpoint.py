@@ -0,0 +1,58 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Checkpoint, the
+ protocol run checkpoint file in Python. Before every action of its execution
+ plan, and every few seconds of a hold, a running protocol saves where it is:
+
+	source, digest  - protocol (pcr_wo_trigger, pcr_wi_trigger or protocol file)
+	                  and hash of its execution plan
+	action, cycle   - plan index of current action and PCR cycle
+	hold            - hold time (s) of current incubation elapsed so far
+	target_temp     - set point in effect (C)
+	gains           - PID set in effect (P_bandwidth, I_gain, D_gain)
+	time            - time stamp of checkpoint
+
+ 'python genotyping_pcr.py --resume' continues an interrupted run from there.
+ The file is replaced atomically, so a crash never leaves a partial checkpoint.
+-------------------------------------------------------------------------------
+"""
+
+import os
+import json
+
+class Checkpoint:
+
+	def __init__(self, path):
+		"Initialize checkpoint kept in file path"
+
+		self.path = path
+
+	def save(self, state, sync=True):
+		"""Replaces checkpoint by state dictionary, synced to disk first unless sync is False (hold time
+		updates on the sampling path)"""
+
+		temporary = self.path + '.tmp'
+		f = open(temporary, 'w')
+		json.dump(state, f)
+		if sync:
+			f.flush()
+			os.fsync(f.fileno())  # on disk before it replaces the previous checkpoint
+		f.close()
+		os.rename(temporary, self.path)
+
+	def load(self):
+		"Returns saved state dictionary, or None if there is no checkpoint"
+
+		if not os.path.exists(self.path):
+			return None
+
+		f = open(self.path)
+		state = json.load(f)
+		f.close()
+		return state
+
+	def clear(self):
+		"Removes checkpoint, run is complete"
+
+		if os.path.exists(self.path):
+			os.remove(self.path)
@@ -0,0 +1,166 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the clock classes injected into the temperature
+ controller and the logger in Python. Real_clock follows wall-clock time, while
+ Virtual_clock is a discrete-event clock: every sleep jumps straight to the
+ wake-up time, so a complete protocol run against the simulated controller
+ executes in seconds. A virtual clock must only be driven by a single thread.
+
+ Class Scheduler runs a sampling loop at a fixed rate: its deadlines lie on the
+ grid start + k * period of the clock's monotonic time, so the I/O time of the
+ loop body is absorbed instead of added to the period, and no drift builds up.
+ A body running past its deadline is counted as overrun and reported. Given a
+ sampling policy, the period follows each sample (see sampler.Sampling_policy).
+-------------------------------------------------------------------------------
+"""
+
+import time
+import ctypes
+import ctypes.util
+import threading
+
+CLOCK_MONOTONIC = 1  # clock id of clock_gettime, Linux
+
+class Timespec(ctypes.Structure):
+	_fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+try:
+	clock_gettime = ctypes.CDLL(ctypes.util.find_library('rt') or 'libc.so.6', use_errno=True).clock_gettime
+	clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(Timespec)]
+except (OSError, AttributeError):
+	clock_gettime = None  # no POSIX clocks, fall back to wall-clock time
+
+def monotonic():
+	"Returns time (s) of a clock that never jumps, e.g. on system time adjustments"
+
+	if clock_gettime is None:
+		return time.time()
+
+	t = Timespec()
+	if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+		return time.time()
+	return t.tv_sec + t.tv_nsec * 1e-9
+
+class Real_clock:
+
+	virtual = False
+
+	def time(self):
+		"Returns current wall-clock time (s)"
+		return time.time()
+
+	def monotonic(self):
+		"Returns current monotonic time (s), for deadlines"
+		return monotonic()
+
+	def sleep(self, seconds):
+		"Blocks for given number of seconds"
+		if seconds > 0:
+			time.sleep(seconds)
+
+	def wait(self, event, seconds):
+		"Blocks until event is set or given number of seconds elapsed, returns True if event is set"
+		event.wait(seconds)
+		return event.is_set()
+
+class Virtual_clock:
+
+	virtual = True
+
+	def __init__(self, start=None):
+		"Initialize virtual clock at start time stamp [default: current wall-clock time]"
+
+		if start is None:
+			start = time.time()
+
+		self.now = float(start)
+		self.lock = threading.Lock()
+
+	def time(self):
+		"Returns current virtual time (s)"
+		return self.now
+
+	def monotonic(self):
+		"Returns current virtual time (s), virtual time never jumps back"
+		return self.now
+
+	def sleep(self, seconds):
+		"Advances virtual time by given number of seconds without blocking"
+		if seconds > 0:
+			with self.lock:
+				self.now += seconds
+
+	def wait(self, event, seconds):
+		"Advances virtual time by given number of seconds unless event is already set, returns True if event is set"
+		if not event.is_set():
+			self.sleep(seconds)
+		return event.is_set()
+
+class Scheduler:
+
+	def __init__(self, clock, period, name='loop', logger=None, policy=None):
+		"""Initialize fixed-rate schedule of given period (s) on clock, its first deadline one period from
+		now. A policy object returns the period following each sample, see sleep."""
+
+		self.clock = clock
+		self.period = float(period)
+		self.name = name
+		self.logging = logger
+		self.policy = policy
+
+		self.start = clock.monotonic()
+		self.ticks = 0  # index of current deadline on grid
+		self.deadlines = 0  # number of deadlines so far
+		self.overruns = 0  # number of deadlines missed by loop body
+		self.late = 0.0  # largest lateness of a missed deadline (s)
+
+	def set_period(self, period):
+		"Changes period (s) from the current deadline on"
+
+		if period != self.period:
+			self.start += self.ticks * self.period
+			self.ticks = 0
+			self.period = float(period)
+
+	def advance(self, sample=None):
+		"""Moves on to next deadline and returns seconds left until it, zero if it is missed already. Whole
+		periods missed are skipped, keeping the grid. If a policy is set, the period up to the next
+		deadline is the one it returns for the last sample."""
+
+		if self.policy is not None and sample is not None:
+			self.set_period(self.policy.update(sample))
+
+		self.ticks += 1
+		self.deadlines += 1
+		remaining = self.start + self.ticks * self.period - self.clock.monotonic()
+
+		if remaining < 0:
+			self.overruns += 1
+			self.late = max(self.late, -remaining)
+			self.ticks += int(-remaining / self.period)  # skipped periods
+			if self.overruns == 1 and self.logging is not None:  # once per loop, report() sums up the rest
+				self.logging.debug("-\t--> %s overran its %0.3f s period by %0.3f s" % (self.name, self.period, -remaining))
+			return 0
+
+		return remaining
+
+	def sleep(self, event=None, sample=None):
+		"""Blocks until next deadline (see advance), or until event is set. A missed deadline returns at
+		once. Returns True if event is set."""
+
+		remaining = self.advance(sample)
+
+		if remaining == 0:
+			return event is not None and event.is_set()
+
+		if event is not None:
+			return self.clock.wait(event, remaining)
+
+		self.clock.sleep(remaining)
+		return False
+
+	def report(self, cycle=0):
+		"Logs number of overruns, if any"
+
+		if self.overruns > 0 and self.logging is not None:
+			self.logging.warn("%i\t--> %s: %i of %i sampling deadline(s) overrun, latest by %0.3f s" % (cycle, self.name, self.overruns, self.deadlines, self.late))
@@ -0,0 +1,92 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the 5R7-001 temperature controller frame codec
+ in Python. Command frames are '*' + address '00' + command (2) + data (8) +
+ checksum (2) + '\r' characters, response frames are '*' + data (8) + checksum
+ (2) + '^' characters. Data is a 32-bit two's complement value and checksum is
+ the 8-bit sum of the characters between the start character and the checksum,
+ both in lowercase hexadecimal. Hexadecimal digit pairs and their character
+ sums are tabulated once, read command frames are built once and cached.
+-------------------------------------------------------------------------------
+"""
+
+import math
+
+COMMAND_LENGTH = 16
+RESPONSE_LENGTH = 12
+
+HEX_BYTE = ['%02x' % b for b in range(256)]  # byte -> two hexadecimal characters
+HEX_SUM = [ord(h[0]) + ord(h[1]) for h in HEX_BYTE]  # byte -> character sum of its hexadecimal pair
+
+header_sums = {}  # command -> character sum of address and command fields
+read_frames = {}  # command -> cached read command frame
+
+def header_sum(command):
+	"Returns (cached) character sum of address and command fields of command frame"
+
+	try:
+		return header_sums[command]
+	except KeyError:
+		header_sums[command] = sum(bytearray('00' + command))
+		return header_sums[command]
+
+def encode(command, value):
+	"""Returns command frame string of command (two hexadecimal characters) with decimal value argument
+	rounded up to integer, a drop-in replacement of auxil.set_command"""
+
+	v = int(math.ceil(value)) & 0xffffffff
+	b3, b2, b1, b0 = v >> 24, (v >> 16) & 255, (v >> 8) & 255, v & 255
+
+	cs = (header_sum(command) + HEX_SUM[b3] + HEX_SUM[b2] + HEX_SUM[b1] + HEX_SUM[b0]) & 255
+	return '*00' + command + HEX_BYTE[b3] + HEX_BYTE[b2] + HEX_BYTE[b1] + HEX_BYTE[b0] + HEX_BYTE[cs] + '\r'
+
+def encode_into(frame, command, value):
+	"""Fills reusable 16-byte bytearray frame with command frame of command and decimal value argument
+	in place and returns it"""
+
+	frame[0:5] = '*00' + command
+	frame[5:13] = encode_data(value)
+	frame[13:15] = HEX_BYTE[(header_sum(command) + sum(frame[5:13])) & 255]
+	frame[15] = '\r'
+	return frame
+
+def encode_data(value):
+	"Returns 8-character hexadecimal data field of decimal value rounded up to integer"
+
+	v = int(math.ceil(value)) & 0xffffffff
+	return HEX_BYTE[v >> 24] + HEX_BYTE[(v >> 16) & 255] + HEX_BYTE[(v >> 8) & 255] + HEX_BYTE[v & 255]
+
+def read_frame(command):
+	"Returns cached read command frame string of command, a drop-in replacement of auxil.check_sum"
+
+	try:
+		return read_frames[command]
+	except KeyError:
+		read_frames[command] = encode(command, 0)
+		return read_frames[command]
+
+def valid(response):
+	"Returns True if response (string or bytearray) is a complete response frame with matching checksum"
+
+	if type(response) is bytearray:
+		response = str(response)
+
+	return (len(response) == RESPONSE_LENGTH and response[0] == '*' and response[11] == '^' and
+		HEX_BYTE[sum(bytearray(response[1:9])) & 255] == response[9:11].lower())
+
+def decode(response):
+	"""Returns signed decimal value of response frame (string or bytearray), a float. Raises ValueError
+	if frame is incomplete or its checksum does not match."""
+
+	if type(response) is bytearray:
+		response = str(response)
+
+	if not valid(response):
+		raise ValueError("Invalid 5R7-001 response frame: %r" % response)
+
+	value = int(response[1:9], 16)
+
+	if value >= 0x80000000:  # 32-bit two's complement
+		value -= 0x100000000
+
+	return float(value)
@@ -0,0 +1,128 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: Micro-benchmark of per-frame encoding and decoding cost of the 5R7-001
+ frame codec against the original list-based auxil implementation, which is
+ kept here verbatim as reference.
+
+ Usage: python codec_benchmark.py [iterations]
+-------------------------------------------------------------------------------
+"""
+
+import sys
+import math
+import timeit
+
+import codec
+
+#------------------------- Original auxil implementation -------------------------------
+
+def legacy_set_command(command, value):
+	value = int(math.ceil(value))
+
+	sum = 0
+	cmd = '*00' + command + '0000000000\r'
+	cml = list(cmd)
+
+	if (value == 0 or value == 1):
+		h = hex(value).split('x')[1]
+		cml[12] = h[-1]
+
+	elif value != 'NA':
+		h = hex(value).split('x')[1]
+
+		if len(h) == 4:
+			cml[9] = h[-4]
+			cml[10] = h[-3]
+			cml[11] = h[-2]
+
+		if len(h) == 3:
+			cml[10] = h[-3]
+			cml[11] = h[-2]
+
+		if len(h) == 2:
+			cml[11] = h[-2]
+
+		cml[12] = h[-1]
+
+	for x in range(1, 13):
+		sum += ord(cml[x])
+
+	cs = hex(sum%256).split('x')[1]
+
+	if len(cs) == 1:
+		cml[14] = cs[0]
+
+	else:
+		cml[13] = cs[0]
+		cml[14] = cs[1]
+
+	return "".join(cml)
+
+def legacy_check_sum(command):
+	sum = 0
+	cmd = '*00' + command + '0000000000\r'
+	cml = list(cmd)
+
+	for x in range(1, 13):
+		sum += ord(cml[x])
+
+	cs = hex(sum%256).split('x')[1]
+
+	if len(cs) == 1:
+		cml[14] = cs[0]
+
+	else:
+		cml[13] = cs[0]
+		cml[14] = cs[1]
+
+	return "".join(cml)
+
+def legacy_get_response(response):
+	res = '****'
+	rel = list(res)
+
+	rel[0] = response[-7]
+	rel[1] = response[-6]
+	rel[2] = response[-5]
+	rel[3] = response[-4]
+
+	return '%.4f' % (float(int("".join(rel), 16)))
+
+#------------------------------------ Benchmark ----------------------------------------
+
+RESPONSE = '*000023288f^'  # 90.00 C reading
+
+def per_frame(function, iterations):
+	"Returns best per-call duration of function (us) over three repetitions"
+
+	return min(timeit.repeat(function, number=iterations, repeat=3)) / iterations * 1e6
+
+if __name__ == '__main__':
+
+	iterations = 100000
+	if len(sys.argv) > 1:
+		iterations = int(sys.argv[1])
+
+	for value in (0, 1, 255, 9000, 4321.5):  # original and codec frames must be identical
+		assert legacy_set_command('1c', value) == codec.encode('1c', value)
+	assert legacy_check_sum('01') == codec.read_frame('01')
+	assert float(legacy_get_response(RESPONSE)) == codec.decode(RESPONSE)
+
+	frame = bytearray(codec.COMMAND_LENGTH)
+
+	cases = [('encode write frame', lambda: legacy_set_command('1c', 9000), lambda: codec.encode('1c', 9000)),
+		 ('encode into bytearray', lambda: legacy_set_command('1c', 9000), lambda: codec.encode_into(frame, '1c', 9000)),
+		 ('read command frame', lambda: legacy_check_sum('01'), lambda: codec.read_frame('01')),
+		 ('decode response frame', lambda: legacy_get_response(RESPONSE), lambda: codec.decode(RESPONSE))]
+
+	print "\n%-24s%12s%12s%10s" % ('FRAME (us/frame)', 'BEFORE', 'AFTER', 'SPEEDUP')
+
+	for name, before, after in cases:
+		b = per_frame(before, iterations)
+		a = per_frame(after, iterations)
+		print "%-24s%12.3f%12.3f%9.1fx" % (name, b, a, b / a)
+
+	print "\n[Note: codec decoding also verifies the checksum, which the original skipped; the original"
+	print " decoding additionally slept 100 ms per frame, excluded above.]\n"
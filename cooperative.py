@@ -0,0 +1,203 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the cooperative event loop in Python, on which
+ the non-blocking controller driver (see async_control.py) and other devices or
+ services are multiplexed in one thread. A task is a generator; it yields
+
+	Sleep(seconds)      - resume after seconds on the loop's clock
+	Readable(port, t)   - resume with True once port has input (select on its
+	                      file descriptor, polled if it has none), with False
+	                      if there is none within t seconds
+	<generator>         - run sub-task, resume with its result
+
+ and ends with 'raise Return(value)' to hand a result to its caller. A loop
+ on a Virtual_clock jumps from one wake-up time to the next.
+-------------------------------------------------------------------------------
+"""
+
+import sys
+import heapq
+import types
+import select
+import itertools
+
+from clock import Real_clock
+
+POLL = 0.002  # input polling period (s) of ports without file descriptor
+
+class Return(Exception):
+
+	def __init__(self, value=None):
+		"Initialize result of task"
+		Exception.__init__(self, value)
+		self.value = value
+
+class Sleep:
+
+	def __init__(self, seconds):
+		self.seconds = seconds
+
+class Readable:
+
+	def __init__(self, port, timeout=None):
+		self.port = port
+		self.timeout = timeout
+
+class Task:
+
+	def __init__(self, generator, name=None):
+		"Initialize task running generator; done, result and error are set once it ended"
+
+		self.stack = [generator]  # generator and the sub-tasks it waits on
+		self.name = name or getattr(generator, '__name__', 'task')
+		self.done = False
+		self.result = None
+		self.error = None  # exc_info of error that ended task
+		self.pending = None  # exc_info of error to raise into task on next step
+
+	def step(self, value=None, error=None):
+		"""Resumes task with value (or error raised into it) and returns the next wait object it yields,
+		running sub-generators and passing their results on the way; None once task ended"""
+
+		while True:
+			generator = self.stack[-1]
+			try:
+				if error is not None:
+					e, error = error, None
+					request = generator.throw(*e)
+				else:
+					request = generator.send(value)
+			except Return, r:
+				value, error = r.value, None
+			except StopIteration:
+				value, error = None, None
+			except Exception:
+				value, error = None, sys.exc_info()
+			else:
+				if isinstance(request, types.GeneratorType):
+					self.stack.append(request)  # run sub-task first
+					value = None
+					continue
+				return request
+
+			self.stack.pop()  # generator ended, hand its result or error to caller
+			if not self.stack:
+				self.done = True
+				self.result = value
+				self.error = error
+				return None
+
+class Event_loop:
+
+	def __init__(self, clock=None):
+		"Initialize event loop timed by clock [default: Real_clock()]"
+
+		if clock is None:
+			clock = Real_clock()
+
+		self.clock = clock
+		self.sleeping = []  # heap of (wake-up time, sequence, task)
+		self.reading = []  # (port, deadline, task) waiting for input
+		self.sequence = itertools.count()
+		self.tasks = []
+
+	def spawn(self, generator, name=None):
+		"Returns new task running generator, started on next loop iteration"
+
+		task = Task(generator, name)
+		self.tasks.append(task)
+		heapq.heappush(self.sleeping, (self.clock.monotonic(), next(self.sequence), task))
+		return task
+
+	def resume(self, task, value=None):
+		"Steps task and files it under what it waits for next"
+
+		error, task.pending = task.pending, None
+		request = task.step(value, error)
+
+		if task.done:
+			return
+		if isinstance(request, Sleep):
+			heapq.heappush(self.sleeping, (self.clock.monotonic() + request.seconds, next(self.sequence), task))
+		elif isinstance(request, Readable):
+			deadline = None
+			if request.timeout is not None:
+				deadline = self.clock.monotonic() + request.timeout
+			self.reading.append((request.port, deadline, task))
+		elif request is None:
+			heapq.heappush(self.sleeping, (self.clock.monotonic(), next(self.sequence), task))  # plain yield: let others run
+		else:
+			task.pending = (TypeError, TypeError("Task %s yielded %r" % (task.name, request)), None)
+			heapq.heappush(self.sleeping, (self.clock.monotonic(), next(self.sequence), task))
+
+	def run_once(self):
+		"Waits for the next wake-up, input or input timeout and resumes every task ready by then"
+
+		wake = [deadline for (port, deadline, task) in self.reading if deadline is not None]
+		if self.sleeping:
+			wake.append(self.sleeping[0][0])
+
+		timeout = None
+		if wake:
+			timeout = max(0, min(wake) - self.clock.monotonic())
+
+		ready = []  # (task, value to resume it with)
+		waiting, self.reading = self.reading, []
+		files = []
+		for port, deadline, task in waiting:
+			if hasattr(port, 'fileno'):
+				files.append((port, deadline, task))
+			elif port.inWaiting() > 0:
+				ready.append((task, True))
+			else:
+				self.reading.append((port, deadline, task))
+
+		if ready:
+			timeout = 0
+		elif self.reading and (timeout is None or timeout > POLL):
+			timeout = POLL  # poll ports without file descriptor
+
+		if files:
+			readable, _, _ = select.select([port.fileno() for (port, deadline, task) in files], [], [], timeout)
+			timeout = 0  # waited in select
+			for port, deadline, task in files:
+				if port.fileno() in readable:
+					ready.append((task, True))
+				else:
+					self.reading.append((port, deadline, task))
+
+		if timeout:
+			self.clock.sleep(timeout)  # on a virtual clock: jump to next wake-up
+
+		now = self.clock.monotonic()
+		while self.sleeping and self.sleeping[0][0] <= now:
+			ready.append((heapq.heappop(self.sleeping)[2], None))
+
+		waiting, self.reading = self.reading, []
+		for port, deadline, task in waiting:
+			if deadline is not None and deadline <= now:
+				ready.append((task, False))  # no input in time
+			else:
+				self.reading.append((port, deadline, task))
+
+		for task, value in ready:
+			self.resume(task, value)
+
+	def run_until_complete(self, generator):
+		"Runs loop until generator, spawned as task, ended; returns its result or raises its error"
+
+		task = self.spawn(generator)
+		while not task.done:
+			self.run_once()
+
+		if task.error is not None:
+			raise task.error[0], task.error[1], task.error[2]
+		return task.result
+
+	def gather(self, *generators):
+		"Runs loop until all generators ended, returns list of their tasks"
+
+		tasks = [self.spawn(generator) for generator in generators]
+		while [task for task in tasks if not task.done]:
+			self.run_once()
+		return tasks
@@ -0,0 +1,320 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the persistent temperature controller daemon in
+ Python. The daemon owns the serial port and the one Temperature_control object,
+ with its sampler thread running, and serves commands on the UNIX domain socket
+ set by daemon_socket in config.txt. A request is one JSON line
+
+	{"method": "get_control_temperature", "args": []}
+
+ answered by one JSON line {"result": ..., "error": null}. Queries and register
+ writes run right away, also while a protocol runs, since all serial transfers
+ go through the sampler. Long methods (protocols, auto-tune, waits) start as the
+ single background job; 'status' reports on it and 'quit_final_hold' answers the
+ final "press Q" prompt of a protocol. Class Client is the matching proxy used by
+ temperature_utils.py.
+
+ Usage: python daemon.py  (serve until Ctrl-C or 'shutdown' request)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import traceback
+import SocketServer
+
+from clock import Real_clock, Scheduler
+from telemetry import Subscriber, monitor
+
+QUERIES = ['get_config_parameters', 'get_control_temperature', 'get_periphery_temperature', 'get_set_temperature',
+	   'get_P_bandwidth', 'get_I_gain', 'get_D_gain', 'get_temperatures', 'set_temperature', 'set_P_bandwidth',
+	   'set_I_gain', 'set_D_gain', 'set_control_on', 'set_control_off', 'resync_registers', 'log_temperature']
+JOBS = ['run_protocol', 'pcr_wo_trigger', 'pcr_wi_trigger', 'resume_protocol', 'auto_tune', 'wait_for_SS', 'pull_trigger',
+	'incubate_reagent', 'sample_parameters']
+PROTOCOLS = ['run_protocol', 'pcr_wo_trigger', 'pcr_wi_trigger', 'resume_protocol']  # jobs archived as runs
+
+class Controller_daemon:
+
+	def __init__(self, config, temperature_control, writer=None):
+		"Initialize daemon serving temperature controller, whose jobs write temperature logs through writer"
+
+		self.config = config
+		self.temperature_control = temperature_control
+		self.writer = writer
+
+		self.job = None  # background job thread
+		self.job_status = {'method': None, 'running': False, 'start': None, 'end': None, 'error': None}
+		self.quit = threading.Event()  # set by 'quit_final_hold' request
+
+		temperature_control.press_q_to_exit = self.wait_for_quit  # final prompt is answered by a client
+
+		path = config.get("communication","daemon_socket")
+		if os.path.exists(path):
+			os.remove(path)  # stale socket of previous daemon
+
+		self.server = Server(path, Request_handler)
+		self.server.daemon = self
+
+	def serve_forever(self):
+		"Serves requests until shutdown"
+
+		self.temperature_control.logging.info("-\t--> Daemon serving on %s" % self.server.server_address)
+		try:
+			self.server.serve_forever()
+		finally:
+			self.server.server_close()
+			os.remove(self.server.server_address)
+
+	def call(self, method, args):
+		"Performs request method with argument list, returns its JSON serializable result"
+
+		tc = self.temperature_control
+
+		if method == 'get_temperatures' and tc.on_sampler() and tc.sampler.ring.count > 0:
+			return tc.sampler.ring.latest()  # latest sample, no serial transfer
+
+		if method == 'log_temperature' and (not self.job_status['running'] or self.job_status['end'] is not None):
+			raise IOError("No temperature log-file open, log_temperature records into the log-file of a running job")
+
+		if method in QUERIES:
+			return getattr(tc, method)(*args)
+
+		if method in JOBS:
+			return self.start_job(method, args)
+
+		if method == 'status':
+			status = dict(self.job_status)
+			status.update(cycle=tc.cycle, target_temp=tc.target_temp)
+			return status
+
+		if method == 'telemetry_socket':
+			return tc.telemetry.path  # None if not published
+
+		if method == 'quit_final_hold':
+			self.quit.set()
+			return True
+
+		if method == 'shutdown':
+			threading.Thread(target=self.server.shutdown).start()  # not from a handler thread of server
+			return True
+
+		raise ValueError("Unknown method: %s" % method)
+
+#--------------------------------- Background job --------------------------------------
+
+	def start_job(self, method, args):
+		"Starts method as background job, unless a job is already running"
+
+		if self.job is not None and self.job.is_alive():
+			raise RuntimeError("Job %s is running" % self.job_status['method'])
+
+		tc = self.temperature_control
+		tc.open_logfile(self.config.get("communication","log_dir"), self.writer)  # fresh temperature log-file per job
+		self.quit.clear()
+
+		self.job_status = {'method': method, 'running': True, 'start': time.time(), 'end': None, 'error': None}
+		self.job = threading.Thread(target=self.run_job, args=(method, args))
+		self.job.daemon = True
+		self.job.start()
+		return self.job_status
+
+	def run_job(self, method, args):
+		"Runs job method with argument list, then closes its temperature log-file and archives protocol runs"
+
+		tc = self.temperature_control
+		status = 'finished'
+		try:
+			if method in PROTOCOLS:
+				tc.set_control_on()  # turn on temperature control as genotyping_pcr.py does
+			getattr(tc, method)(*args)
+		except Exception, e:
+			status = 'failed'
+			self.job_status['error'] = "%s: %s" % (e.__class__.__name__, e)
+			tc.logging.error("%i\t--> Job %s failed: %s" % (tc.cycle, method, traceback.format_exc()))
+
+		tc.logfile.close()
+		self.job_status['end'] = time.time()
+
+		if method in PROTOCOLS and self.config.get("communication","archive_option") == '1' and getattr(tc, 'logfile_path', None) is not None:
+			from archive import Archive
+
+			try:
+				archive = Archive(self.config.get("communication","archive_dir"))
+				run = archive.add_run(self.config, tc.logfile_path, start=self.job_status['start'], end=self.job_status['end'],
+						      cycles=tc.cycle, protocol=' '.join([method] + [str(a) for a in args]), status=status,
+						      set_points=tc.set_points)
+				archive.close()
+				tc.logging.info("%i\t--> Archived run %i [%s]" % (tc.cycle, run, status))
+			except Exception, e:
+				tc.logging.error("%i\t--> Cannot archive run: %s" % (tc.cycle, e))
+
+		self.job_status['running'] = False  # reported once archived
+
+	def wait_for_quit(self):
+		"Holds final cooling step until a client sends 'quit_final_hold', then turns control off"
+
+		tc = self.temperature_control
+		tc.announcer.say('press_q_to_exit')
+		tc.logging.info("%i\t--> Holding final cooling step until quit_final_hold request" % tc.cycle)
+
+		self.quit.wait()
+		tc.set_control_off()
+
+#--------------------------------------------------------------------------------------#
+#				SOCKET SERVER AND CLIENT			       #
+#--------------------------------------------------------------------------------------#
+
+class Server(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+
+	daemon_threads = True  # one thread per connection, never keeps process alive
+
+class Request_handler(SocketServer.StreamRequestHandler):
+
+	def handle(self):
+		"Answers JSON line requests of connection until client closes it"
+
+		for line in iter(self.rfile.readline, ''):
+			try:
+				request = json.loads(line)
+				response = {'result': self.server.daemon.call(request['method'], request.get('args', [])), 'error': None}
+			except Exception, e:
+				response = {'result': None, 'error': "%s: %s" % (e.__class__.__name__, e)}
+
+			self.wfile.write(json.dumps(response) + '\n')
+			self.wfile.flush()
+
+class Client:
+
+	def __init__(self, path, timeout=None):
+		"Initialize client connected to daemon socket path, raises socket.error if no daemon is serving"
+
+		self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.socket.settimeout(timeout)
+		self.socket.connect(path)
+		self.file = self.socket.makefile('r+b')
+
+	def call(self, method, *args):
+		"Performs method on daemon and returns its result, raises IOError with the daemon error message"
+
+		if method == 'run_protocol' and args:
+			args = (os.path.abspath(args[0]),) + args[1:]  # daemon resolves paths in its own directory
+
+		self.file.write(json.dumps({'method': method, 'args': args}) + '\n')
+		self.file.flush()
+
+		line = self.file.readline()
+		if not line:
+			raise IOError("Daemon closed connection")
+
+		response = json.loads(line)
+		if response['error'] is not None:
+			raise IOError(response['error'])
+		return response['result']
+
+	def __getattr__(self, method):
+		"Returns proxy function of daemon method, so client is used like a Temperature_control object"
+
+		if method.startswith('_'):
+			raise AttributeError(method)
+		return lambda *args: self.call(method, *args)
+
+	def subscribe(self):
+		"Returns subscriber of daemon telemetry, or None if it is not published"
+
+		path = self.telemetry_socket()
+		if path is None:
+			return None
+
+		try:
+			return Subscriber(path)
+		except socket.error:
+			return None
+
+	def monitor_temperature(self):
+		"""Prints continuous temperature reading along with time steps on console, subscribed
+		to daemon telemetry if published."""
+
+		subscriber = self.subscribe()
+		if subscriber is not None:
+			monitor(subscriber, parameters=False)
+			return
+
+		ti = 0  # set initial time to zero
+		print("\nT (s)\tCONTROL (C)") 
+
+		schedule = Scheduler(Real_clock(), 1, 'monitor_temperature')
+		while(True):
+			t, st, pt, gt = self.get_temperatures()  # latest sample of daemon sampler
+
+			print("%i\t%0.2f" % (ti, pt))  # print time and control temperature
+			ti = ti + 1  # update current sampling time 
+			schedule.sleep()  # wait for next one second deadline
+
+	def monitor_parameters(self):
+		"""Prints continuous temperature parameters on console, subscribed to daemon telemetry
+		if published."""
+
+		subscriber = self.subscribe()
+		if subscriber is not None:
+			monitor(subscriber)
+			return
+
+		ti = 0  # set initial time to zero
+		print("\nT (s)\tST (C)\tPT (C)\tGT (C)") 
+
+		schedule = Scheduler(Real_clock(), 1, 'monitor_parameters')
+		while(True):
+			t, st, pt, gt = self.get_temperatures()  # latest sample of daemon sampler
+
+			print("%i\t%0.2f\t%0.2f\t%0.2f" % (ti, st, pt, gt))  # print time (s), set, control probe and periphery sensor temperature (C)
+			ti = ti + 1  # update current sampling time 
+			schedule.sleep()  # wait for next one second deadline
+
+	def close(self):
+		self.file.close()
+		self.socket.close()
+
+if __name__ == '__main__':
+
+	import serial
+	import ConfigParser
+
+	from logger import Logger
+	from log_writer import Log_writer
+	from temperature_control import Temperature_control
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+
+	writer = None
+	if config.get("communication","writer_option") == '1':
+		writer = Log_writer(config)
+		writer.start()
+
+	logger = Logger(config, writer=writer)
+
+	serial = serial.Serial(0)
+	serial.port = config.get("communication","serial_port")
+	logger.info("-\t--> Serial connection established")
+
+	temperature_control = Temperature_control(config, serial, logger)
+	temperature_control.start_sampler()  # all transfers of concurrent requests go through sampler
+
+	daemon = Controller_daemon(config, temperature_control, writer)
+	try:
+		daemon.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+	temperature_control.stop_sampler()
+	temperature_control.announcer.close(wait=True)
+	logger.info("-\t--> Daemon stopped")
+
+	if writer is not None:
+		writer.close()
@@ -20,19 +20,24 @@
 
  to determine the control-channel temperature correlation function.
 
+ Usage: python genotyping_pcr.py [protocol file] [--resume]  (--resume continues
+ an interrupted run from its checkpoint, see checkpoint.py)
+
  This software may be used, modified, and distributed freely, but this
  header may not be modified and must appear at the top of this file.
 -------------------------------------------------------------------------------- 
 """
 
+import os
 import sys
 import time
-import commands
 
 import auxil
 import serial
 import ConfigParser
 from logger import Logger
+from log_writer import Log_writer
+from archive import Archive
 
 from temperature_control import Temperature_control
 
@@ -43,9 +48,22 @@ print '\nINFO\t *\t--> START GENOTYPING PCR MAIN - genotyping_pcr.py\n'
 config = ConfigParser.ConfigParser()  # Create configuration file parser object.
 config.read('config.txt')  # Fill it in with configuration parameters from file.
 
+resume = '--resume' in sys.argv  # Continue interrupted run from its checkpoint.
+arguments = [os.path.abspath(a) for a in sys.argv[1:] if a != '--resume']  # protocol file, before any change of directory
+
 #--------------------- Serial port / logging initialization ----------------------------
 
-logger = Logger(config)  # Create logger object.
+process_log = config.get("communication","log_dir") + 'pcr_process.log'
+process_offset = 0  # this run's process log records begin here
+if os.path.exists(process_log):
+	process_offset = os.path.getsize(process_log)
+
+writer = None
+if config.get("communication","writer_option") == '1':
+	writer = Log_writer(config)  # Perform log-file and console output on background writer thread.
+	writer.start()
+
+logger = Logger(config, writer=writer)  # Create logger object.
 
 serial = serial.Serial(0)  # Create serial port object.
 serial.port = config.get("communication","serial_port")  # Set appropiate serial port. 
@@ -56,25 +74,80 @@ logger.info("-\t--> Serial connection established")
 t0 = time.time()  # Initial time stamp for log-file.
 temperature_control = Temperature_control(config, serial, logger)  # Initialize temperature controller object.
 
-if temperature_control.speech_option == 1:
-	commands.getstatusoutput('mplayer -ao pulse ../speech/welcome.wav')
-	commands.getstatusoutput('mplayer -ao pulse ../speech/start.wav')
+temperature_control.announcer.say('welcome')
+temperature_control.announcer.say('start')
 
 logger.info("*\t--> Started genotyping PCR")
 
-log_dir = config.get("communication", "log_dir")  # Get log directory from configuration parameters.
-temperature_control.logfile = open(log_dir + 'pcr_temperature.log', 'w')
-
-temperature_control.set_control_on()  # Turn temperature controller on.
-temperature_control.pcr_wo_trigger()  # Perform PCR protocol on reagent in genotyping chip (without trigger points).
-#temperature_control.pcr_wi_trigger()  # Perform PCR protocol on reagent in genotyping chip (with trigger points).
-temperature_control.set_control_off()  # Turn temperature controller off.
+if resume:
+	try:
+		plan, action, hold = temperature_control.restore_checkpoint()  # Re-establish set point, PID gains and control.
+	except (IOError, ValueError), e:  # no checkpoint or protocol changed, nothing to run or archive
+		logger.error("*\t--> Cannot resume run: %s" % e)
+		sys.exit(1)
 
-delta = (time.time() - t0) / 60  # Calculate elapsed time for PCR protocol.
-logger.warn("*\t--> Finished genotyping PCR - duration: %.2f minutes" % delta)
-
-if biochem.speech_option == 1:
-	commands.getstatusoutput('mplayer -ao pulse ../speech/end.wav')
+log_dir = config.get("communication", "log_dir")  # Get log directory from configuration parameters.
+temperature_control.open_logfile(log_dir, writer)  # Open text or binary temperature log-file.
+
+if temperature_control.sampler_option == 1:
+	temperature_control.start_sampler()  # Hand serial port over to background acquisition thread.
+
+protocol = 'pcr_wo_trigger'
+if len(arguments) > 0:
+	protocol = arguments[0]
+
+status = 'interrupted'
+try:
+	if resume:
+		protocol = plan.source + ' [resumed]'
+		plan.run(temperature_control, action, hold)  # Perform rest of interrupted PCR protocol.
+	elif len(arguments) > 0:
+		temperature_control.set_control_on()  # Turn temperature controller on.
+		temperature_control.run_protocol(arguments[0])  # Perform PCR protocol defined in protocol file.
+	else:
+		temperature_control.set_control_on()  # Turn temperature controller on.
+		temperature_control.pcr_wo_trigger()  # Perform PCR protocol on reagent in genotyping chip (without trigger points).
+	#temperature_control.pcr_wi_trigger()  # Perform PCR protocol on reagent in genotyping chip (with trigger points).
+	status = 'finished'
+	temperature_control.set_control_off()  # Turn temperature controller off.
+	temperature_control.stop_sampler()  # Stop background acquisition thread, if running.
+
+	delta = (time.time() - t0) / 60  # Calculate elapsed time for PCR protocol.
+	logger.warn("*\t--> Finished genotyping PCR - duration: %.2f minutes" % delta)
+
+	temperature_control.announcer.say('end')
+	temperature_control.announcer.close(wait=True)  # Let pending announcements finish.
+
+except SystemExit:
+	status = 'finished'  # quit at final cooling step prompt
+	raise
+
+except Exception:
+	try:
+		temperature_control.set_control_off()  # Leave chip unheated.
+	except Exception, e:
+		logger.error("*\t--> Cannot turn control off: %s" % e)
+	raise
+
+finally:
+	if not temperature_control.logfile.closed:  # Already closed when quit at final cooling step.
+		temperature_control.logfile.close()  # Close (or queue closing of) temperature log-file.
+
+	if writer is not None:
+		dropped = writer.close()  # Write out queued log records, console output is direct from here on.
+		if dropped > 0:
+			logger.warn("*\t--> Log writer dropped %i records on full queue" % dropped)
+
+	if config.get("communication","archive_option") == '1':  # Index run in archive.
+		try:
+			archive = Archive(config.get("communication","archive_dir"))
+			run = archive.add_run(config, temperature_control.logfile_path, process_log, process_offset,
+					      start=t0, end=time.time(), cycles=temperature_control.cycle, protocol=protocol, status=status,
+					      set_points=temperature_control.set_points)
+			archive.close()
+			logger.info("*\t--> Archived run %i [%s]" % (run, status))
+		except Exception, e:  # never mask how the run ended
+			logger.error("*\t--> Cannot archive run: %s" % e)
 
 print 'INFO\t *\t--> END GENOTYPING PCR MAIN - genotyping_pcr.py\n'
 
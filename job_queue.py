@@ -0,0 +1,423 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the run job queue and its scheduler in Python.
+ Class Job_queue keeps submitted protocol runs in a SQLite database (queue.db in
+ queue_dir of config.txt), so jobs are submitted from any terminal while the
+ scheduler runs:
+
+ jobs (id, protocol, overrides, chip, state, device, submitted, start, end, duration, cycles, log, error)
+
+ A job is a protocol (pcr_wo_trigger, pcr_wi_trigger or protocol file), its
+ configuration overrides (any [communication] / [pcr_parameters] option) and
+ the ID of the chip it runs on. Its state goes from queued to running and on to
+ finished or failed; a queued job may be cancelled.
+
+ Class Job_scheduler dispatches the oldest queued job to the next idle device
+ of section [orchestrator] (see orchestrator.py), one thread per running job.
+ A finished job records its duration from its temperature log. Queued runs do
+ not hold their final cooling step, the device is free once the run ends.
+
+ Waiting times are estimated from the durations of finished jobs of the same
+ protocol, or else of archived runs of it (see archive.py), by replaying the
+ queue on the devices.
+
+ Usage: python job_queue.py submit <protocol> [chip=<ID>] [option=value...]
+        python job_queue.py list [states...]
+        python job_queue.py cancel <job>
+        python job_queue.py run [devices...]    (dispatch until queue is empty)
+        python job_queue.py serve [devices...]  (dispatch until Ctrl-C)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import sqlite3
+import ConfigParser
+
+from orchestrator import Device, Device_pool, device_config, override, PROTOCOL_METHODS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, protocol TEXT, overrides TEXT, chip TEXT, state TEXT,
+	device TEXT, submitted REAL, start REAL, end REAL, duration REAL, cycles INTEGER, log TEXT, error TEXT);
+CREATE INDEX IF NOT EXISTS job_state ON jobs (state, id);
+"""
+
+JOB_FIELDS = ['id', 'protocol', 'overrides', 'chip', 'state', 'device', 'submitted', 'start', 'end', 'duration', 'cycles', 'log', 'error']
+STATES = ['queued', 'running', 'finished', 'failed', 'cancelled']
+POLL = 1.0  # dispatch loop period (s)
+
+class Job_queue:
+
+	def __init__(self, directory, archive_dir=None):
+		"""Initialize job queue kept in directory, creating it and its SQLite database if missing. Runs
+		archived in archive_dir complete the duration history of waiting time estimates."""
+
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self.directory = directory
+		self.archive_dir = archive_dir
+		self.db = sqlite3.connect(os.path.join(directory, 'queue.db'), timeout=30)  # wait for other terminals' writes
+		self.db.executescript(SCHEMA)
+
+	def close(self):
+		self.db.close()
+
+#------------------------------------ Submission ---------------------------------------
+
+	def submit(self, protocol, overrides=None, chip=None):
+		"""Queues run of protocol (method name or protocol file) with overrides, a list of (key, value)
+		configuration options, on chip ID. Returns job id."""
+
+		if protocol not in PROTOCOL_METHODS:
+			if not os.path.exists(protocol):
+				raise ValueError("No protocol file: %s" % protocol)
+			protocol = os.path.abspath(protocol)  # scheduler may run elsewhere
+
+		cursor = self.db.execute("INSERT INTO jobs (protocol, overrides, chip, state, submitted) VALUES (?, ?, ?, 'queued', ?)",
+					 (protocol, json.dumps(overrides or []), chip, time.time()))
+		self.db.commit()
+		return cursor.lastrowid
+
+	def cancel(self, job):
+		"Cancels job unless it left the queue already, returns True if it was cancelled"
+
+		cursor = self.db.execute("UPDATE jobs SET state = 'cancelled', end = ? WHERE id = ? AND state = 'queued'", (time.time(), job))
+		self.db.commit()
+		return cursor.rowcount > 0
+
+#------------------------------------- Dispatch ----------------------------------------
+
+	def claim(self, device):
+		"Moves oldest queued job to running state on device and returns it, or None if queue is empty"
+
+		self.db.execute("BEGIN IMMEDIATE")  # no other process claims in between
+		row = self.db.execute("SELECT id FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+		if row is None:
+			self.db.commit()
+			return None
+
+		self.db.execute("UPDATE jobs SET state = 'running', device = ?, start = ? WHERE id = ?", (device, time.time(), row[0]))
+		self.db.commit()
+		return self.job(row[0])
+
+	def finish(self, job, state, duration=None, cycles=None, log=None, error=None):
+		"Records end of running job in state finished or failed, with its duration (s), cycles, log and error"
+
+		self.db.execute("UPDATE jobs SET state = ?, end = ?, duration = ?, cycles = ?, log = ?, error = ? WHERE id = ?",
+				(state, time.time(), duration, cycles, log, error, job))
+		self.db.commit()
+
+	def recover(self):
+		"Fails jobs left running by a scheduler that stopped, returns their ids"
+
+		jobs = [row[0] for row in self.db.execute("SELECT id FROM jobs WHERE state = 'running'")]
+		self.db.execute("UPDATE jobs SET state = 'failed', end = ?, error = 'Scheduler stopped during run' WHERE state = 'running'", (time.time(),))
+		self.db.commit()
+		return jobs
+
+#------------------------------------- Queries -----------------------------------------
+
+	def job(self, job):
+		"Returns job dictionary of job id, its overrides a list of (key, value) pairs"
+
+		row = self.db.execute("SELECT %s FROM jobs WHERE id = ?" % ', '.join(['"%s"' % f for f in JOB_FIELDS]), (job,)).fetchone()
+		if row is None:
+			raise ValueError("No job %s" % job)
+		return self.record(row)
+
+	def jobs(self, states=None):
+		"Returns list of job dictionaries in given states [default: all], in submission order"
+
+		for state in states or []:
+			if state not in STATES:
+				raise ValueError("Unknown job state: %s" % state)
+
+		sql = "SELECT %s FROM jobs" % ', '.join(['"%s"' % f for f in JOB_FIELDS])
+		args = []
+		if states:
+			sql += " WHERE state IN (%s)" % ', '.join(['?'] * len(states))
+			args = list(states)
+
+		return [self.record(row) for row in self.db.execute(sql + " ORDER BY id", args)]
+
+	def record(self, row):
+		"Returns job dictionary of database row"
+
+		job = dict(zip(JOB_FIELDS, row))
+		job['overrides'] = [tuple(option) for option in json.loads(job['overrides'])]
+		return job
+
+#------------------------------------ Estimates ----------------------------------------
+
+	def durations(self, protocol):
+		"Returns list of durations (s) of finished runs of protocol, queued jobs first and archived runs else"
+
+		durations = [row[0] for row in self.db.execute("SELECT duration FROM jobs WHERE state = 'finished' AND protocol = ? AND duration IS NOT NULL", (protocol,))]
+
+		if not durations and self.archive_dir is not None and os.path.exists(os.path.join(self.archive_dir, 'index.db')):
+			archive = sqlite3.connect(os.path.join(self.archive_dir, 'index.db'))
+			like = '%' + protocol.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')  # labels end with protocol, see orchestrator.py and daemon.py
+			durations = [row[0] for row in archive.execute("SELECT duration FROM runs WHERE status = 'finished' AND protocol LIKE ? ESCAPE '\\'", (like,))]
+			archive.close()
+
+		return durations
+
+	def estimate(self, protocol):
+		"Returns expected duration (s) of a run of protocol, the median of its past runs, or None without history"
+
+		durations = sorted(self.durations(protocol))
+		if not durations:
+			return None
+
+		middle = len(durations) // 2
+		if len(durations) % 2:
+			return durations[middle]
+		return (durations[middle - 1] + durations[middle]) / 2.0
+
+	def wait_times(self, devices, now=None):
+		"""Returns list of (job, expected wait, expected duration) of queued jobs, dispatched in order to
+		the first of devices (names) to become idle. Running jobs keep their device for the rest of their
+		expected duration. Times are in seconds, None once a job of unknown duration is ahead."""
+
+		if now is None:
+			now = time.time()
+
+		estimates = {}
+		def expected(protocol):
+			if protocol not in estimates:
+				estimates[protocol] = self.estimate(protocol)
+			return estimates[protocol]
+
+		idle = dict([(device, 0.0) for device in devices])  # device -> seconds until idle
+		for job in self.jobs(['running']):
+			if job['device'] in idle:
+				duration = expected(job['protocol'])
+				if duration is None:
+					idle[job['device']] = None
+				else:
+					idle[job['device']] = max(0.0, duration - (now - job['start']))
+
+		waits = []
+		for job in self.jobs(['queued']):
+			duration = expected(job['protocol'])
+
+			known = [(t, device) for (device, t) in idle.items() if t is not None]
+			if not known:
+				waits.append((job, None, duration))
+				continue
+
+			wait, device = min(known)
+			waits.append((job, wait, duration))
+			if duration is None:
+				idle[device] = None
+			else:
+				idle[device] = wait + duration
+
+		return waits
+
+#--------------------------------------------------------------------------------------#
+#				JOB SCHEDULER					       #
+#--------------------------------------------------------------------------------------#
+
+class Job_scheduler(Device_pool):
+
+	def __init__(self, config, queue, names=None, logger=None, writer=None, serial_factory=None):
+		"Initialize scheduler dispatching the jobs of queue to the devices of the pool, see Device_pool"
+
+		Device_pool.__init__(self, config, names, logger, writer, serial_factory)
+
+		self.queue = queue
+		self.quit.set()  # queued runs end their final hold right away
+
+		self.running = {}  # device name -> (job, Device thread)
+		self.lock = None  # scheduler lock file, see run
+
+	def dispatch(self):
+		"Starts oldest queued job on every idle device, returns number of jobs started"
+
+		started = 0
+		for name in self.names:
+			if name in self.running:
+				continue
+
+			job = self.queue.claim(name)
+			if job is None:
+				break
+
+			try:
+				config = device_config(self.config, name)
+				override(config, job['overrides'], 'Job %i' % job['id'])
+				config.set('communication', 'log_dir', os.path.join(config.get("communication","log_dir"), 'job%i' % job['id']))
+			except ValueError, e:
+				self.logging.error("-\t--> Job %i rejected: %s" % (job['id'], e))
+				self.queue.finish(job['id'], 'failed', error=str(e))
+				continue
+
+			expected = self.queue.estimate(job['protocol'])
+			self.logging.info("*\t--> Job %i [chip %s] dispatched to %s: %s%s" % (job['id'], job['chip'], name, job['protocol'],
+					  expected is not None and ' - expected duration: %0.1f minutes' % (expected / 60) or ''))
+
+			device = Device(name, config, job['protocol'], self.logging, self.writer, self.telemetry, self, job['chip'])
+			self.running[name] = (job, device)
+			device.start()
+			started += 1
+
+		return started
+
+	def reap(self):
+		"Records every ended job in queue and frees its device, returns number of jobs ended"
+
+		ended = 0
+		for name, (job, device) in self.running.items():
+			if device.is_alive():
+				continue
+
+			tc = device.temperature_control
+			log = getattr(tc, 'logfile_path', None)
+			duration = run_duration(log, device.end_time - device.start_time)
+			cycles = None
+			if tc is not None:
+				cycles = tc.cycle
+
+			self.queue.finish(job['id'], device.status, duration, cycles, log, device.error)
+			self.logging.info("*\t--> Job %i %s on %s - duration: %0.1f minutes%s" % (job['id'], device.status, name, duration / 60, device.error and ' - %s' % device.error or ''))
+
+			if tc is not None:
+				tc.serial.close()  # port is opened again by next job
+			del self.running[name]
+			ended += 1
+
+		return ended
+
+	def report(self):
+		"Logs expected waiting time of every queued job"
+
+		for job, wait, duration in self.queue.wait_times(self.names):
+			if wait is None:
+				self.logging.info("*\t--> Job %i [chip %s] queued: %s - waiting time unknown" % (job['id'], job['chip'], job['protocol']))
+			else:
+				self.logging.info("*\t--> Job %i [chip %s] queued: %s - expected start in %0.1f minutes" % (job['id'], job['chip'], job['protocol'], wait / 60))
+
+	def run(self, forever=False):
+		"""Dispatches queued jobs to idle devices until queue is empty and all jobs ended [or until Ctrl-C,
+		if forever is set]. After Ctrl-C no further job is started, running jobs are waited for."""
+
+		self.lock = open(os.path.join(self.queue.directory, 'scheduler.lock'), 'w')
+		try:
+			fcntl.flock(self.lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except IOError:
+			raise IOError("Another scheduler is dispatching jobs of %s" % self.queue.directory)
+
+		for job in self.queue.recover():
+			self.logging.warn("*\t--> Job %i failed: scheduler stopped during run" % job)
+
+		self.logging.info("*\t--> Schedule jobs on %i device(s): %s" % (len(self.names), ', '.join(self.names)))
+		self.report()
+
+		stopping = False
+		while True:
+			try:
+				if self.reap() and not stopping:
+					self.report()
+				if not stopping:
+					self.dispatch()
+
+				if not self.running and (stopping or not forever and not self.queue.jobs(['queued'])):
+					break
+
+				with self.done:
+					self.done.wait(POLL)
+
+			except KeyboardInterrupt:
+				if stopping:
+					raise
+				stopping = True
+				self.logging.warn("*\t--> Stop dispatching, waiting for %i running job(s) [Ctrl-C again to abort]" % len(self.running))
+
+		self.telemetry.close()
+		self.lock.close()
+
+def run_duration(path, default):
+	"Returns time span (s) of temperature log-file path, or default if it has no two samples"
+
+	if path is None or not os.path.exists(path):
+		return default
+
+	import analytics
+
+	try:
+		columns = analytics.load(path)
+	except Exception:
+		return default
+
+	if len(columns[0]) < 2:
+		return default
+	return float(columns[0][-1] - columns[0][0])
+
+if __name__ == '__main__':
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+
+	queue = Job_queue(config.get("communication","queue_dir"), config.get("communication","archive_dir"))
+	command = len(sys.argv) > 1 and sys.argv[1] or 'list'
+
+	if command == 'submit' and len(sys.argv) > 2:
+		chip = None
+		overrides = []
+		for argument in sys.argv[3:]:
+			key, value = argument.split('=', 1)
+			if key == 'chip':
+				chip = value
+			else:
+				overrides.append((key, value))
+
+		devices = [name.strip() for name in config.get("orchestrator","devices").split(',') if name.strip()]
+		try:
+			override(device_config(config, devices[0]), overrides, 'Job')  # reject unknown options right away
+			job = queue.submit(sys.argv[2], overrides, chip)
+		except ValueError, e:
+			print '--> Error: %s' % e
+			sys.exit()
+
+		for queued, wait, duration in queue.wait_times(devices):
+			if queued['id'] == job:
+				print 'Job %i queued - expected start in %s' % (job, wait is None and 'unknown time' or '%0.1f minutes' % (wait / 60))
+
+	elif command == 'list':
+		print 'JOB\tSTATE\t\tDEVICE\tCHIP\tMIN\tPROTOCOL'
+		for job in queue.jobs(sys.argv[2:]):
+			print '%i\t%-9s\t%s\t%s\t%s\t%s%s' % (job['id'], job['state'], job['device'] or '-', job['chip'] or '-',
+				job['duration'] is not None and '%0.1f' % (job['duration'] / 60) or '-', job['protocol'], job['error'] and ' [%s]' % job['error'] or '')
+
+	elif command == 'cancel' and len(sys.argv) > 2:
+		if queue.cancel(int(sys.argv[2])):
+			print 'Job %s cancelled' % sys.argv[2]
+		else:
+			print 'Job %s is not queued' % sys.argv[2]
+
+	elif command in ('run', 'serve'):
+		from logger import Logger
+		from log_writer import Log_writer
+
+		writer = None
+		if config.get("communication","writer_option") == '1':
+			writer = Log_writer(config)
+			writer.start()
+
+		logger = Logger(config, writer=writer)
+		Job_scheduler(config, queue, sys.argv[2:], logger, writer).run(forever=(command == 'serve'))
+
+		if writer is not None:
+			writer.close()
+
+	else:
+		print '--> Usage: python job_queue.py submit <protocol> [chip=<ID>] [option=value...] | list [states...] | cancel <job> | run|serve [devices...]'
+
+	queue.close()
@@ -0,0 +1,181 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Log_writer, the
+ background thread performing all log-file and console output of a run, in
+ Python. Writers hand their text to a bounded queue and return at once; the
+ thread writes it out, flushes once writer_batch bytes are pending or
+ flush_interval seconds passed, and fsyncs every fsync_interval seconds. When
+ the queue is full a record is dropped and counted instead of blocking, so disk
+ or console stalls never delay temperature sampling.
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import time
+import Queue
+import atexit
+import logging
+import threading
+
+CLOSE = object()  # queue marker: close stream
+STOP = object()  # queue marker: stop writer thread
+
+class Log_writer(threading.Thread):
+
+	def __init__(self, config):
+		"Initialize log writer thread with queue size, batch, flush and fsync policy of configuration file"
+
+		threading.Thread.__init__(self)
+		self.daemon = True  # never keep process alive on exit, see close()
+
+		self.queue = Queue.Queue(int(config.get("communication","writer_queue")))
+		self.batch = int(config.get("communication","writer_batch"))  # bytes pending before flush
+		self.flush_interval = float(config.get("communication","flush_interval"))  # s
+		self.fsync_interval = float(config.get("communication","fsync_interval"))  # s, 0 disables fsync
+
+		self.dropped = 0  # number of records dropped on full queue
+		self.failed = set()  # streams that raised on write, flush or close, skipped from then on
+		self.lock = threading.Lock()
+		atexit.register(self.close)  # drain queue even after sys.exit()
+
+	def write(self, stream, data):
+		"""Queues data to be written into stream, returns False if it was dropped on a full queue.
+		Unless writer thread is running, data is written right away."""
+
+		if not self.is_alive():
+			stream.write(data)
+			return True
+
+		try:
+			self.queue.put_nowait((stream, data))
+		except Queue.Full:
+			with self.lock:
+				self.dropped += 1
+			return False
+		return True
+
+	def close_stream(self, stream):
+		"Closes stream once all data queued before is written, a closed stream is left alone"
+
+		if getattr(stream, 'closed', False):
+			return
+		if self.is_alive():
+			self.queue.put((stream, CLOSE))  # never dropped
+		else:
+			stream.close()
+
+	def run(self):
+		"Writer loop: writes queued data, flushes and fsyncs streams by batch and time policy"
+
+		dirty = set()  # streams written since last flush
+		unsynced = set()  # streams flushed since last fsync
+		pending = 0  # bytes written since last flush
+		last_flush = last_sync = time.time()
+
+		while True:
+			try:
+				item = self.queue.get(timeout=max(0, last_flush + self.flush_interval - time.time()))
+			except Queue.Empty:
+				item = None
+
+			if item is STOP:
+				break
+
+			if item is not None:
+				stream, data = item
+
+				if data is CLOSE:
+					dirty.discard(stream)
+					unsynced.discard(stream)
+					if not getattr(stream, 'closed', False):  # closed twice otherwise
+						self.guard(stream, self.sync, stream)
+						self.guard(stream, stream.close)
+				elif stream not in self.failed and self.guard(stream, stream.write, data):
+					dirty.add(stream)
+					pending += len(data)
+
+			now = time.time()
+			if pending >= self.batch or now - last_flush >= self.flush_interval:
+				for stream in dirty:
+					if self.guard(stream, stream.flush):
+						unsynced.add(stream)
+				dirty.clear()
+				pending = 0
+				last_flush = now
+
+			if self.fsync_interval > 0 and now - last_sync >= self.fsync_interval:
+				for stream in unsynced:
+					self.guard(stream, self.sync, stream)
+				unsynced.clear()
+				last_sync = now
+
+		for stream in dirty | unsynced:
+			self.guard(stream, self.sync, stream)
+
+	def guard(self, stream, operation, *args):
+		"""Returns True once operation on stream succeeded; an error is reported once per stream and
+		leaves the stream out of further writes, so one broken stream never stops the others"""
+
+		try:
+			operation(*args)
+			return True
+		except (IOError, OSError, ValueError), e:
+			if stream not in self.failed:
+				self.failed.add(stream)
+				sys.__stderr__.write("ERROR\t -\t--> Log writer cannot write %s: %s\n" % (getattr(stream, 'name', stream), e))
+			return False
+
+	def sync(self, stream):
+		"Flushes stream and commits it to disk if it is a regular file"
+
+		stream.flush()
+
+		if self.fsync_interval > 0:
+			try:
+				os.fsync(stream.fileno())
+			except (AttributeError, OSError):
+				pass  # console or pipe, nothing to commit
+
+	def close(self):
+		"Writes out all queued data and stops writer thread, returns number of dropped records"
+
+		if self.is_alive():
+			self.queue.put(STOP)
+			self.join()
+		return self.dropped
+
+class Queued_file:
+
+	def __init__(self, writer, stream):
+		"Initialize file-like object writing into stream through log writer"
+
+		self.writer = writer
+		self.stream = stream
+		self.closed = False
+
+	def write(self, data):
+		self.writer.write(self.stream, data)
+
+	def flush(self):
+		pass  # flushed by writer thread
+
+	def close(self):
+		if not self.closed:  # close once, however often called
+			self.closed = True
+			self.writer.close_stream(self.stream)
+
+class Queued_handler(logging.Handler):
+
+	def __init__(self, writer, stream):
+		"Initialize logging handler formatting records on the caller thread and writing them through log writer"
+
+		logging.Handler.__init__(self)
+		self.writer = writer
+		self.stream = stream
+
+	def emit(self, record):
+		try:
+			self.writer.write(self.stream, self.format(record) + '\n')
+		except Exception:
+			self.handleError(record)
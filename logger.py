@@ -16,30 +16,64 @@
 """
 
 import os
+import sys
 import time
 import logging
 
+from log_writer import Queued_handler
+
+class Clock_filter(logging.Filter):
+
+	def __init__(self, clock):
+		"Initialize filter stamping log records with time of clock"
+		logging.Filter.__init__(self)
+		self.clock = clock
+
+	def filter(self, record):
+		"Replaces creation time of record with current clock time"
+		record.created = self.clock.time()
+		record.msecs = (record.created - int(record.created)) * 1000
+		return True
+
 class Logger:
 
-	def __init__(self, config):
-		"""Initialize logging facility with default parameters"""
+	def __init__(self, config, clock=None, writer=None):
+		"""Initialize logging facility with default parameters. Records are time stamped by clock if 
+		given (e.g. a Virtual_clock of a simulated run), otherwise by wall-clock time. If a Log_writer
+		is given, log-file and console output is performed by its thread."""
 
 		if os.access(config.get("communication","log_dir"), os.F_OK) is False:
 			os.mkdir(config.get("communication","log_dir"))
 
-		logging.basicConfig(level=logging.DEBUG,	# set logger format configuration parameters
-				    format='%(asctime)s.%(msecs)03d %(name)-12s %(levelname)-8s %(message)s',
-				    datefmt='%m-%d %H:%M:%S',
-				    filename = config.get("communication","log_dir") + 'pcr_process.log',
-				    filemode='a')
+		fmt = '%(asctime)s.%(msecs)03d %(name)-12s %(levelname)-8s %(message)s'
+		datefmt = '%m-%d %H:%M:%S'
+		filename = config.get("communication","log_dir") + 'pcr_process.log'
+
+		if writer is None:
+			logging.basicConfig(level=logging.DEBUG,	# set logger format configuration parameters
+					    format=fmt,
+					    datefmt=datefmt,
+					    filename = filename,
+					    filemode='a')
+		else:
+			process_log = Queued_handler(writer, open(filename, 'a'))	# same format, written by log writer thread
+			process_log.setFormatter(logging.Formatter(fmt, datefmt))
+			logging.getLogger('').addHandler(process_log)
+			logging.getLogger('').setLevel(logging.DEBUG)
 
 		formatter = logging.Formatter('%(levelname)-8s %(message)s')	# set a format which is simpler for console use
 
-		console = logging.StreamHandler()	# define a Handler which writes INFO messages or higher to the sys.stderr
+		if writer is None:
+			console = logging.StreamHandler()	# define a Handler which writes INFO messages or higher to the sys.stderr
+		else:
+			console = Queued_handler(writer, sys.stderr)
 		console.setLevel(logging.INFO)
 		console.setFormatter(formatter)	# tell the handler to use this format
 		logging.getLogger('').addHandler(console)	# add the handler to the root logger
 
+		if clock is not None:
+			logging.getLogger('').addFilter(Clock_filter(clock))	# stamp records with clock time
+
 		loglevel = 1
 
 	def log(self, level, message):
@@ -62,3 +96,26 @@ class Logger:
 		"Diplays a debugging message via logging facility."
 		logging.debug(message)
 
+
+class Device_logger:
+
+	def __init__(self, logger, device):
+		"Initialize logger of named device, whose messages go to the shared logger prefixed by device name"
+
+		self.logger = logger
+		self.prefix = '[%s] ' % device
+
+	def log(self, level, message):
+		self.logger.log(level, self.prefix + message)
+
+	def warn(self, message):
+		self.logger.warn(self.prefix + message)
+
+	def info(self, message):
+		self.logger.info(self.prefix + message)
+
+	def error(self, message):
+		self.logger.error(self.prefix + message)
+
+	def debug(self, message):
+		self.logger.debug(self.prefix + message)
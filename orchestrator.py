@@ -0,0 +1,298 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the multi-controller orchestrator in Python. It
+ runs one PCR protocol per temperature controller concurrently, one thread per
+ device. The devices are the sections named by 'devices' in section
+ [orchestrator] of config.txt:
+
+ [orchestrator]
+ devices = chip1, chip2
+
+ [chip1]
+ serial_port = /dev/ttyS0
+ log_dir = /home/.../process_logs/chip1/
+ protocol = pcr_wo_trigger        (protocol file, pcr_wo_trigger or pcr_wi_trigger)
+ temp3 = 42                       (any [communication] / [pcr_parameters] option)
+
+ All devices share one process log (messages prefixed by device name), one log
+ writer thread and one telemetry stream (lines tagged by device name). A failing
+ device turns its control off and is archived as failed; the others go on. The
+ final hold of the devices ends with a single 'Q' prompt once all devices got
+ there.
+
+ Usage: python orchestrator.py [devices...]  (default: all configured devices)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import traceback
+import ConfigParser
+
+from logger import Logger, Device_logger
+from telemetry import Telemetry, Null_telemetry, Device_telemetry
+
+SECTIONS = ['communication', 'pcr_parameters']  # sections a device section overrides
+PROTOCOL_METHODS = ['pcr_wo_trigger', 'pcr_wi_trigger']
+
+def device_config(config, name):
+	"""Returns copy of configuration with the options of device section name applied; its checkpoint
+	file is named after the device unless given. Raises ValueError on an unknown option."""
+
+	device = ConfigParser.ConfigParser()
+	for section in config.sections():
+		device.add_section(section)
+		for key, value in config.items(section, raw=True):
+			device.set(section, key, value)
+
+	device.set('pcr_parameters', 'checkpoint_file', '%s-%s' % (name, config.get('pcr_parameters', 'checkpoint_file')))
+
+	override(device, [(key, value) for (key, value) in config.items(name, raw=True) if key != 'protocol'], 'Device %s' % name)
+
+	device.set('communication', 'telemetry_option', '0')  # published on shared stream
+	return device
+
+def override(config, options, owner):
+	"""Sets (key, value) options in the section of config that holds them. Raises ValueError naming owner
+	on an unknown option."""
+
+	for key, value in options:
+		for section in SECTIONS:
+			if config.has_option(section, key):
+				config.set(section, key, value)
+				break
+		else:
+			raise ValueError("%s: unknown option %s" % (owner, key))
+
+class Device(threading.Thread):
+
+	def __init__(self, name, config, protocol, logger, writer, telemetry, orchestrator, chip=None):
+		"""Initialize thread running protocol (file or PCR method name) on the temperature controller of
+		device name, configured by config, for chip ID"""
+
+		threading.Thread.__init__(self, name=name)
+		self.daemon = True  # never keep process alive on exit
+
+		self.config = config
+		self.protocol = protocol
+		self.chip = chip
+		self.logging = Device_logger(logger, name)
+		self.writer = writer
+		self.telemetry = telemetry
+		self.orchestrator = orchestrator
+
+		self.temperature_control = None
+		self.status = 'waiting'
+		self.error = None
+		self.start_time = None
+		self.end_time = None
+
+	def run(self):
+		"Runs protocol on device; any failure stays with this device"
+
+		self.start_time = time.time()
+		self.status = 'running'
+
+		try:
+			tc = self.temperature_control = self.orchestrator.connect(self)
+			tc.telemetry = Device_telemetry(self.telemetry, self.name)
+			tc.press_q_to_exit = self.hold_final
+
+			log_dir = self.config.get("communication","log_dir")
+			if not os.path.isdir(log_dir):
+				os.makedirs(log_dir)
+			tc.open_logfile(log_dir, self.writer, '%s-pcr_temperature' % self.name)
+
+			if tc.sampler_option == 1:
+				tc.start_sampler()
+
+			tc.set_control_on()
+			if self.protocol in PROTOCOL_METHODS:
+				getattr(tc, self.protocol)()
+			else:
+				tc.run_protocol(self.protocol)
+
+			self.status = 'finished'
+
+		except Exception, e:
+			self.status = 'failed'
+			self.error = "%s: %s" % (e.__class__.__name__, e)
+			self.logging.error("-\t--> Device failed: %s" % traceback.format_exc())
+
+			if self.temperature_control is not None:
+				try:
+					self.temperature_control.set_control_off()  # leave chip unheated
+				except Exception, e:
+					self.logging.error("-\t--> Cannot turn control off: %s" % e)
+
+		self.end_time = time.time()
+		self.orchestrator.device_done(self)
+		self.close()
+
+	def close(self):
+		"Stops sampler, closes temperature log-file and archives run"
+
+		tc = self.temperature_control
+		if tc is None:
+			return
+
+		tc.stop_sampler()
+		if getattr(tc, 'logfile', None) is not None:
+			tc.logfile.close()
+
+		if self.config.get("communication","archive_option") == '1' and getattr(tc, 'logfile_path', None) is not None:
+			from archive import Archive
+
+			try:
+				archive = Archive(self.config.get("communication","archive_dir"))
+				run = archive.add_run(self.config, tc.logfile_path, start=self.start_time, end=self.end_time,
+						      cycles=tc.cycle, protocol='%s: %s' % (self.name, self.protocol), status=self.status, chip=self.chip,
+						      set_points=tc.set_points)
+				archive.close()
+				self.logging.info("%i\t--> Archived run %i [%s]" % (tc.cycle, run, self.status))
+			except Exception, e:
+				self.logging.error("%i\t--> Cannot archive run: %s" % (tc.cycle, e))
+
+	def hold_final(self):
+		"Holds final cooling step until all devices are done and the operator quits, then turns control off"
+
+		tc = self.temperature_control
+		tc.announcer.say('press_q_to_exit')
+		tc.logging.info("%i\t--> Holding final cooling step" % tc.cycle)
+
+		self.status = 'holding'
+		self.orchestrator.device_done(self)
+		self.orchestrator.quit.wait()
+
+		tc.set_control_off()
+		tc.clear_checkpoint()
+
+class Device_pool:
+
+	def __init__(self, config, names=None, logger=None, writer=None, serial_factory=None):
+		"""Initialize pool of the devices names [default: all devices of configuration], logging into
+		logger, writing logs by writer and publishing on one shared telemetry stream. Each device's port
+		is opened by serial_factory(port) [default: serial.Serial]. Raises ValueError on a device without
+		section."""
+
+		if names is None or len(names) == 0:
+			names = [name.strip() for name in config.get("orchestrator","devices").split(',') if name.strip()]
+
+		for name in names:
+			if not config.has_section(name):
+				raise ValueError("No device section: %s" % name)
+
+		self.config = config
+		self.names = names
+		self.logging = logger
+		self.writer = writer
+		self.serial_factory = serial_factory
+
+		self.telemetry = Null_telemetry()
+		if config.get("communication","telemetry_option") == '1':
+			try:
+				self.telemetry = Telemetry(config.get("communication","telemetry_socket"), logger)
+				self.telemetry.start()
+			except socket.error, e:
+				logger.warn("-\t--> Telemetry not published: %s" % e)
+
+		from temperature_control import log_config_parameters
+		log_config_parameters(config, logger)  # once for all devices, device sections included
+
+		self.quit = threading.Event()  # set once final hold of devices ends
+		self.done = threading.Condition()
+
+	def connect(self, device):
+		"Returns temperature controller object of device, connected to its serial port"
+
+		from temperature_control import Temperature_control
+
+		port = device.config.get("communication","serial_port")
+		if self.serial_factory is None:
+			import serial
+			connection = serial.Serial(port)
+		else:
+			connection = self.serial_factory(port)
+		device.logging.info("-\t--> Serial connection established on %s" % port)
+
+		return Temperature_control(device.config, connection, device.logging, log_config=False)
+
+	def device_done(self, device):
+		"Notifies that device finished, failed or reached its final hold"
+
+		with self.done:
+			self.done.notify_all()
+
+class Orchestrator(Device_pool):
+
+	def __init__(self, config, names=None, logger=None, writer=None, serial_factory=None):
+		"Initialize orchestrator running the protocol of every device of the pool concurrently, see Device_pool"
+
+		Device_pool.__init__(self, config, names, logger, writer, serial_factory)
+
+		self.devices = []
+		for name in self.names:
+			protocol = 'pcr_wo_trigger'
+			if config.has_option(name, 'protocol'):
+				protocol = config.get(name, 'protocol')
+				if protocol not in PROTOCOL_METHODS:
+					protocol = os.path.abspath(protocol)  # relative to where orchestrator is started
+			self.devices.append(Device(name, device_config(config, name), protocol, logger, writer, self.telemetry, self))
+
+	def run(self, prompt=True):
+		"""Runs all devices concurrently until each one finished, failed or holds its final step, then
+		asks operator to quit final hold (if prompt is set) and waits for all devices. Returns list of
+		(device name, status, error) triples."""
+
+		self.logging.info("*\t--> Orchestrate %i device(s): %s" % (len(self.devices), ', '.join([d.name for d in self.devices])))
+		for device in self.devices:
+			device.start()
+
+		with self.done:
+			while [d for d in self.devices if d.status in ('waiting', 'running')]:
+				self.done.wait(1)
+
+		if prompt and [d for d in self.devices if d.status == 'holding']:
+			sys.stdout.write("PROMPT\t *\t--> Press 'Q' to quit final cooling step of all devices: ")
+			while sys.stdin.readline().strip() not in ('Q', 'q'):
+				sys.stdout.write("PROMPT\t *\t--> Press 'Q' to quit final cooling step of all devices: ")
+
+		self.quit.set()
+		for device in self.devices:
+			device.join()
+
+		for device in self.devices:
+			self.logging.info("*\t--> Device %s %s%s" % (device.name, device.status, device.error and ' - %s' % device.error or ''))
+
+		self.telemetry.close()
+		return [(d.name, d.status, d.error) for d in self.devices]
+
+if __name__ == '__main__':
+
+	from log_writer import Log_writer
+
+	print '\nINFO\t *\t--> START ORCHESTRATOR - orchestrator.py\n'
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+
+	writer = None
+	if config.get("communication","writer_option") == '1':
+		writer = Log_writer(config)
+		writer.start()
+
+	logger = Logger(config, writer=writer)
+
+	t0 = time.time()
+	results = Orchestrator(config, sys.argv[1:], logger, writer).run()
+	logger.warn("*\t--> Finished %i device(s), %i failed - duration: %.2f minutes" % (len(results), len([r for r in results if r[1] == 'failed']), (time.time() - t0) / 60))
+
+	if writer is not None:
+		writer.close()
+
+	print 'INFO\t *\t--> END ORCHESTRATOR - orchestrator.py\n'
@@ -0,0 +1,246 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the overshoot set point planner in Python. For
+ every recorded ramp (e.g. process_logs/steady-state RT-90, 90-40, 40-70, 70-90)
+ it fits a thermal plant model of its own, then searches the overshoot set point
+ and switch-back (trigger) temperature minimizing the ramp time, i.e. the time
+ until wait_for_SS declares steady state at the target:
+
+	set_temperature(overshoot) -> pull_trigger(trigger) -> set_temperature(target)
+
+ The result is saved as trigger table, which protocol steps with 'overshoot =
+ auto' and pcr_wi_trigger use in place of the set_tempN / poll_tempN keys.
+
+ Usage: python planner.py [logs...]  (plan transitions of recorded ramps)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import ConfigParser
+
+AMBIENT = 25.0  # start temperature of a first step (C)
+SET_LIMITS = (0.0, 100.0)  # set point range allowed for overshoot (C)
+MATCH = 5.0  # largest start and target difference (C) of a table transition applied to a step
+HORIZON = 600.0  # longest simulated ramp (s)
+
+class Transition_table:
+
+	KEYS = ('start', 'target')  # transition keys written by save
+
+	def __init__(self, transitions):
+		"Initialize table of transition dictionaries (name, start, target, ...)"
+
+		self.transitions = transitions
+
+	@classmethod
+	def load(cls, path):
+		"Returns table read from ConfigParser formatted file, one section per transition"
+
+		config = ConfigParser.ConfigParser()
+		config.optionxform = str  # keep case of PID option names
+
+		if not config.read(path):
+			raise IOError("Cannot read transition table: %s" % path)
+
+		transitions = []
+		for section in config.sections():
+			transition = {'name': section}
+			for key, value in config.items(section):
+				transition[key] = float(value)
+			transitions.append(transition)
+		return cls(transitions)
+
+	def save(self, path):
+		"Writes table into ConfigParser formatted file"
+
+		f = open(path, 'w')
+		for transition in self.transitions:
+			f.write("[%s]\n\n" % transition['name'])
+			for key in self.KEYS:
+				f.write("%s = %0.2f\n" % (key, transition[key]))
+			f.write("\n")
+		f.close()
+
+	def nearest(self, start, target):
+		"""Returns closest transition of the same direction to ramp from start [default: AMBIENT] to target
+		temperature (C), or None if no transition lies within MATCH degrees on both ends"""
+
+		if start is None:
+			start = AMBIENT
+
+		best = None
+		for transition in self.transitions:
+			if (transition['target'] - transition['start']) * (target - start) <= 0:
+				continue  # opposite ramp direction
+
+			distance = max(abs(transition['start'] - start), abs(transition['target'] - target))
+			if distance <= MATCH and (best is None or distance < best[0]):
+				best = (distance, transition)
+
+		if best is None:
+			return None
+		return best[1]
+
+class Trigger_table(Transition_table):
+
+	KEYS = ('start', 'target', 'overshoot', 'trigger', 'ramp_time', 'plain_time')
+
+	def lookup(self, start, target):
+		"""Returns (overshoot, trigger) temperatures of ramp from start to target temperature (C), taken
+		as offsets to the target from the closest planned transition, or None if there is none"""
+
+		transition = self.nearest(start, target)
+		if transition is None:
+			return None
+
+		return (target + transition['overshoot'] - transition['target'], target + transition['trigger'] - transition['target'])
+
+#--------------------------------------------------------------------------------------#
+#				RAMP OPTIMIZATION				       #
+#--------------------------------------------------------------------------------------#
+
+def ramp_time(parameters, start, target, gains, overshoot, trigger, tolerance, criteria, sampling_time, horizon):
+	"""Returns simulated time (s) from start until wait_for_SS detects steady state at target under PID
+	gains (pb, ig, dg), ramping to overshoot set point first and switching back once the control
+	temperature reaches trigger (or overshoot is None), sampling every sampling_time seconds. Returns
+	None if steady state is not reached within horizon (s)."""
+
+	from simulator import Thermal_plant, STEP
+	from steady_state import Steady_state
+
+	pb, ig, dg = gains
+	plant = Thermal_plant(parameters, start)
+	plant.hold(pb, ig)
+
+	detector = None
+	setpoint = target
+	if overshoot is not None:
+		setpoint = overshoot
+		rising = trigger >= start
+	else:
+		detector = Steady_state(target, tolerance, *criteria)
+
+	t = 0.0
+	next_sample = 0.0
+	while t < horizon:
+		plant.step(STEP, setpoint, pb, ig, dg)
+		t += STEP
+
+		if t < next_sample:
+			continue
+		next_sample += sampling_time
+
+		if detector is None:
+			ct = plant.control
+			if abs(trigger - ct) <= tolerance or (rising and ct >= trigger) or (not rising and ct <= trigger):
+				setpoint = target  # pull trigger
+				detector = Steady_state(target, tolerance, *criteria)
+		elif detector.add(t, plant.control):
+			return t
+
+	return None
+
+def plan_transition(parameters, start, target, gains, tolerance, criteria, sampling_time, horizon):
+	"""Returns transition dictionary with overshoot set point and trigger temperature minimizing ramp
+	time from start to target (grid search with local refinement), along with the ramp time and the
+	plain ramp time without overshoot"""
+
+	def cost(overshoot, trigger):
+		t = ramp_time(parameters, start, target, gains, overshoot, trigger, tolerance, criteria, sampling_time, horizon)
+		if t is None:
+			return horizon * 2
+		return t
+
+	direction = cmp(target, start)
+	span = abs(target - start)
+	limit = max(SET_LIMITS[0], min(SET_LIMITS[1], target + direction * 40))
+
+	plain = cost(None, None)
+	best = (plain, target, target)
+
+	for k in range(1, 41, 2):  # overshoot beyond target (C)
+		overshoot = target + direction * k
+		if direction * (overshoot - limit) > 0:
+			break
+		for f in range(20, 100, 5):  # trigger, percent of ramp span
+			trigger = start + direction * span * f / 100.0
+			t = cost(overshoot, trigger)
+			if t < best[0]:
+				best = (t, overshoot, trigger)
+
+	for step in (1.0, 0.5, 0.2):  # local refinement
+		t0, o0, p0 = best
+		for do in (-step, 0, step):
+			for dp in (-step, 0, step):
+				overshoot = o0 + do
+				if direction * (overshoot - target) <= 0 or direction * (overshoot - limit) > 0:
+					continue
+				t = cost(overshoot, p0 + dp)
+				if t < best[0]:
+					best = (t, overshoot, p0 + dp)
+
+	t, overshoot, trigger = best
+	return {'start': start, 'target': target, 'overshoot': overshoot, 'trigger': trigger, 'ramp_time': t, 'plain_time': plain}
+
+def endpoints(name, trace):
+	"""Returns (start, target) temperatures of transition named '<start>-<target>' (e.g. RT-90, 90-40),
+	as recorded logs begin late in the ramp; falls back to the first control and last set temperature"""
+
+	try:
+		start, target = name.split('-')
+		if start == 'RT':
+			return AMBIENT, float(target)
+		return float(start), float(target)
+	except ValueError:
+		return trace[2][0], trace[1][-1]
+
+def plan(traces, config):
+	"""Returns trigger table planned from list of (name, trace, gains) recorded ramps, with steady-state
+	criteria and sampling time of configuration file"""
+
+	from simulator import fit_plant
+
+	tolerance = float(config.get("pcr_parameters","temp_tolerance"))
+	criteria = [float(config.get("pcr_parameters", key)) for key in ('SS_window', 'SS_slope', 'SS_std')]
+	sampling_time = float(config.get("pcr_parameters","sampling_time"))
+
+	transitions = []
+	for name, trace, gains in traces:
+		parameters = fit_plant([(trace, gains)])  # plant model of this transition only
+		start, target = endpoints(name, trace)
+
+		transition = plan_transition(parameters, start, target, gains, tolerance, criteria, sampling_time, HORIZON)
+		transition['name'] = name
+		transitions.append(transition)
+
+	return Trigger_table(transitions)
+
+if __name__ == '__main__':
+
+	from simulator import STEADY_STATE, load_trace
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+
+	paths = STEADY_STATE
+	if len(sys.argv) > 1:
+		paths = [(path, (22, 2, 0)) for path in sys.argv[1:]]
+
+	traces = []
+	for path, gains in paths:
+		name = os.path.basename(path).replace('-temperature.log', '')
+		traces.append((name, load_trace(path), gains))
+
+	table = plan(traces, config)
+	path = os.path.join(config.get("communication","home_dir"), config.get("pcr_parameters","trigger_table"))
+
+	print "\nINFO\t -\t--> Planned transitions:\n"
+	print "%-8s %8s %8s %10s %9s %10s %10s" % ('name', 'start', 'target', 'overshoot', 'trigger', 'ramp (s)', 'plain (s)')
+	for t in table.transitions:
+		print "%-8s %8.2f %8.2f %10.2f %9.2f %10.1f %10.1f" % (t['name'], t['start'], t['target'], t['overshoot'], t['trigger'], t['ramp_time'], t['plain_time'])
+
+	table.save(path)
+	print "\nINFO\t -\t--> Saved trigger table: %s\n" % path
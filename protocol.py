@@ -0,0 +1,288 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Protocol, the
+ declarative PCR protocol engine in Python. A protocol file lists its steps in
+ ConfigParser format:
+
+ [protocol]
+ steps = initial_denaturation, cycling, final_hold   (top-level step order)
+ exit_prompt = 1                                      (press 'Q' to exit at end)
+
+ [cycling]                                            (repeat block)
+ repeat = 30
+ steps = denaturation, annealing, elongation
+ skip_first = denaturation                            (optional)
+
+ [annealing]                                          (temperature step)
+ temperature = 40         (set point, C)
+ overshoot = 0            (optional overshoot set point, C, or 'auto' to take it from trigger table)
+ trigger = 42             (switch-back temperature, C - required with numeric overshoot)
+ P_bandwidth = 15         (optional PID set, previous one is kept if missing)
+ I_gain = 10
+ D_gain = 0
+ hold = 30                (hold time, s)
+ wait = 1                 (wait for steady-state before hold [default: 1])
+ tolerance = 1            (steady-state and trigger tolerance, C [default: 1])
+ SS_window = 3            (optional steady-state window length, s)
+ SS_slope = 0.05          (optional largest window slope, C/s)
+ SS_std = 0.1             (optional largest window standard deviation, C)
+ increment = -0.5         (touchdown: set point change per repeat iteration, C)
+ increment_cycles = 10    (number of iterations the increment is applied)
+ gains = auto             (optional: take PID set from gain table, PID options above are the fallback)
+ clip = annealing         (optional speech clip announced at step start)
+ label = (inner) annealing step
+
+ The step list is compiled once into a flat execution plan of temperature
+ controller method calls, leaving out every PID write that would not change the
+ gains already set by the preceding step. A run saves a checkpoint before every
+ action of the plan, so an interrupted run resumes at the action it was in.
+
+ With a control-to-channel calibration (calibration_option, see calibration.py),
+ step temperatures are channel temperatures: the set point is the control
+ temperature holding the channel there, and steady state is awaited on the
+ estimated channel temperature.
+-------------------------------------------------------------------------------
+"""
+
+import hashlib
+import ConfigParser
+
+PID_METHODS = [('P_bandwidth', 'set_P_bandwidth'), ('I_gain', 'set_I_gain'), ('D_gain', 'set_D_gain')]
+SS_OPTIONS = ['SS_window', 'SS_slope', 'SS_std']  # steady-state criteria, configuration defaults if missing
+
+class Protocol:
+
+	def __init__(self, name, steps, sections, exit_prompt=False, triggers=None, gain_table=None, source=None, calibration=None):
+		"""Initialize protocol of top-level step name list, sections dictionary (step name -> option
+		dictionary), final exit prompt flag, trigger table of planned overshoot transitions and gain
+		table of auto-tuned PID sets, then compile its execution plan. Source is the protocol file or
+		method the protocol is rebuilt from on resume [default: name]. If a control-to-channel
+		calibration is given, step temperatures are channel temperatures (see calibration.py)."""
+
+		self.name = name
+		self.source = source or name
+		self.steps = steps
+		self.sections = sections
+		self.exit_prompt = exit_prompt
+		self.triggers = triggers
+		self.gain_table = gain_table
+		self.calibration = calibration
+		self.plan = self.compile()
+		self.digest = hashlib.sha1(repr(self.plan)).hexdigest()  # identifies plan in checkpoint
+
+	@classmethod
+	def load(cls, path, triggers=None, gain_table=None, calibration=None):
+		"""Returns protocol read from ConfigParser formatted protocol file, resolving 'auto' options by trigger and gain
+		table and targeting channel temperatures by calibration, if given"""
+
+		config = ConfigParser.ConfigParser()
+		config.optionxform = str  # keep case of PID option names
+
+		if not config.read(path):
+			raise IOError("Cannot read protocol file: %s" % path)
+
+		sections = {}
+		for section in config.sections():
+			sections[section] = dict(config.items(section))
+
+		protocol = sections.pop('protocol')
+		return cls(protocol.get('name', path), split(protocol['steps']), sections, protocol.get('exit_prompt', '0') == '1', triggers, gain_table, path, calibration)
+
+	@classmethod
+	def from_config(cls, temperature_control, trigger=False):
+		"""Returns the classic denaturation - (denaturation, annealing, elongation) x loop_iter - final
+		hold protocol built from the numbered configuration parameters of temperature controller, with
+		overshoot set points and trigger points if trigger is set - planned ones if the temperature
+		controller has a trigger table, the set_tempN / poll_tempN parameters otherwise. Auto-tuned PID
+		sets of its gain table, if any, take precedence over the numbered PID parameters."""
+
+		tc = temperature_control
+		clips = {1: 'outer_denaturation', 2: 'inner_denaturation', 3: 'annealing', 4: 'inner_elongation', 5: 'final_hold'}
+		labels = {1: '(outer) denaturation step', 2: '(inner) denaturation step', 3: '(inner) annealing step',
+			  4: '(inner) elongation step', 5: '(outer) final hold'}
+		holds = {1: tc.SS_time1, 2: tc.SS_time2, 3: tc.SS_time3, 4: tc.SS_time4, 5: tc.SS_final}
+
+		sections = {}
+		for i in range(1, 6):
+			step = {'temperature': getattr(tc, 'temp%i' % i), 'hold': holds[i], 'tolerance': tc.temp_tolerance,
+				'P_bandwidth': getattr(tc, 'P_bandwidth%i' % i), 'I_gain': getattr(tc, 'I_gain%i' % i),
+				'D_gain': getattr(tc, 'D_gain%i' % i), 'clip': clips[i], 'label': labels[i]}
+
+			if tc.gain_table is not None:
+				step['gains'] = 'auto'
+
+			if trigger and tc.triggers is not None:
+				step['overshoot'] = 'auto'
+			elif trigger and i < 5:
+				step['overshoot'] = getattr(tc, 'set_temp%i' % i)
+				step['trigger'] = getattr(tc, 'poll_temp%i' % i)
+
+			if i == 5:
+				step['wait'] = 0  # final hold starts right away
+
+			sections['step%i' % i] = step
+
+		sections['cycling'] = {'repeat': tc.loop_iter, 'steps': 'step2, step3, step4', 'skip_first': 'step2'}
+
+		if trigger:
+			name = 'pcr_wi_trigger'
+		else:
+			name = 'pcr_wo_trigger'
+
+		return cls(name, ['step1', 'cycling', 'step5'], sections, exit_prompt=True, triggers=tc.triggers, gain_table=tc.gain_table, calibration=tc.calibration)
+
+#--------------------------------- Plan compilation ------------------------------------
+
+	def compile(self):
+		"""Returns execution plan, a list of (method name, arguments...) tuples. Method names are
+		temperature controller methods, except 'cycle' (cycle number) and 'step' (step label, clip)."""
+
+		self.plan = [('say', 'pcr_start')]
+		self.gains = {}  # PID gains in effect at current point of plan
+		self.cycles = 0  # number of repeat iterations so far
+		self.temperature = None  # set point of preceding step
+
+		for name in self.steps:
+			self.expand(name, 0)
+
+		self.plan.append(('say', 'pcr_end'))
+
+		if self.exit_prompt:
+			self.plan.append(('press_q_to_exit',))
+
+		return self.plan
+
+	def expand(self, name, iteration):
+		"Appends actions of step or repeat block name, at given (zero-based) repeat iteration, to plan"
+
+		if name not in self.sections:
+			raise ValueError("Protocol %s: undefined step '%s'" % (self.name, name))
+
+		section = self.sections[name]
+
+		if 'repeat' in section:
+			steps = split(section['steps'])
+			skip_first = split(section.get('skip_first', ''))
+
+			for i in range(int(section['repeat'])):
+				self.cycles += 1
+				self.plan.append(('cycle', self.cycles))
+
+				for step in steps:
+					if i == 0 and step in skip_first:
+						continue
+					self.expand(step, i)
+			return
+
+		temperature = float(section['temperature'])
+		increments = min(iteration, int(section.get('increment_cycles', iteration)))
+		temperature += float(section.get('increment', 0)) * increments
+
+		tolerance = None
+		if 'tolerance' in section:
+			tolerance = float(section['tolerance'])
+
+		self.plan.append(('step', section.get('label', name), temperature, section.get('clip')))
+
+		channel = temperature  # target of steady-state wait
+		if self.calibration is not None:
+			temperature = round(self.calibration.control(channel), 2)  # set point holding channel at its temperature
+
+		if section.get('gains') == 'auto' and self.gain_table is not None:
+			gains = self.gain_table.lookup(self.temperature, temperature)
+			if gains is not None:
+				section = dict(section, P_bandwidth=gains[0], I_gain=gains[1], D_gain=gains[2])
+
+		for option, method in PID_METHODS:
+			if option in section and self.gains.get(option) != float(section[option]):
+				self.gains[option] = float(section[option])
+				self.plan.append((method, self.gains[option]))
+
+		overshoot = None
+		if section.get('overshoot') == 'auto':
+			if self.triggers is not None:
+				overshoot = self.triggers.lookup(self.temperature, temperature)  # None if no transition planned
+		elif 'overshoot' in section:
+			overshoot = (float(section['overshoot']), float(section['trigger']))
+
+		if overshoot is not None and overshoot[0] != temperature:
+			self.plan.append(('set_temperature', overshoot[0]))
+			self.plan.append(('pull_trigger', overshoot[1], tolerance))
+
+		self.plan.append(('set_temperature', temperature))
+
+		if int(section.get('wait', 1)) == 1:
+			criteria = []
+			for option in SS_OPTIONS:
+				if option in section:
+					criteria.append(float(section[option]))
+				else:
+					criteria.append(None)
+
+			if self.calibration is None:
+				self.plan.append(('wait_for_SS', temperature, tolerance) + tuple(criteria))
+			else:
+				self.plan.append(('wait_for_SS', channel, tolerance) + tuple(criteria) + (True,))  # on estimated channel temperature
+
+		self.plan.append(('incubate_reagent', float(section.get('hold', 0))))
+		self.temperature = temperature
+
+	def describe(self):
+		"Returns execution plan as readable text, one action per line"
+
+		lines = []
+		for i, action in enumerate(self.plan):
+			lines.append("%4i  %-18s %s" % (i, action[0], ', '.join([str(a) for a in action[1:]])))
+		return '\n'.join(lines)
+
+#-------------------------------- Plan execution ---------------------------------------
+
+	def run(self, temperature_control, start=0, hold=0):
+		"""Executes execution plan, from action index start on, against temperature controller. If the
+		plan resumes at an incubation, hold seconds of it have elapsed already."""
+
+		for method, args in self.actions(temperature_control, start, hold):
+			getattr(temperature_control, method)(*args)
+
+	def actions(self, temperature_control, start=0, hold=0):
+		"""Generates (method, args) controller calls of execution plan from action index start on, as
+		run performs them; checkpoints, cycle, step and announcement actions are handled on the way, so
+		blocking and non-blocking drivers (see async_control.py) share one dispatch"""
+
+		tc = temperature_control
+		tc.logging.info("%i\t--> Run protocol %s [%i actions]" % (tc.cycle, self.name, len(self.plan)))
+
+		for index in range(start, len(self.plan)):
+			method, args = self.plan[index][0], self.plan[index][1:]
+			tc.save_checkpoint(self, index)
+
+			if index == start and method == 'incubate_reagent' and hold > 0:
+				args = args + (hold,)
+
+			if method == 'cycle':
+				tc.cycle = args[0]  # update PCR cycle iteration number
+				tc.announcer.say('cycle_%i' % tc.cycle)
+				tc.publish('cycle', tc.cycle)
+
+			elif method == 'step':
+				label, temperature, clip = args
+				tc.record_step(clip or label)  # names archived steps
+				tc.logging.info("%i\t--> In %s" % (tc.cycle, label))
+				tc.publish('step', label.replace('\t', ' '))
+				tc.logging.info("%i\t--> Set PCR solution temperature to %.2f C" % (tc.cycle, temperature))
+
+				if clip is not None:
+					tc.announcer.say(clip)
+
+			elif method == 'say':
+				tc.announcer.say(args[0])
+
+			else:
+				yield method, args
+
+		tc.clear_checkpoint()  # run complete
+
+def split(value):
+	"Returns list of names in comma separated value"
+
+	return [name.strip() for name in value.split(',') if name.strip()]
@@ -0,0 +1,208 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Sampler, the
+ acquisition thread owning the serial port of the 5R7-001 temperature controller,
+ class Ring_buffer, the fixed-size sample store it fills, and class
+ Sampling_policy, the adaptive sampling period of the protocol loops, in Python.
+-------------------------------------------------------------------------------
+"""
+
+import time
+import array
+import Queue
+import threading
+
+from collections import deque
+from clock import Scheduler
+
+BASELINE = 1.0  # shortest time span (s) of control temperature slope estimate, above sensor resolution
+
+class Ring_buffer:
+
+	def __init__(self, size, width=4):
+		"""Initialize array-backed ring buffer of size rows, each holding width floats
+		[default: (time, set, control, periphery) temperature snapshot]"""
+
+		self.size = size
+		self.width = width
+		self.data = array.array('d', [0.0]) * (size * width)  # preallocated row storage
+		self.count = 0  # total number of rows ever appended
+		self.lock = threading.Lock()
+
+	def append(self, row):
+		"Stores row in place of the oldest one"
+
+		with self.lock:
+			i = (self.count % self.size) * self.width
+			self.data[i:i + self.width] = array.array('d', row)
+			self.count += 1
+
+	def latest(self):
+		"Returns most recent row as a tuple, or None if buffer is empty"
+
+		with self.lock:
+			if self.count == 0:
+				return None
+			i = ((self.count - 1) % self.size) * self.width
+			return tuple(self.data[i:i + self.width])
+
+	def window(self, n=None):
+		"Returns list of last n rows [default: all stored rows] in chronological order"
+
+		with self.lock:
+			stored = min(self.count, self.size)
+			if n is None or n > stored:
+				n = stored
+
+			rows = []
+			for k in range(self.count - n, self.count):
+				i = (k % self.size) * self.width
+				rows.append(tuple(self.data[i:i + self.width]))
+			return rows
+
+class Sampler(threading.Thread):
+
+	def __init__(self, temperature_control, rate, size):
+		"""Initialize acquisition thread sampling the temperature snapshot of temperature controller
+		at rate (Hz) into a ring buffer of size rows"""
+
+		threading.Thread.__init__(self)
+		self.daemon = True  # never keep process alive on exit
+
+		self.temperature_control = temperature_control
+		self.period = 1.0 / rate
+		self.ring = Ring_buffer(size)
+		self.requests = Queue.Queue()  # serial transfers queued by other threads
+		self.new_sample = threading.Condition()
+		self.stopped = threading.Event()
+
+	def run(self):
+		"Acquisition loop: serves queued transfers, then records one snapshot per sampling period"
+
+		schedule = Scheduler(self.temperature_control.clock, self.period, 'Sampler', self.temperature_control.logging)
+		while not self.stopped.is_set():
+
+			self.serve_requests()
+
+			try:
+				sample = self.temperature_control.get_temperatures()
+			except IOError, e:
+				self.temperature_control.logging.warn("%i\t--> Sampler read-out failed: %s" % (self.temperature_control.cycle, e))
+			else:
+				with self.new_sample:
+					self.ring.append(sample)
+					self.new_sample.notify_all()
+
+			schedule.sleep(self.stopped)  # wait for next sampling deadline or stop
+
+		self.serve_requests()  # flush transfers queued before stop
+		schedule.report(self.temperature_control.cycle)
+
+	def serve_requests(self):
+		"Performs all queued serial transfers on the acquisition thread"
+
+		while True:
+			try:
+				frames, reply = self.requests.get_nowait()
+			except Queue.Empty:
+				return
+
+			if reply is None:  # write command, no response expected
+				for frame in frames:
+					self.temperature_control.write_command(frame)
+			else:
+				try:
+					reply.put(self.temperature_control.read_registers(frames))
+				except IOError, e:
+					reply.put(e)
+
+	def write(self, frame):
+		"Queues command frame to be written by the acquisition thread"
+
+		self.requests.put(([frame], None))
+
+	def read(self, frames, timeout=None):
+		"""Queues read command frames and blocks until acquisition thread returns their values; raises
+		IOError if they do not arrive within timeout (s) [default: two sampling periods and the response
+		timeouts of a snapshot and of the frames, twice over] or the acquisition thread stopped"""
+
+		if timeout is None:
+			timeout = self.period * 2 + self.temperature_control.response_timeout * (len(frames) + 3) * 2
+
+		reply = Queue.Queue(1)
+		self.requests.put((frames, reply))
+		try:
+			values = reply.get(timeout=timeout)
+		except Queue.Empty:
+			if not self.is_alive():
+				raise IOError("Sampler stopped before register read-out")
+			raise IOError("No register read-out from sampler within %0.2f s" % timeout)
+
+		if isinstance(values, IOError):
+			raise values
+		return values
+
+	def next_sample(self, count, timeout=None):
+		"""Blocks until the ring buffer holds more than count samples, then returns the latest one
+		along with the new sample count; raises IOError if none arrives within timeout (s) [default:
+		ten sampling periods and three response timeouts] or the acquisition thread stopped"""
+
+		if timeout is None:
+			timeout = self.period * 10 + self.temperature_control.response_timeout * 3
+		deadline = time.time() + timeout
+
+		with self.new_sample:
+			while self.ring.count <= count:
+				remaining = deadline - time.time()
+				if not self.is_alive():
+					raise IOError("Sampler stopped before next temperature snapshot")
+				if remaining <= 0:
+					raise IOError("No temperature snapshot from sampler within %0.2f s" % timeout)
+				self.new_sample.wait(min(remaining, self.period * 10))
+			return self.ring.latest(), self.ring.count
+
+	def stop(self):
+		"Stops acquisition loop and waits for thread to finish"
+
+		self.stopped.set()
+		self.join()
+
+class Sampling_policy:
+
+	def __init__(self, fast, slow, max_slope, max_error, backoff=2.0):
+		"""Initialize adaptive sampling period: fast period (s) while the control temperature slope
+		exceeds max_slope (C/s) or its set point error exceeds max_error (C); once both are within,
+		every sample multiplies the period by backoff up to slow period (s)"""
+
+		self.fast = fast
+		self.slow = max(fast, slow)
+		self.max_slope = max_slope
+		self.max_error = max_error
+		self.backoff = backoff
+
+		self.period = fast
+		self.history = deque()  # (time, control) pairs spanning BASELINE
+
+	def slope(self, t, ct):
+		"Returns control temperature slope (C/s) over at least BASELINE seconds, 0 until known"
+
+		self.history.append((t, ct))
+		while len(self.history) > 2 and t - self.history[1][0] >= BASELINE:
+			self.history.popleft()
+
+		t0, c0 = self.history[0]
+		if t - t0 <= 0:
+			return 0.0
+		return (ct - c0) / (t - t0)
+
+	def update(self, sample):
+		"Returns sampling period (s) following (time, set, control, periphery) temperature snapshot"
+
+		t, st, ct = sample[0], sample[1], sample[2]
+
+		if abs(self.slope(t, ct)) > self.max_slope or abs(st - ct) > self.max_error:
+			self.period = self.fast  # ramping, sample densely
+		else:
+			self.period = min(self.slow, self.period * self.backoff)  # holding, back off
+
+		return self.period
@@ -0,0 +1,370 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains a simulated 5R7-001 temperature controller in
+ Python, speaking the exact frame protocol of the device. Behind the frame
+ handler, the controller PID drives a thermal plant model:
+
+ Peltier block (control sensor, INPUT 1) - first-order-plus-dead-time:
+	dTc/dt = (K * u(t - L) - (Tc - Ta)) / tau,   u: PID output in [-1, 1]
+
+ Glass slide (periphery sensor, INPUT 2) - linear in block temperature:
+	dTg/dt = a * Tc + b * Tg + c + h * dTc/dt
+
+ where the block rate feeding through to the slide is limited to the largest
+ rate seen in the fitted traces, so faster ramps are not extrapolated.
+
+ Parameters are fitted to the recorded process_logs/steady-state traces with
+ fit_plant. The simulator is available in-process through Simulated_serial, an
+ object with the pyserial interface, or on a pseudo-terminal:
+
+ Usage: python simulator.py pty            (serve simulated device on a pty)
+        python simulator.py fit [logs...]  (fit plant model to temperature logs)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import time
+import threading
+
+from collections import deque
+
+import codec
+
+PLANT = {'K': 70.6, 'tau': 12.14, 'L': 0.16, 'ambient': 25.0,  # Peltier block, fitted on small-fast-PID traces
+	 'a': 0.0532, 'b': -0.0589, 'c': 0.184, 'h': 2.61, 'rate': 2.19}  # glass slide [rms control error: 0.15 C]
+
+STEP = 0.05  # plant integration step (s)
+
+#--------------------------------------------------------------------------------------#
+#				THERMAL PLANT					       #
+#--------------------------------------------------------------------------------------#
+
+class Thermal_plant:
+
+	def __init__(self, parameters=None, temperature=None):
+		"""Initialize Peltier block and glass slide model of parameters dictionary [default: PLANT] at
+		given start temperature [default: ambient]"""
+
+		if parameters is None:
+			parameters = PLANT
+
+		self.p = dict(parameters)
+		if temperature is None:
+			temperature = self.p['ambient']
+
+		self.control = temperature  # Peltier block temperature (C)
+		self.periphery = temperature  # glass slide temperature (C)
+		self.integral = 0.0  # PID integral of error (C s)
+		self.error = None  # previous PID error (C)
+		self.power = 0.0  # PID output in [-1, 1]
+		self.delay = deque([0.0] * max(1, int(round(self.p['L'] / STEP))))  # dead time buffer of PID output
+
+	def hold(self, pb, ig):
+		"""Presets PID integral and dead time buffer to the output holding current block temperature in
+		steady state, as after a long hold at proportional bandwidth pb and integral gain ig"""
+
+		self.power = max(-1.0, min(1.0, (self.control - self.p['ambient']) / self.p['K']))
+		self.delay = deque([self.power] * len(self.delay))
+		self.error = None
+
+		if ig > 0:
+			self.integral = self.power * pb * 60 / ig
+
+	def pid(self, setpoint, pb, ig, dg, dt):
+		"""Returns PID output in [-1, 1] of 5R7-001 regulator: proportional bandwidth pb (C), integral
+		gain ig (repeats/min) and derivative gain dg (min)"""
+
+		pb = max(pb, 0.02)
+		error = setpoint - self.control
+
+		derivative = 0.0
+		if self.error is not None:
+			derivative = (error - self.error) / dt
+		self.error = error
+
+		integral = self.integral + error * dt
+		u = (error + ig * integral / 60 + dg * 60 * derivative) / pb
+
+		if -1 < u < 1 or (u >= 1 and error < 0) or (u <= -1 and error > 0):
+			self.integral = integral  # conditional integration, no wind-up in saturation
+
+		return max(-1.0, min(1.0, u))
+
+	def step(self, dt, setpoint, pb, ig, dg, run=True):
+		"Advances plant by dt seconds under PID control toward set point, or unpowered if run is cleared"
+
+		if run:
+			self.power = self.pid(setpoint, pb, ig, dg, dt)
+		else:
+			self.power = 0.0
+
+		self.delay.append(self.power)
+		u = self.delay.popleft()
+
+		p = self.p
+		dtc = (p['K'] * u - (self.control - p['ambient'])) / p['tau']
+		dtg = p['a'] * self.control + p['b'] * self.periphery + p['c'] + p['h'] * max(-p['rate'], min(p['rate'], dtc))
+
+		self.control += dtc * dt
+		self.periphery += dtg * dt
+
+#--------------------------------------------------------------------------------------#
+#				SIMULATED CONTROLLER				       #
+#--------------------------------------------------------------------------------------#
+
+class Simulated_controller:
+
+	READ = {'01': 'control', '06': 'periphery'}  # sensor read commands -> plant attribute
+	REGISTERS = {'1c': '03', '1d': '51', '1e': '52', '1f': '53', '2d': '2d'}  # write command -> read command
+
+	def __init__(self, plant=None, clock=time.time):
+		"""Initialize 5R7-001 controller emulation driving thermal plant [default: Thermal_plant()],
+		advanced on demand to the current time of clock function"""
+
+		if plant is None:
+			plant = Thermal_plant()
+
+		self.plant = plant
+		self.clock = clock
+		self.registers = {'03': 2500, '51': 1100, '52': 200, '53': 0, '2d': 0}  # raw register values
+		self.last = clock()
+		self.lock = threading.Lock()
+
+	def advance(self):
+		"Integrates plant up to current clock time under the regulator settings in effect"
+
+		now = self.clock()
+		r = self.registers
+
+		while self.last + STEP <= now:
+			self.plant.step(STEP, r['03'] / 100.0, r['51'] / 50.0, r['52'] / 100.0, r['53'] / 100.0, r['2d'] == 1)
+			self.last += STEP
+
+	def handle(self, frame):
+		"Returns response frame string to command frame string"
+
+		with self.lock:
+			self.advance()
+
+			if len(frame) != codec.COMMAND_LENGTH or frame[:3] != '*00' or \
+			   frame[13:15].lower() != codec.HEX_BYTE[sum(bytearray(frame[1:13])) & 255]:
+				return '*XXXXXXXXc0^'  # checksum error response
+
+			data = frame[5:13]
+
+			command = frame[3:5]
+			value = int(data, 16)
+			if value >= 0x80000000:
+				value -= 0x100000000
+
+			if command in self.READ:
+				value = int(round(getattr(self.plant, self.READ[command]) * 100))
+			elif command in self.REGISTERS:
+				self.registers[self.REGISTERS[command]] = value
+			elif command in self.registers:
+				value = self.registers[command]
+			else:
+				return '*XXXXXXXXc0^'
+
+			data = codec.encode_data(value)
+			return '*' + data + codec.HEX_BYTE[sum(bytearray(data)) & 255] + '^'
+
+class Simulated_serial:
+
+	def __init__(self, controller=None, port='simulator'):
+		"Initialize pyserial-like port object connected to simulated controller [default: Simulated_controller()]"
+
+		if controller is None:
+			controller = Simulated_controller()
+
+		self.controller = controller
+		self.port = port
+		self.timeout = None
+		self.pending = ''  # partial command frame written so far
+		self.output = ''  # response characters not read yet
+
+	def write(self, data):
+		"Sends command characters to simulated controller"
+
+		self.pending += str(data)
+		while '\r' in self.pending:
+			frame, self.pending = self.pending.split('\r', 1)
+			self.output += self.controller.handle(frame + '\r')
+		return len(data)
+
+	def read(self, size=1):
+		"Returns up to size response characters available"
+
+		data, self.output = self.output[:size], self.output[size:]
+		return data
+
+	def inWaiting(self):
+		return len(self.output)
+
+	def flushInput(self):
+		self.output = ''
+
+	def flushOutput(self):
+		pass
+
+	def isOpen(self):
+		return True
+
+	def open(self):
+		pass
+
+	def close(self):
+		pass
+
+def serve_pty(controller=None):
+	"""Serves simulated controller on a pseudo-terminal and returns slave device name, to be used as
+	serial_port in configuration file"""
+
+	import pty
+	import tty
+
+	if controller is None:
+		controller = Simulated_controller()
+
+	master, slave = pty.openpty()
+	tty.setraw(slave)
+	name = os.ttyname(slave)
+
+	def serve():
+		pending = ''
+		while True:
+			pending += os.read(master, 64)
+			while '\r' in pending:
+				frame, pending = pending.split('\r', 1)
+				os.write(master, controller.handle(frame + '\r'))
+
+	thread = threading.Thread(target=serve)
+	thread.daemon = True
+	thread.start()
+	return name
+
+#--------------------------------------------------------------------------------------#
+#				MODEL FITTING					       #
+#--------------------------------------------------------------------------------------#
+
+def load_trace(path):
+	"Returns (time, set, control, periphery) columns of tab-separated temperature log as lists of floats"
+
+	columns = ([], [], [], [])
+	for line in open(path):
+		fields = line.split('\t')
+		try:
+			row = [float(f) for f in fields[:4]]
+		except ValueError:
+			continue
+		if len(row) == 4:
+			for column, value in zip(columns, row):
+				column.append(value)
+	return columns
+
+def simulate_trace(parameters, trace, gains):
+	"Returns simulated control temperatures at the time stamps of recorded trace under PID gains (pb, ig, dg)"
+
+	t, st, ct, gt = trace
+	pb, ig, dg = gains
+
+	plant = Thermal_plant(parameters, ct[0])
+	plant.hold(pb, ig)
+
+	result = [ct[0]]
+	now = t[0]
+	for k in range(1, len(t)):
+		while now + STEP <= t[k]:
+			plant.step(STEP, st[k - 1], pb, ig, dg)
+			now += STEP
+		result.append(plant.control)
+	return result
+
+def block_cost(parameters, traces):
+	"Returns sum of squared control temperature errors of plant parameters over (trace, gains) list"
+
+	cost = 0.0
+	for trace, gains in traces:
+		for y, ym in zip(trace[2], simulate_trace(parameters, trace, gains)):
+			cost += (y - ym) ** 2
+	return cost
+
+def fit_plant(traces, ambient=25.0):
+	"""Returns plant parameter dictionary fitted to list of (trace, (pb, ig, dg)) pairs: Peltier block
+	parameters by closed-loop simulation least squares (grid search with coordinate refinement), glass
+	slide parameters by linear least squares on the recorded sensor pairs"""
+
+	import numpy
+
+	best = dict(PLANT)
+	best['ambient'] = ambient
+	best_cost = block_cost(best, traces)
+
+	grid = {'K': [60.0, 80.0, 100.0, 130.0, 170.0], 'tau': [10.0, 20.0, 40.0, 80.0], 'L': [0.2, 0.5, 1.0, 2.0, 4.0]}
+	for K in grid['K']:
+		for tau in grid['tau']:
+			for L in grid['L']:
+				candidate = dict(best, K=K, tau=tau, L=L)
+				cost = block_cost(candidate, traces)
+				if cost < best_cost:
+					best, best_cost = candidate, cost
+
+	for scale in (1.25, 1.1, 1.03):  # coordinate refinement
+		for name in ('K', 'tau', 'L'):
+			for factor in (scale, 1 / scale):
+				candidate = dict(best)
+				candidate[name] *= factor
+				cost = block_cost(candidate, traces)
+				if cost < best_cost:
+					best, best_cost = candidate, cost
+
+	rows, rhs = [], []  # glass slide: dTg/dt = a Tc + b Tg + c + h dTc/dt
+	for (t, st, ct, gt), gains in traces:
+		t, ct, gt = numpy.array(t), numpy.array(ct), numpy.array(gt)
+		dt = numpy.diff(t)
+		rows.append(numpy.column_stack((ct[:-1], gt[:-1], numpy.ones(len(dt)), numpy.diff(ct) / dt)))
+		rhs.append(numpy.diff(gt) / dt)
+
+	rows = numpy.vstack(rows)
+	a, b, c, h = numpy.linalg.lstsq(rows, numpy.concatenate(rhs), rcond=None)[0]
+	best.update(a=float(a), b=float(b), c=float(c), h=float(h), rate=float(abs(rows[:, 3]).max()))
+	best['rms'] = (best_cost / sum([len(trace[0]) for trace, gains in traces])) ** 0.5
+	return best
+
+#--------------------------------------------------------------------------------------#
+#				COMMAND LINE					       #
+#--------------------------------------------------------------------------------------#
+
+STEADY_STATE = [('process_logs/steady-state/small-fast-PID/RT-90-temperature.log', (22, 2, 0)),
+		('process_logs/steady-state/small-fast-PID/70-90-temperature.log', (22, 2, 0)),
+		('process_logs/steady-state/small-fast-PID/90-40-temperature.log', (15, 10, 0)),
+		('process_logs/steady-state/small-fast-PID/40-70-temperature.log', (30, 40, 0))]  # traces with config.txt PID sets
+
+if __name__ == '__main__':
+
+	if len(sys.argv) > 1 and sys.argv[1] == 'fit':
+		paths = STEADY_STATE
+		if len(sys.argv) > 2:
+			paths = [(path, (22, 2, 0)) for path in sys.argv[2:]]
+
+		parameters = fit_plant([(load_trace(path), gains) for path, gains in paths])
+		print "\nINFO\t -\t--> Fitted plant parameters [rms control error: %0.3f C]:\n" % parameters.pop('rms')
+		for name in ('K', 'tau', 'L', 'ambient', 'a', 'b', 'c', 'h', 'rate'):
+			print "%s = %g" % (name, parameters[name])
+		print
+
+	elif len(sys.argv) > 1 and sys.argv[1] == 'pty':
+		name = serve_pty()
+		print "\nINFO\t -\t--> Simulated 5R7-001 controller on %s (set serial_port in config.txt)" % name
+		print "INFO\t -\t--> Press Ctrl-C to quit\n"
+		try:
+			while True:
+				time.sleep(1)
+		except KeyboardInterrupt:
+			pass
+
+	else:
+		print '\n--> Error: not correct input!\n--> Usage: python simulator.py pty|fit [logs...]\n'
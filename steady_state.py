@@ -0,0 +1,96 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the complete code for class Steady_state, the
+ streaming steady-state detector of the wait_for_SS step, in Python. It keeps
+ running sums of the samples in a sliding time window, so the window mean,
+ least-squares slope and standard deviation are updated in O(1) per sample.
+ Steady state is declared once the window spans its full length and
+
+	|mean - target| <= tolerance, |slope| <= max_slope and std <= max_std
+-------------------------------------------------------------------------------
+"""
+
+import math
+import collections
+
+class Steady_state:
+
+	def __init__(self, target, tolerance, window, max_slope, max_std):
+		"""Initialize detector of target temperature (C) with tolerance (C) of the window mean, window
+		length (s), largest slope (C/s) and largest standard deviation (C) within the window"""
+
+		self.target = target
+		self.tolerance = tolerance
+		self.window = window
+		self.max_slope = max_slope
+		self.max_std = max_std
+
+		self.samples = collections.deque()  # (time, deviation) pairs in window
+		self.start = None  # time of first sample, sample times are taken relative to it
+		self.entered = None  # time since which every sample was within tolerance
+		self.n = 0
+		self.s_t = self.s_d = self.s_tt = self.s_dd = self.s_td = 0.0  # running sums of t, d, t^2, d^2, t*d
+
+	def add(self, t, temperature):
+		"Adds sample of time stamp t (s) and temperature (C), returns True if steady state is reached"
+
+		if self.start is None:
+			self.start = t
+
+		t -= self.start  # keep sums well-conditioned
+		d = temperature - self.target  # deviation from target
+
+		if abs(d) > self.tolerance:
+			self.entered = None
+		elif self.entered is None:
+			self.entered = t
+
+		self.samples.append((t, d))
+		self.n += 1
+		self.s_t += t
+		self.s_d += d
+		self.s_tt += t * t
+		self.s_dd += d * d
+		self.s_td += t * d
+
+		while t - self.samples[0][0] > self.window:  # drop samples fallen out of window
+			to, do = self.samples.popleft()
+			self.n -= 1
+			self.s_t -= to
+			self.s_d -= do
+			self.s_tt -= to * to
+			self.s_dd -= do * do
+			self.s_td -= to * do
+
+		return self.reached(t)
+
+	def reached(self, t):
+		"Returns True if window spans its full length and meets mean, slope and deviation criteria"
+
+		if t < self.window or self.n < 3:
+			return False
+
+		mean, slope, std = self.statistics()
+		return abs(mean) <= self.tolerance and abs(slope) <= self.max_slope and std <= self.max_std
+
+	def statistics(self):
+		"Returns (mean deviation from target, slope, standard deviation) of window"
+
+		n = self.n
+		mean = self.s_d / n
+		variance = max(0.0, self.s_dd / n - mean * mean)  # clip rounding error
+
+		spread = n * self.s_tt - self.s_t * self.s_t
+		if spread > 0:
+			slope = (n * self.s_td - self.s_t * self.s_d) / spread
+		else:
+			slope = 0.0
+
+		return mean, slope, math.sqrt(variance)
+
+	def latency(self):
+		"Returns time (s) from entering tolerance band for good until the latest sample"
+
+		if self.entered is None or not self.samples:
+			return None
+		return self.samples[-1][0] - self.entered
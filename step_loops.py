@@ -0,0 +1,146 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the per-sample decisions of the protocol step
+ loops in Python, shared by the blocking driver (temperature_control.py) and
+ the non-blocking one (async_control.py). A driver takes the samples and waits
+ for the sampling deadlines its own way, and hands every sample to
+
+	Steady_state_wait - wait_for_SS: steady state or time limit reached
+	Trigger_wait      - pull_trigger: trigger point or time limit reached
+	Incubation        - incubate_reagent: logging and hold checkpoints
+
+ which log it, check it and announce the outcome, so both drivers end their
+ steps on the same conditions.
+-------------------------------------------------------------------------------
+"""
+
+from steady_state import Steady_state
+
+class Steady_state_wait:
+
+	def __init__(self, tc, channel_target, tolerance=None, window=None, max_slope=None, max_std=None, channel=False):
+		"""Initialize steady-state wait of controller driver tc at channel_target, on the criteria of
+		Temperature_control.wait_for_SS, and announce it"""
+
+		tc.logging.info("%i\t--> Wait for steady-state - set temperature: %.2f C" % (tc.cycle, channel_target))
+		tc.announcer.say('wait_for_SS')
+
+		if tolerance is None:  # if temperature tolerance is not defined, set default to +/- 1 C
+			tolerance = 1
+		if window is None:
+			window = tc.SS_window
+		if max_slope is None:
+			max_slope = tc.SS_slope
+		if max_std is None:
+			max_std = tc.SS_std
+
+		self.tc = tc
+		self.target = channel_target
+		self.window = window
+		self.detector = Steady_state(channel_target, tolerance, window, max_slope, max_std)
+		self.temperature = None  # watched temperature of last sample (C)
+
+		self.estimate = None
+		if channel and tc.calibration is not None:
+			self.estimate = tc.calibration.estimate()
+
+	def add(self, sample, delta):
+		"""Logs (time, set, control, periphery) temperature snapshot taken delta seconds into the wait,
+		returns True once steady state is detected or the time limit is exceeded"""
+
+		tc = self.tc
+		ct = sample[2]  # control temperature value
+		if self.estimate is not None:
+			ct = self.estimate.add(sample[0], ct)  # estimated channel temperature
+		self.temperature = ct
+
+		tc.log_temperature(sample)  # log temperature related parameters into log-file
+
+		if self.detector.add(sample[0], ct):
+			mean, slope, std = self.detector.statistics()
+			tc.logging.info("%i\t--> Steady-state detected - window mean: %+0.3f C, slope: %0.4f C/s, std: %0.3f C, detection latency: %0.2f s" % (tc.cycle, mean, slope, std, self.detector.latency()))
+			tc.publish('steady_state', '%.2f' % self.target)
+			return True
+
+		if delta > tc.time_limit * 60:
+			tc.logging.warn("%i\t--> Time limit of %s minute(s) exceeded -> [current: %0.2f, target: %0.2f] C" % (tc.cycle, tc.time_limit, ct, self.target))
+			tc.publish('time_limit', '%.2f' % self.target)
+			return True
+
+		return False
+
+	def finish(self, schedule, elapsed):
+		"Reports sampling overruns of schedule and time (s) the wait took"
+
+		schedule.report(self.tc.cycle)
+		self.tc.logging.warn("%i\t--> Time to set steady-state temperature: %0.2f seconds and current temperature: %0.2f C" % (self.tc.cycle, elapsed, self.temperature))
+
+class Trigger_wait:
+
+	def __init__(self, tc, set_temp, poll_temp, tolerance=None):
+		"""Initialize wait of controller driver tc for its control temperature to ramp towards set point
+		set_temp (C) to within tolerance (C) [default: 1] of trigger point poll_temp"""
+
+		tc.logging.info("%i\t--> Pull trigger - poll temperature: %0.2f C" % (tc.cycle, poll_temp))
+
+		if tolerance is None:  # if temperature tolerance is not defined, set default to +/- 1 C
+			tolerance = 1
+
+		self.tc = tc
+		self.target = poll_temp
+		self.tolerance = tolerance
+		self.rising = set_temp - poll_temp >= 0  # ramping up
+		self.temperature = None  # control temperature of last sample (C)
+
+	def pending(self, hs):
+		"""Returns True while control temperature hs has neither reached nor passed the trigger point,
+		False right away if the ramp started beyond it"""
+
+		self.temperature = hs
+		if self.rising:
+			return self.target - hs > self.tolerance
+		return hs - self.target > self.tolerance
+
+	def add(self, sample, delta):
+		"""Logs (time, set, control, periphery) temperature snapshot taken delta seconds into the wait,
+		returns True once the time limit is exceeded"""
+
+		tc = self.tc
+		self.temperature = sample[2]
+		tc.log_temperature(sample)  # log temperature related parameters into log-file
+
+		if delta > tc.time_limit * 60:
+			tc.logging.warn("%i\t --> Time limit %s exceeded -> [current: %0.2f, target: %0.2f] C" % (tc.cycle, tc.time_limit, self.temperature, self.target))
+			return True
+		return False
+
+	def finish(self, schedule, elapsed):
+		"Reports sampling overruns of schedule, publishes trigger event and logs time (s) the ramp took"
+
+		schedule.report(self.tc.cycle)
+		self.tc.publish('trigger', '%.2f' % self.target)
+		self.tc.logging.warn("%i\t--> Time to reach trigger point: %0.2f minutes and current temperature: %0.2f C" % (self.tc.cycle, elapsed / 60, self.temperature))
+
+class Incubation:
+
+	def __init__(self, tc, time_sec, elapsed=0):
+		"""Initialize incubation of controller driver tc for time_sec seconds, of which elapsed are behind it
+		already if resumed, and announce it"""
+
+		tc.logging.info("%i\t--> Incubate reagent for %i s at %0.2f C target temperature" % (tc.cycle, time_sec, tc.target_temp))
+		tc.announcer.say('incubate_reagent')
+		tc.publish('incubate', '%i' % time_sec)
+
+		self.tc = tc
+		self.saved = elapsed  # elapsed time of last checkpoint
+
+	def add(self, sample, delta):
+		"""Logs (time, set, control, periphery) temperature snapshot taken delta seconds into the incubation,
+		saving a checkpoint every checkpoint_interval seconds"""
+
+		tc = self.tc
+		tc.log_temperature(sample)  # log temperature related parameters into log-file
+
+		if delta - self.saved >= tc.checkpoint_interval:
+			tc.save_checkpoint(hold=delta)  # resume with rest of hold time
+			self.saved = delta
@@ -0,0 +1,281 @@
+#!/usr/local/bin/python
+
+"""
+--------------------------------------------------------------------------------
+ Purpose: This program contains the live telemetry stream of the temperature
+ controller in Python. Class Telemetry publishes every acquired temperature
+ snapshot and every protocol step event to any number of subscribers connected
+ to a UNIX domain socket (telemetry_socket in config.txt), one tab-separated
+ line each:
+
+	S <time> <set> <control> <periphery> [device]
+	E <time> <cycle> <event> <value> [device]
+
+ The device field names the controller of a multi-controller run (see
+ orchestrator.py), it is left out by a single controller.
+
+ Publishing never blocks acquisition: a subscriber whose socket buffer is full
+ is dropped. Class Subscriber reads the stream back; monitor() prints it the way
+ the monitor_temperature / monitor_parameters methods always did, so watching a
+ run adds no serial load.
+
+ Usage: python telemetry.py [events]  (print stream, or step events only)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import time
+import errno
+import atexit
+import socket
+import threading
+
+class Null_telemetry:
+
+	active = False
+	path = None
+
+	def sample(self, sample, device=None):
+		"Discards sample"
+		pass
+
+	def event(self, t, cycle, name, value='', device=None):
+		"Discards event"
+		pass
+
+	def close(self):
+		"Nothing to release"
+		pass
+
+class Telemetry(threading.Thread):
+
+	active = True
+
+	def __init__(self, path, logger=None):
+		"""Initialize publisher serving subscribers on UNIX socket path, raises socket.error if another
+		process publishes there already"""
+
+		threading.Thread.__init__(self)
+		self.daemon = True  # never keep process alive on exit
+
+		if serving(path):
+			raise socket.error(errno.EADDRINUSE, "Telemetry already published on %s" % path)
+		if os.path.exists(path):
+			os.remove(path)  # stale socket of previous run
+
+		self.path = path
+		self.logging = logger
+		self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.server.bind(path)
+		self.server.listen(5)
+
+		self.subscribers = []
+		self.lock = threading.Lock()
+		self.closed = False
+		self.dropped = 0  # number of subscribers dropped as too slow or gone
+
+		atexit.register(self.close)
+
+	def run(self):
+		"Accept loop: adds every connecting client to the subscribers, backs off on a persistent error"
+
+		backoff = 0.01  # wait (s) after an accept error, doubled up to a second while errors persist
+		while not self.closed:
+			try:
+				connection, address = self.server.accept()
+			except socket.error, e:
+				if self.closed:
+					break  # server socket closed
+				if e.args[0] == errno.EINTR:
+					continue
+
+				if self.logging is not None:
+					self.logging.warn("-\t--> Telemetry accept failed: %s" % e)
+				time.sleep(backoff)
+				backoff = min(backoff * 2, 1.0)
+				continue
+
+			backoff = 0.01
+			connection.setblocking(0)  # publishing must never wait for a subscriber
+			with self.lock:
+				self.subscribers.append(connection)
+
+	def publish(self, line):
+		"Sends line to every subscriber, dropping the ones that cannot take it right away"
+
+		with self.lock:
+			for connection in self.subscribers[:]:
+				try:
+					sent = connection.send(line)
+				except socket.error:
+					sent = 0
+
+				if sent < len(line):  # partial line would corrupt framing
+					self.subscribers.remove(connection)
+					connection.close()
+					self.dropped += 1
+					if self.logging is not None:
+						self.logging.debug("-\t--> Dropped telemetry subscriber")
+
+	def sample(self, sample, device=None):
+		"Publishes (time, set, control, periphery) temperature snapshot, of device if named"
+
+		if self.subscribers:
+			line = "S\t%0.3f\t%0.2f\t%0.2f\t%0.2f" % tuple(sample)
+			if device is not None:
+				line += "\t" + device
+			self.publish(line + "\n")
+
+	def event(self, t, cycle, name, value='', device=None):
+		"Publishes step event name at time t of PCR cycle with its value (e.g. set temperature), of device if named"
+
+		if self.subscribers:
+			line = "E\t%0.3f\t%i\t%s\t%s" % (t, cycle, name, value)
+			if device is not None:
+				line += "\t" + device
+			self.publish(line + "\n")
+
+	def close(self):
+		"Stops accept loop, disconnects subscribers and removes socket"
+
+		if self.closed:
+			return
+		self.closed = True
+
+		with self.lock:
+			for connection in self.subscribers:
+				connection.close()
+			self.subscribers = []
+
+		try:
+			self.server.shutdown(socket.SHUT_RDWR)  # wakes accept loop
+		except socket.error:
+			pass  # never accepted on, not connected
+		self.server.close()
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+class Device_telemetry:
+
+	def __init__(self, telemetry, device):
+		"Initialize telemetry of named device, published on the shared stream of telemetry"
+
+		self.telemetry = telemetry
+		self.device = device
+		self.active = telemetry.active
+		self.path = telemetry.path
+
+	def sample(self, sample, device=None):
+		"Publishes temperature snapshot of device"
+		self.telemetry.sample(sample, self.device)
+
+	def event(self, t, cycle, name, value='', device=None):
+		"Publishes step event of device"
+		self.telemetry.event(t, cycle, name, value, self.device)
+
+	def close(self):
+		"Shared stream is closed by its owner"
+		pass
+
+class Subscriber:
+
+	def __init__(self, path):
+		"Initialize subscriber of telemetry published on socket path, raises socket.error if there is none"
+
+		self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.socket.connect(path)
+		self.file = self.socket.makefile('rb')
+
+	def __iter__(self):
+		"""Yields ('S', time, set, control, periphery, device) samples and ('E', time, cycle, event, value,
+		device) events until publisher closes stream; device is None unless named"""
+
+		for line in iter(self.file.readline, ''):
+			fields = line.rstrip('\n').split('\t')
+			device = None
+			if len(fields) > 5:
+				device = fields[5]
+
+			if fields[0] == 'S':
+				yield ('S', float(fields[1]), float(fields[2]), float(fields[3]), float(fields[4]), device)
+			elif fields[0] == 'E':
+				yield ('E', float(fields[1]), int(fields[2]), fields[3], fields[4], device)
+
+	def close(self):
+		self.file.close()
+		self.socket.close()
+
+def serving(path):
+	"Returns True if a process accepts connections on UNIX socket path"
+
+	probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		probe.connect(path)
+		return True
+	except socket.error:
+		return False
+	finally:
+		probe.close()
+
+def monitor(subscriber, parameters=True, events=False, interval=1.0, device=None):
+	"""Prints subscribed stream on console, one sample per interval (s) and device: time and control
+	temperature, or all temperature parameters if set; step events too if set. If a device is given,
+	the other devices are left out; named devices are printed in a last column."""
+
+	if parameters:
+		print("\nT (s)\tST (C)\tPT (C)\tGT (C)")
+	else:
+		print("\nT (s)\tCONTROL (C)")
+
+	t0 = None
+	next_time = {}  # device -> time of next sample printed
+	for record in subscriber:
+		if device is not None and record[-1] != device:
+			continue
+
+		name = ''
+		if record[-1] is not None:
+			name = '\t' + record[-1]
+
+		if record[0] == 'E':
+			if events:
+				print("%i\t--> %s %s%s" % (record[2], record[3], record[4], name))
+			continue
+
+		t, st, pt, gt = record[1:5]
+		if t0 is None:
+			t0 = t
+		if t - t0 < next_time.get(record[-1], 0):
+			continue
+		next_time[record[-1]] = next_time.get(record[-1], 0) + interval
+
+		if parameters:
+			print("%i\t%0.2f\t%0.2f\t%0.2f%s" % (t - t0, st, pt, gt, name))  # print time (s), set, control probe and periphery sensor temperature (C)
+		else:
+			print("%i\t%0.2f%s" % (t - t0, pt, name))  # print time and control temperature
+
+if __name__ == '__main__':
+
+	import ConfigParser
+
+	config = ConfigParser.ConfigParser()
+	config.read('config.txt')
+
+	try:
+		subscriber = Subscriber(config.get("communication","telemetry_socket"))
+	except socket.error, e:
+		print '\n--> Error: no telemetry published: %s\n' % e
+		sys.exit()
+
+	try:
+		if len(sys.argv) > 1 and sys.argv[1] == 'events':
+			for record in subscriber:
+				if record[0] == 'E':
+					print "%s\t%i\t--> %s %s\t%s" % (time.strftime('%H:%M:%S', time.localtime(record[1])), record[2], record[3], record[4], record[5] or '')
+		else:
+			monitor(subscriber, events=True)
+	except KeyboardInterrupt:
+		pass
+
+	subscriber.close()
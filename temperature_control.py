@@ -18,25 +18,124 @@
 
 import os
 import sys 
+import math
 import time
+import socket
+import threading
 
 import auxil
-import commands
+import codec
+
+from sampler import Sampler, Sampling_policy
+from announcer import Announcer, Null_announcer
+from telemetry import Telemetry, Null_telemetry, Subscriber, monitor
+from protocol import Protocol
+from checkpoint import Checkpoint
+from calibration import Calibration, calibration_path
+from step_loops import Steady_state_wait, Trigger_wait, Incubation
+from planner import Trigger_table
+from autotune import Gain_table, RELAY_BAND, tune_gains
+from clock import Real_clock, Scheduler
+from binary_log import Binary_log
+from log_writer import Queued_file
+
+TEMPERATURE_REGISTERS = [codec.read_frame('03'), codec.read_frame('01'), codec.read_frame('06')]  # set, control, periphery
+SHADOW_REGISTERS = [('1c', '03'), ('1d', '51'), ('1e', '52'), ('1f', '53')]  # (write, read) commands of set temperature and PID gains
+
+BANNER = """
+*********************************************************************   
+*                                                                   *      
+*              ***  THIS IS THE GENOTYPER LOG-FILE  ***             *
+*                                                                   *
+*                Current biochemistery parameter set:	            *
+*                                                                   *
+*********************************************************************\n"""
+
+def log_config_parameters(config, logger):
+	"""Logs all configuration parameters into logger [log_option 0] or into a parameter log-file of
+	cfg_dir [log_option 1], named by its path and not by the working directory, which stays as it is"""
+
+	log_option = int(config.get("communication","log_option"))
+
+	if log_option == 0:
+		logger.info("\n" + BANNER)
+
+		for section in config.sections():
+			logger.info("[" + section + "]\n")
+
+			for (key, value) in config.items(section):
+				if key == "__name__":
+					continue
+				logger.info("%s = %s" % (key, value))
+			logger.info("\n")
+
+	elif log_option == 1:
+
+		cfg_dir = config.get("communication","cfg_dir")
+		if not os.path.isdir(cfg_dir):
+			try:
+				os.makedirs(cfg_dir)
+			except OSError:
+				pass  # made by another device meanwhile
+
+		from datetime import datetime
+		t = datetime.now().strftime('%m-%d-%y %H:%M:%S')
+
+		cfg_log = open(os.path.join(cfg_dir, "parameter_" + t + ".log"), 'a')  # open up log-file to be written
+		cfg_log.write(BANNER + "\n")
+
+		for section in config.sections():
+			cfg_log.write("[" + section + "]\n\n")
+
+			for (key, value) in config.items(section):
+				if key == "__name__":
+					continue
+				cfg_log.write("%s = %s\n" % (key, value))
+			cfg_log.write("\n")
+		cfg_log.close()  # close log-file
+
+	else:
+		print '--> Error: not correct input!\n--> Usage in log-file: [communications] > log_option > 0|1\n'
+		sys.exit()
 
 class Temperature_control():
 
-	def __init__(self, config, serial, logger=None):
-		"Initialize 5R7-001 temperature controller object with default parameters"
+	def __init__(self, config, serial, logger=None, clock=None, log_config=True):
+		"""Initialize 5R7-001 temperature controller object with default parameters. All protocol 
+		timing follows clock [default: Real_clock()], a Virtual_clock runs protocols faster than real time.
+		Unless log_config is cleared (configuration logged by its owner), configuration is logged."""
 
 		self.cycle = 0  # initialize pcr cycle loop iteration counter
 
+		if clock is None:
+			clock = Real_clock()
+		self.clock = clock  # time source of protocol timing and temperature log
+
 		if logger is not None:
 			self.logging = logger  # if defined, assign logger object to temperature controller
 
 		self.serial = serial  # assign serial port object to temperature controller
 		self.config = config  # assign configuration object to temperature controller
+		self.announcer = Null_announcer()  # silent until speech option is known
+		self.telemetry = Null_telemetry()  # unpublished until telemetry option is known
 		self.get_config_parameters()  # retrieve all configuatrion parameters from file
-		self.log_config_parameters()  # register current configuration parameter list
+
+		self.serial.timeout = self.response_timeout  # bound every serial read by response deadline
+		self.response_time = 0  # duration of last register read-out (s)
+		self.sampler = None  # acquisition thread owning serial port, if started
+		self.sample_count = 0  # number of sampler snapshots consumed
+		self.target_temp = 0  # last target temperature set (C)
+		self.position = None  # (source, plan digest, action index) of running protocol, see save_checkpoint
+		self.step_name = None  # clip name or label of running protocol step
+		self.set_points = []  # (set point, step name) of every set point change logged, see record_set_point
+		self.shadow = {}  # write command -> raw register value held by controller
+		if log_config:
+			self.log_config_parameters()  # register current configuration parameter list
+
+		try:
+			self.resync_registers()  # initialize shadow registers from controller
+		except IOError, e:
+			self.logging.warn("-\t--> Shadow registers not initialized: %s" % e)
 
 		self.logging.info("-\t--> Temperature controller object constructed")
 
@@ -49,6 +148,112 @@ class Temperature_control():
 # controlled, but does not need to know how to communicate with the device. Each func-
 # tional command will block until execution is complete.
 #
+#--------------------------------------------------------------------------------------#
+#				COMMUNICATION   				       #
+#--------------------------------------------------------------------------------------#
+
+#------------------------------- Read register value -----------------------------------
+
+	def read_register(self, command):
+		"""Sends read command frame and returns raw register value of the framed response, a float.
+		Returns as soon as a valid response arrived and records its latency in response_time."""
+
+		return self.read_registers([command])[0]
+
+#--------------------------- Read multiple register values -----------------------------
+
+	def read_registers(self, frames):
+		"""Sends all read command frames in one pipelined write and returns the list of raw register
+		values. The controller answers in request order, so responses are matched to commands by
+		position; response_time records the latency of the whole batch."""
+
+		if self.on_sampler():
+			return self.sampler.read(frames)  # let acquisition thread perform transfer
+
+		t0 = time.time()
+		self.serial.flushInput()  # flush input buffer
+		self.serial.write(''.join(frames))
+
+		values = []
+		for frame in frames:
+			value, elapsed = auxil.read_response(self.serial, self.response_timeout)
+			values.append(value)
+
+		self.response_time = time.time() - t0
+		return values
+
+#-------------------------------- Write command frame ----------------------------------
+
+	def write_command(self, command):
+		"Sends command frame to controller, queued to the acquisition thread if sampler is running"
+
+		if self.on_sampler():
+			self.sampler.write(command)
+		else:
+			self.serial.flushInput()  # flush input buffer
+			self.serial.write(command)
+
+#------------------------------ Write register value -----------------------------------
+
+	def write_register(self, command, value):
+		"""Writes decimal value (rounded up to integer) to writable register of command, unless its 
+		shadow copy shows the controller already holds it. Returns True if a write was sent."""
+
+		value = int(math.ceil(value))
+
+		if self.shadow.get(command) == value:
+			return False
+
+		self.write_command(auxil.set_command(command, value))
+		self.shadow[command] = value
+		return True
+
+#--------------------------- Shadow register maintenance -------------------------------
+
+	def resync_registers(self):
+		"Reloads shadow copy of every writable register from controller in one pipelined read-out"
+
+		values = self.read_registers([codec.read_frame(read) for (write, read) in SHADOW_REGISTERS])
+
+		self.shadow = {}
+		for (write, read), value in zip(SHADOW_REGISTERS, values):
+			self.shadow[write] = int(value)
+
+		self.logging.debug("%i\t--> Resynchronized shadow registers: %s" % (self.cycle, self.shadow))
+
+	def invalidate_registers(self):
+		"Discards shadow registers, so every following write is sent to controller"
+
+		self.shadow = {}
+
+#------------------------------- Background sampling -----------------------------------
+
+	def on_sampler(self):
+		"Returns True if serial port is owned by a running sampler thread other than the caller"
+
+		return self.sampler is not None and self.sampler.is_alive() and threading.current_thread() is not self.sampler
+
+	def start_sampler(self):
+		"""Starts acquisition thread that samples temperature snapshots into its ring buffer at 
+		sampler_rate (Hz) and performs every further serial transfer on behalf of the caller."""
+
+		if self.clock.virtual:  # a virtual clock is driven by the protocol thread only
+			self.logging.warn("%i\t--> Sampler not started on virtual clock" % self.cycle)
+			return
+
+		self.sampler = Sampler(self, self.sampler_rate, self.ring_size)
+		self.sample_count = 0
+		self.sampler.start()
+		self.logging.info("%i\t--> Started sampler at %0.2f Hz" % (self.cycle, self.sampler_rate))
+
+	def stop_sampler(self):
+		"Stops acquisition thread, serial port is accessed directly again"
+
+		if self.sampler is not None:
+			self.sampler.stop()
+			self.logging.info("%i\t--> Stopped sampler after %i samples" % (self.cycle, self.sampler.ring.count))
+			self.sampler = None
+
 #--------------------------------------------------------------------------------------#
 #				BASIC SETTINGS   				       #
 #--------------------------------------------------------------------------------------#
@@ -58,11 +263,10 @@ class Temperature_control():
 	def set_control_on(self):
 		"Sets RUN flag in regulator, so main output is opened"
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/control_on.wav')
+		self.announcer.say('control_on')
+		self.publish('control_on')
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write(auxil.set_command('2d', 1))  # set RUN flag command
+		self.write_command(auxil.set_command('2d', 1))  # set RUN flag command
 		self.logging.info("%i\t--> Set temperature control ON" % self.cycle)
 
 #------------------------ Turn temperature controller OFF ------------------------------
@@ -70,11 +274,10 @@ class Temperature_control():
 	def set_control_off(self):
 		"Clears RUN flag in regulator, so main output is blocked"
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/control_off.wav')
+		self.announcer.say('control_off')
+		self.publish('control_off')
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write(auxil.set_command('2d', 0))  # clear RUN flag command 
+		self.write_command(auxil.set_command('2d', 0))  # clear RUN flag command 
 		self.logging.info("%i\t--> Set temperature control OFF" % self.cycle)
 
 #--------------------------------------------------------------------------------------#
@@ -86,53 +289,63 @@ class Temperature_control():
 	def set_temperature(self, temperature):
 		"Sets main temperature reference (C), a float"
 
-		if self.speech_option == 1:
-
-			if temperature == self.temp1:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_temp1.wav')
-			elif temperature == self.temp2:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_temp2.wav')
-			elif temperature == self.temp3:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_temp3.wav')
-			elif temperature == self.temp4:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_temp4.wav')
-			elif temperature == self.temp5:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_temp5.wav')
-			elif temperature == self.temp6:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_temp6.wav')
- 			else:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/set_to_target.wav')
+		clip = 'set_to_target'
+		for i in range(1, 7):
+			if temperature == getattr(self, 'temp%i' % i, None):
+				clip = 'set_to_temp%i' % i
+				break
+		self.announcer.say(clip)
+		self.publish('set_temperature', '%.2f' % temperature)
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write(auxil.set_command('1c', temperature * 100))
-		self.logging.info("%i\t--> Set target temperature to %.2f C" % (self.cycle, temperature))
+		self.target_temp = temperature
+		self.record_set_point(temperature)
+
+		if self.write_register('1c', temperature * 100):
+			self.logging.info("%i\t--> Set target temperature to %.2f C" % (self.cycle, temperature))
+		else:
+			self.logging.debug("%i\t--> Target temperature already %.2f C" % (self.cycle, temperature))
+
+	def record_set_point(self, temperature):
+		"""Records set point change (C) along with the protocol step it belongs to, so the archive names
+		the steps of the temperature log by the protocol and not by their temperatures"""
+
+		if not self.set_points or self.set_points[-1][0] != temperature:
+			self.set_points.append((temperature, self.step_name))
+
+	def record_step(self, name):
+		"Records name (clip name or label) of protocol step started"
+
+		self.step_name = name
 
 #---------------------------- Set proportional bandwidth -------------------------------
 
 	def set_P_bandwidth(self, pb):
 		"Sets proportional bandwidth in PID control, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write(auxil.set_command('1d', pb * 50))
-		self.logging.info("%i\t--> Set proportional bandwidth to %.2f" % (self.cycle, pb))
+		if self.write_register('1d', pb * 50):
+			self.logging.info("%i\t--> Set proportional bandwidth to %.2f" % (self.cycle, pb))
+		else:
+			self.logging.debug("%i\t--> Proportional bandwidth already %.2f" % (self.cycle, pb))
 
 #--------------------------------- Set integral gain -----------------------------------
 
 	def set_I_gain(self, ig):
 		"Sets integral gain in PID control, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write(auxil.set_command('1e', ig * 100))
-		self.logging.info("%i\t--> Set integral gain to %.2f" % (self.cycle, ig))
+		if self.write_register('1e', ig * 100):
+			self.logging.info("%i\t--> Set integral gain to %.2f" % (self.cycle, ig))
+		else:
+			self.logging.debug("%i\t--> Integral gain already %.2f" % (self.cycle, ig))
 
 #--------------------------------- Set integral gain -----------------------------------
 
 	def set_D_gain(self, dg):
 		"Sets derivative gain in PID control, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write(auxil.set_command('1f', dg * 100))
-		self.logging.info("%i\t--> Set derivative gain to %.2f" % (self.cycle, dg))
+		if self.write_register('1f', dg * 100):
+			self.logging.info("%i\t--> Set derivative gain to %.2f" % (self.cycle, dg))
+		else:
+			self.logging.debug("%i\t--> Derivative gain already %.2f" % (self.cycle, dg))
 
 #--------------------------------------------------------------------------------------#
 #				 STATUS CHECKING				       #
@@ -143,55 +356,57 @@ class Temperature_control():
 	def get_control_temperature(self):
 		"Gets control temperature sensor reading, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write('*00010000000041\r')
-		return float(auxil.get_response(self.serial.read(12)))/100
+		return self.read_register(codec.read_frame('01'))/100
 
 #--------------------------- Get periphery temperature ---------------------------------
 
 	def get_periphery_temperature(self):
 		"Gets periphery temperature sensor reading, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write('*00060000000046\r')
-		return float(auxil.get_response(self.serial.read(12)))/100
+		return self.read_register(codec.read_frame('06'))/100
 
 #------------------------------ Get set temperature ------------------------------------
 
 	def get_set_temperature(self):
 		"Gets set temperature value of temperature controller, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write('*00030000000043\r')
-		return float(auxil.get_response(self.serial.read(12)))/100
+		return self.read_register(codec.read_frame('03'))/100
 
+#--------------------------- Get temperature snapshot ----------------------------------
+
+	def get_temperatures(self):
+		"""Gets (time, set, control, periphery) temperature snapshot of one pipelined read-out, 
+		a tuple of floats."""
+
+		if self.on_sampler():  # consume next snapshot of acquisition thread
+			sample, self.sample_count = self.sampler.next_sample(self.sample_count)
+			return sample
+
+		st, pt, gt = self.read_registers(TEMPERATURE_REGISTERS)
+		sample = (self.clock.time(), st/100, pt/100, gt/100)
+		self.telemetry.sample(sample)  # every acquired snapshot is published once
+		return sample
 
 #---------------------------- Get proportional bandwidth -------------------------------
 
 	def get_P_bandwidth(self):
 		"Gets proportional bandwidth in PID control, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write('*00510000000046\r')
-		return float(auxil.get_response(self.serial.read(12)))/50
+		return self.read_register(codec.read_frame('51'))/50
 
 #--------------------------------- Get integral gain -----------------------------------
 
 	def get_I_gain(self):
 		"Gets integral gain in PID control, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write('*00520000000047\r')
-		return float(auxil.get_response(self.serial.read(12)))/100
+		return self.read_register(codec.read_frame('52'))/100
 
 #--------------------------------- Get integral gain -----------------------------------
 
 	def get_D_gain(self):
 		"Gets derivative gain in PID control, a float"
 
-		self.serial.flushInput()  # flush input buffer
-		self.serial.write('*00530000000048\r')
-		return float(auxil.get_response(self.serial.read(12)))/100
+		return self.read_register(codec.read_frame('53'))/100
 
 #--------------------------------------------------------------------------------------# 
 # 				COMPLEX FUNCTIONS 				       # 
@@ -203,63 +418,8 @@ class Temperature_control():
 		"""Logs all biochemistry and device related configuration parameters contained in 
 		the ConfigParser object using Logger facility."""
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/log_config.wav')
-
-
- 		if self.log_option == 0:
-			self.logging.info("""\n
-*********************************************************************   
-*                                                                   *      
-*              ***  THIS IS THE GENOTYPER LOG-FILE  ***             *
-*                                                                   *
-*                Current biochemistery parameter set:	            *
-*                                                                   *
-*********************************************************************\n""")
-
-          		for section in self.config.sections():
-             			self.logging.info("[" + section + "]\n")
-
-             			for (key, value) in self.config.items(section):
-                 			if key == "__name__":
-                     				continue
-                 			self.logging.info("%s = %s" % (key, value))
-             			self.logging.info("\n")
-
- 		elif self.log_option == 1:
-
-			if os.access(self.config.get("communication","cfg_dir"), os.F_OK) is False:
-				os.mkdir(self.config.get("communication","cfg_dir"))
-
-			os.chdir(self.config.get("communication","cfg_dir"))
-
-			from datetime import datetime
-			t = datetime.now()
-			time = t.strftime('%m-%d-%y %H:%M:%S')
-			
-			cfg_log = open("parameter_" + time + ".log", 'a')  # open up log-file to be written
-			cfg_log.write("""
-*********************************************************************   
-*                                                                   *      
-*              ***  THIS IS THE GENOTYPER LOG-FILE  ***             *
-*                                                                   *
-*                Current biochemistery parameter set:	            *
-*                                                                   *
-*********************************************************************\n\n""")
-
-          		for section in self.config.sections():
-             			cfg_log.write("[" + section + "]\n\n")
-
-             			for (key, value) in self.config.items(section):
-                 			if key == "__name__":
-                     				continue
-                 			cfg_log.write("%s = %s\n" % (key, value))
-             			cfg_log.write("\n")
-			cfg_log.close()  # close log-file
-
- 		else:
-			print '--> Error: not correct input!\n--> Usage in log-file: [communications] > log_option > 0|1\n'
-			sys.exit()
+		self.announcer.say('log_config')
+		log_config_parameters(self.config, self.logging)
 
 #--------------------------- Get configuration parameters ------------------------------
 
@@ -272,11 +432,30 @@ class Temperature_control():
 
 		#----------------------- Device communication --------------------------
 
+		self.response_timeout = float(self.config.get("communication","response_timeout"))
 		self.log_option = int(self.config.get("communication","log_option"))
+		self.log_format = self.config.get("communication","log_format")
+		self.sampler_option = int(self.config.get("communication","sampler_option"))
+		self.sampler_rate = float(self.config.get("communication","sampler_rate"))
+		self.ring_size = int(self.config.get("communication","ring_size"))
 		self.speech_option = int(self.config.get("communication","speech_option"))
+		self.speech_player = self.config.get("communication","speech_player")
+		self.telemetry_option = int(self.config.get("communication","telemetry_option"))
+		self.telemetry_socket = self.config.get("communication","telemetry_socket")
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/get_config.wav')
+		if self.speech_option == 1 and not self.announcer.active:  # load speech clips once
+			speech_dir = os.path.join(self.config.get("communication","home_dir"), 'speech')
+			self.announcer = Announcer(speech_dir, self.speech_player, logger=self.logging)
+			self.announcer.start()
+
+		if self.telemetry_option == 1 and not self.telemetry.active:  # publish stream once
+			try:
+				self.telemetry = Telemetry(self.telemetry_socket, self.logging)
+				self.telemetry.start()
+			except socket.error, e:
+				self.logging.warn("-\t--> Telemetry not published: %s" % e)
+
+		self.announcer.say('get_config')
 
 		#------------------------------ PCR parameters -------------------------------------
 
@@ -306,6 +485,16 @@ class Temperature_control():
 		self.temp4 = float(self.config.get("pcr_parameters","temp4"))
 		self.temp5 = float(self.config.get("pcr_parameters","temp5"))
 
+		self.set_temp1 = float(self.config.get("pcr_parameters","set_temp1"))
+		self.set_temp2 = float(self.config.get("pcr_parameters","set_temp2"))
+		self.set_temp3 = float(self.config.get("pcr_parameters","set_temp3"))
+		self.set_temp4 = float(self.config.get("pcr_parameters","set_temp4"))
+
+		self.poll_temp1 = float(self.config.get("pcr_parameters","poll_temp1"))
+		self.poll_temp2 = float(self.config.get("pcr_parameters","poll_temp2"))
+		self.poll_temp3 = float(self.config.get("pcr_parameters","poll_temp3"))
+		self.poll_temp4 = float(self.config.get("pcr_parameters","poll_temp4"))
+
 		self.SS_time1 = int(self.config.get("pcr_parameters","SS_time1"))
 		self.SS_time2 = int(self.config.get("pcr_parameters","SS_time2"))
 		self.SS_time3 = int(self.config.get("pcr_parameters","SS_time3"))
@@ -313,46 +502,79 @@ class Temperature_control():
 		self.SS_final = int(self.config.get("pcr_parameters","SS_final"))
 
 		self.temp_tolerance = float(self.config.get("pcr_parameters","temp_tolerance"))
+
+		self.triggers = None  # planned overshoot transitions, see planner.py
+		trigger_table = os.path.join(self.config.get("communication","home_dir"), self.config.get("pcr_parameters","trigger_table"))
+		if os.path.exists(trigger_table):
+			self.triggers = Trigger_table.load(trigger_table)
+			self.logging.info("%i\t--> Loaded trigger table of %i transitions from %s" % (self.cycle, len(self.triggers.transitions), trigger_table))
+
+		self.overshoot_limit = float(self.config.get("pcr_parameters","overshoot_limit"))
+		self.tune_time = float(self.config.get("pcr_parameters","tune_time"))
+		self.tune_method = self.config.get("pcr_parameters","tune_method")
+
+		self.gain_table = None  # auto-tuned PID gains per transition, see auto_tune
+		self.gain_path = os.path.join(self.config.get("communication","home_dir"), self.config.get("pcr_parameters","gain_table"))
+		if os.path.exists(self.gain_path):
+			self.gain_table = Gain_table.load(self.gain_path)
+			self.logging.info("%i\t--> Loaded gain table of %i transitions from %s" % (self.cycle, len(self.gain_table.transitions), self.gain_path))
+		self.checkpoint = None  # protocol run checkpoint, see resume_protocol
+		if int(self.config.get("communication","checkpoint_option")) == 1:
+			self.checkpoint = Checkpoint(os.path.join(self.config.get("communication","home_dir"), self.config.get("pcr_parameters","checkpoint_file")))
+		self.checkpoint_interval = float(self.config.get("pcr_parameters","checkpoint_interval"))
+
+		self.calibration = None  # control-to-channel calibration of chip type, see calibration.py
+		self.chip_type = self.config.get("pcr_parameters","chip_type")
+		if int(self.config.get("pcr_parameters","calibration_option")) == 1:
+			path = calibration_path(self.config)
+			if os.path.exists(path):
+				self.calibration = Calibration.load(path)
+				self.logging.info("%i\t--> Loaded %s calibration from %s - lag: %0.2f s, rms error: %0.3f C" % (self.cycle, self.chip_type, path, self.calibration.lag, self.calibration.rms))
+			else:
+				self.logging.warn("%i\t--> No calibration of chip type %s, protocol temperatures are control temperatures" % (self.cycle, self.chip_type))
+
 		self.time_limit = int(self.config.get("pcr_parameters","time_limit"))
 		self.sampling_time = float(self.config.get("pcr_parameters","sampling_time"))
 		self.sampling_period = float(self.config.get("pcr_parameters","sampling_period"))
+		self.adaptive_option = int(self.config.get("pcr_parameters","adaptive_option"))
+		self.sampling_fast = float(self.config.get("pcr_parameters","sampling_fast"))
+		self.sampling_slow = float(self.config.get("pcr_parameters","sampling_slow"))
+		self.sampling_slope = float(self.config.get("pcr_parameters","sampling_slope"))
+		self.sampling_error = float(self.config.get("pcr_parameters","sampling_error"))
+
+		self.SS_window = float(self.config.get("pcr_parameters","SS_window"))
+		self.SS_slope = float(self.config.get("pcr_parameters","SS_slope"))
+		self.SS_std = float(self.config.get("pcr_parameters","SS_std"))
 
 #------------------------- Steady-state temperature waiting ----------------------------
 
-	def wait_for_SS(self, channel_target, tolerance=None):
+	def wait_for_SS(self, channel_target, tolerance=None, window=None, max_slope=None, max_std=None, channel=False):
 		"""Waits until steady-state temperature is reached, or exits wait block if ramping
-		time exceeds time limit parameter set in configuration file."""
-
-		self.logging.info("%i\t--> Wait for steady-state - set temperature: %.2f C" % (self.cycle, channel_target))
+		time exceeds time limit parameter set in configuration file. Steady state is reached
+		once the control temperature window of given length (s) has its mean within tolerance
+		(C) of the target, its slope within max_slope (C/s) and its standard deviation within
+		max_std (C) [defaults: SS_window, SS_slope, SS_std configuration parameters]. If channel
+		is set, the channel temperature estimated by calibration is watched instead."""
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/wait_for_SS.wav')
+		wait = Steady_state_wait(self, channel_target, tolerance, window, max_slope, max_std, channel)
+		schedule = self.adaptive_schedule('wait_for_SS', wait.window / 4)  # keep detector window filled
+		t0 = self.clock.time()  # get current time
 
-		if tolerance is None:  # if temperature tolerance is not defined, set default to +/- 1 C
-			tolerance = 1
-
-		t0 = time.time()  # get current time
 		while(True):
 
-			ct = self.get_control_temperature()  # get control temperature value
-			temp_diff = abs(channel_target - ct)  # calculate difference between target and actual temperature of control probe
-
-			delta = time.time() - t0 # elapsed time in seconds
+			sample = self.get_temperatures()  # get temperature snapshot
+			delta = self.clock.time() - t0 # elapsed time in seconds
+			done = wait.add(sample, delta)  # log sample, check steady state and time limit
 
-			sys.stdout.write("TIME\t -\t--> Elapsed time [s]: %i and current temperature [C]: %0.2f  \r" % (int(delta), ct))
+			sys.stdout.write("TIME\t -\t--> Elapsed time [s]: %i and current temperature [C]: %0.2f  \r" % (int(delta), wait.temperature))
 			sys.stdout.flush()
-			self.log_temperature()  # log temperature related parameters into log-file
-			time.sleep(self.sampling_time)
 
-			if temp_diff <= tolerance and temp_diff != 0:
-				break
-                        
-			if delta > self.time_limit * 60:
-				self.logging.warn("%i\t--> Time limit of %s minute(s) exceeded -> [current: %0.2f, target: %0.2f] C" % (self.cycle, self.time_limit, ct, channel_target))
+			if done:
 				break
 
-		elapsed = (time.time() - t0)
-		self.logging.warn("%i\t--> Time to set steady-state temperature: %0.2f seconds and current temperature: %0.2f C" % (self.cycle, elapsed, ct))
+			schedule.sleep(sample=sample)  # wait for next sampling deadline
+
+		wait.finish(schedule, self.clock.time() - t0)
 
 #------------------------------ Pulling trigger point ----------------------------------
 
@@ -361,153 +583,210 @@ class Temperature_control():
 		   set point at a given trigger point. This function can set a step-wise ramping,
 		   providing a steeper temperature ramping curve."""
 
-		self.logging.info("%i\t--> Pull trigger - poll temperature: %0.2f C" % (self.cycle, poll_temp))
-
-		if tolerance is None:  # if temperature tolerance is not defined, set default to +/- 1 C
-			tolerance = 1
-
-		t0 = time.time()  # get current time
-		hs = self.get_control_temperature()  # get control temperature value
-
-		if set_temp - poll_temp >= 0:  # if ramping up
-			if poll_temp >= hs:
-
-				temp_diff = abs(poll_temp - hs)  # calculate difference between poll and heat spreader temperature
-				while temp_diff > tolerance:
-					
-					temp_diff = abs(poll_temp - hs)  # calculate difference between poll and heat spreader temperature
-					hs = self.get_control_temperature()  # get control temperature value
-
-					delta = time.time() - t0 # elapsed time in seconds
-					sys.stdout.write("TIME\t -\t--> Elapsed time [s]: %i and current temperature [C]: %0.2f  \r" % (int(delta), hs))
-					sys.stdout.flush()
-					self.log_temperature()  # log temperature related parameters into log-file
-					time.sleep(self.sampling_time)
-                         
-					if delta > self.time_limit * 60:
-						self.logging.warn("%i\t --> Time limit %s exceeded -> [current: %0.2f, target: %0.2f] C" % (self.cycle, self.time_limit, hs, poll_temp))
-						break
-		else:  # if ramping down
-			if poll_temp <= hs:
-
-				temp_diff = abs(poll_temp - hs)  # calculate difference between poll and heat spreader temperature
-				while temp_diff > tolerance:
-					
-					temp_diff = abs(poll_temp - hs)  # calculate difference between poll and heat spreader temperature
-					hs = self.get_control_temperature()  # get control temperature value
-
-					delta = time.time() - t0 # elapsed time in seconds
-					sys.stdout.write("TIME\t -\t--> Elapsed time [s]: %i and current temperature [C]: %0.2f  \r" % (int(delta), hs))
-					sys.stdout.flush()
-					self.log_temperature()  # log temperature related parameters into log-file
-					time.sleep(self.sampling_time)
-                         
-					if delta > self.time_limit * 60:
-						self.logging.warn("%i\t --> Time limit %s exceeded -> [current: %0.2f, target: %0.2f] C" % (self.cycle, self.time_limit, hs, poll_temp))
-						break		
-
-		elapsed = (time.time() - t0) / 60
-
-		self.logging.warn("%i\t--> Time to reach trigger point: %0.2f minutes and current temperature: %0.2f C" % (self.cycle, elapsed, hs))
+		trigger = Trigger_wait(self, self.target_temp, poll_temp, tolerance)
+		schedule = self.adaptive_schedule('pull_trigger')
+		t0 = self.clock.time()  # get current time
 
-#------------------------- Incubate and count elapsed time ----------------------------
+		while True:
 
-	def incubate_reagent(self, time_sec):
-		"""Incubates reagent for given amount of time and dynamically counts elapsed time 
-		in seconds to update user about incubation state."""
+			sample = self.get_temperatures()  # get temperature snapshot
+			hs = sample[2]  # control temperature value
+			if not trigger.pending(hs):  # reached or passed
+				break
 
-		self.logging.info("%i\t--> Incubate reagent for %i s at %0.2f C target temperature" % (self.cycle, time_sec, target_temp))
+			delta = self.clock.time() - t0 # elapsed time in seconds
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/incubate_reagent.wav')
+			sys.stdout.write("TIME\t -\t--> Elapsed time [s]: %i and current temperature [C]: %0.2f  \r" % (int(delta), hs))
+			sys.stdout.flush()
+
+			if trigger.add(sample, delta):  # log sample, check time limit
+				break
 
-		delta = 0  # initial time difference, ergo zero
-		t0 = time.time()  # get current time
+			schedule.sleep(sample=sample)  # wait for next sampling deadline
+
+		trigger.finish(schedule, self.clock.time() - t0)
+
+#------------------------- Incubate and count elapsed time ----------------------------
+
+	def incubate_reagent(self, time_sec, elapsed=0):
+		"""Incubates reagent for given amount of time and dynamically counts elapsed time 
+		in seconds to update user about incubation state. A resumed incubation has elapsed 
+		seconds behind it already."""
+
+		incubation = Incubation(self, time_sec, elapsed)
+		schedule = self.adaptive_schedule('incubate_reagent')
+		delta = elapsed  # initial time difference, zero unless resumed
+		t0 = self.clock.time() - elapsed  # get current time
 
 		while delta <= time_sec:  # incubation time loop
 
-			ct = self.get_control_temperature()  # get actual control temperature value
-			time.sleep(self.sampling_time)
-			delta = time.time() - t0 # elapsed time in seconds
+			sample = self.get_temperatures()  # get temperature snapshot
+			schedule.sleep(sample=sample)  # wait for next sampling deadline
+			delta = self.clock.time() - t0 # elapsed time in seconds
 
-			sys.stdout.write("TIME\t %i\t--> Elapsed time [s]: %i of %i and current temperature [C]: %0.2f\r" % (self.cycle, int(delta), time_sec, ct))
+			sys.stdout.write("TIME\t %i\t--> Elapsed time [s]: %i of %i and current temperature [C]: %0.2f\r" % (self.cycle, int(delta), time_sec, sample[2]))
 			sys.stdout.flush()
-			self.log_temperature()  # log temperature related parameters into log-file
+			incubation.add(sample, delta)  # log sample, save checkpoint
 
+		schedule.report(self.cycle)
 		print '\n'
 
+#------------------------------ Open temperature log -----------------------------------
+
+	def open_logfile(self, log_dir, writer=None, name='pcr_temperature'):
+		"""Opens temperature log-file of given name in log directory, either tab-separated text
+		(.log) or compact binary (.bin) depending on log_format configuration parameter. If a
+		Log_writer is given, the log-file is written by its thread instead of the sampling loop."""
+
+		if self.log_format == 'binary':
+			self.logfile_path = os.path.join(log_dir, name + '.bin')
+			stream = open(self.logfile_path, 'wb')
+		else:
+			self.logfile_path = os.path.join(log_dir, name + '.log')
+			stream = open(self.logfile_path, 'w')
+
+		if writer is not None:
+			stream = Queued_file(writer, stream)
+
+		if self.log_format == 'binary':
+			metadata = {'start': self.clock.time(), 'serial_port': self.serial.port, 'config': {}}
+			for section in self.config.sections():
+				metadata['config'][section] = dict(self.config.items(section))
+
+			self.logfile = Binary_log(stream, metadata)
+		else:
+			self.logfile = stream
+
+		self.set_points = self.set_points[-1:]  # set point in effect when log-file starts
+		self.logging.info("%i\t--> Opened %s temperature log-file in %s" % (self.cycle, self.log_format, log_dir))
+		return self.logfile
+
 #----------------------------- Record temperature log ----------------------------------
 
-	def log_temperature(self):
-		"""Records target temperature related parameters of microdevice into a log-file."""
+	def log_temperature(self, sample=None):
+		"""Records target temperature related parameters of microdevice into a log-file. If a
+		temperature snapshot is given, it is logged instead of reading the controller again."""
+
+		if sample is None:
+			sample = self.get_temperatures()  # get (time, set, control probe, periphery) temperatures
+
+		if self.log_format == 'binary':
+			self.logfile.append(sample)  # one fixed-width record
+		else:
+			self.logfile.write("%f\t%f\t%f\t%f\n" % sample)  # write time (s), set, control probe and microdevice channel temperature (C) into log-file
+
+#------------------------------ Fixed-rate schedule ------------------------------------
+
+	def schedule(self, period, name):
+		"Returns scheduler of sampling loop name, running at a fixed period (s) on controller clock"
+
+		return Scheduler(self.clock, period, name, self.logging)
+
+	def adaptive_schedule(self, name, slowest=None):
+		"""Returns scheduler of protocol sampling loop name: if adaptive option is set, its period is
+		sampling_fast while ramping and backs off to sampling_slow [or slowest, if shorter] during
+		holds, otherwise it is sampling_time. No period is shorter than the last measured read-out."""
+
+		if self.adaptive_option != 1:
+			return self.schedule(self.sampling_time, name)
+
+		slow = self.sampling_slow
+		if slowest is not None:
+			slow = min(slow, slowest)
+
+		fast = max(self.sampling_fast, self.response_time)  # a read-out takes response_time on the link
+		policy = Sampling_policy(fast, slow, self.sampling_slope, self.sampling_error)
+		return Scheduler(self.clock, fast, name, self.logging, policy)
+
+#------------------------------ Publish step event -------------------------------------
+
+	def publish(self, name, value=''):
+		"Publishes step event name with its value on telemetry stream"
+
+		self.telemetry.event(self.clock.time(), self.cycle, name, value)
 
-		st = self.get_set_temperature()   # get set temperature of controller
-		pt = self.get_control_temperature()  # get control probe temperature
-		ct = self.get_periphery_temperature()  # get actual periphery temperature value
+	def subscribe(self):
+		"""Returns subscriber of telemetry published by another process (e.g. daemon.py or a
+		running PCR), or None if there is none"""
 
-		self.logfile.write("%f\t%f\t%f\t%f\n" % (time.time(), st, pt, ct))  # write time (s), set, control probe and microdevice channel temperature (C) into log-file
+		if self.telemetry.active:
+			return None  # this process publishes, its acquisition would not run while monitoring
+
+		try:
+			return Subscriber(self.telemetry_socket)
+		except socket.error:
+			return None
 
 #------------------------- Monitor temperature on console ------------------------------
 
 	def monitor_temperature(self):
-		"""Prints continuous temperature reading along with time steps on console."""
+		"""Prints continuous temperature reading along with time steps on console. If telemetry
+		is published by another process, its stream is printed instead of polling the controller."""
+
+		subscriber = self.subscribe()
+		if subscriber is not None:
+			monitor(subscriber, parameters=False)
+			return
 
 		ti = 0  # set initial time to zero
 		print("\nT (s)\tCONTROL (C)") 
 
-		self.serial.flushInput()  # clear input buffer
-
+		schedule = self.schedule(1, 'monitor_temperature')
 		while(True):
 			gt = self.get_control_temperature()  # get control temperature
 
 			print("%i\t%0.2f" % (ti, gt))  # print time and control temperature
 			ti = ti + 1  # update current sampling time 
-			time.sleep(1)  # sleep for one sampling time duration
+			schedule.sleep()  # wait for next one second deadline
 
 #-------------------------- Monitor parameters on console ------------------------------
 
 	def monitor_parameters(self):
-		"""Prints continuous temperature parameters on console."""
+		"""Prints continuous temperature parameters on console. If telemetry is published by
+		another process, its stream is printed instead of polling the controller."""
+
+		subscriber = self.subscribe()
+		if subscriber is not None:
+			monitor(subscriber)
+			return
 
 		ti = 0  # set initial time to zero
 		print("\nT (s)\tST (C)\tPT (C)\tGT (C)") 
 
-		self.serial.flushInput()  # clear input buffer
-
+		schedule = self.schedule(1, 'monitor_parameters')
 		while(True):
 
-			st = self.get_set_temperature()   # get set temperature of controller
-			pt = self.get_control_temperature()  # get control probe temperature
-			gt = self.get_periphery_temperature()  # get periphery temperature
+			t, st, pt, gt = self.get_temperatures()  # get set, control probe and periphery temperature
 
 			print("%i\t%0.2f\t%0.2f\t%0.2f" % (ti, st, pt, gt))  # print time (s), set, control probe and periphery sensor temperature (C)
 			ti = ti + 1  # update current sampling time 
-			time.sleep(1)  # sleep for one sampling time duration
+			schedule.sleep()  # wait for next one second deadline
 
 #-------------------------- Monitor parameters on console ------------------------------
 
 	def sample_parameters(self):
 		"""Records contious target temperature related parameters of microdevice onto console and into a log-file."""
 
-		t0 = time.time()  # get current time
+		schedule = self.schedule(self.sampling_time, 'sample_parameters')
+		t0 = self.clock.time()  # get current time
 		ti = 0  # set initial time to zero
 		delta = 0  # initial time difference, ergo zero		
 
-		self.serial.flushInput()  # clear input buffer
 		print("\nT (s)\tST (C)\tPT (C)\tGT (C)") 
 
 		while delta <= self.sampling_period * 60:  # incubation time loop
 
-			st = self.get_set_temperature()   # get set temperature of controller
-			pt = self.get_control_temperature()  # get control probe temperature
-			gt = self.get_periphery_temperature()  # get periphery temperature
+			sample = self.get_temperatures()  # get (time, set, control probe, periphery) temperatures
+			t, st, pt, gt = sample
 
-			self.log_temperature()  # log temperature related parameters into log-file
-			print("%i\t%0.2f\t%0.2f\t%0.2f" % (ti, st, pt, gt))  # print time (s), set, control probe and periphery sensor temperature (C)
+			self.log_temperature(sample)  # log temperature related parameters into log-file
+			print("%0.2f\t%0.2f\t%0.2f\t%0.2f" % (ti * self.sampling_time, st, pt, gt))  # print time (s), set, control probe and periphery sensor temperature (C)
 
 			ti = ti + 1  # update current sampling time 
-			time.sleep(0.11781) # sleep for one sampling time duration
-			delta = time.time() - t0 # elapsed time in seconds
+			schedule.sleep()  # wait for next sampling deadline
+			delta = self.clock.time() - t0 # elapsed time in seconds
+
+		schedule.report(self.cycle)
 
 #-------------------------- Press enter to exit execution ------------------------------
 
@@ -515,126 +794,193 @@ class Temperature_control():
 
 		sys.stdout.write("PROMPT\t %i\t--> Press 'Q' to quit final cooling step: " % (self.cycle))
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/exit.wav')
+		self.announcer.say('press_q_to_exit')
 
 		response = (sys.stdin.readline()).strip()  # read user prompt from keyboard
 
 		if response == 'Q' or response == 'q':  # if 'Q' or 'q' pressed
 			sys.stdout.write("PROMPT\t %i\t--> PCR final cooling step ended!\n\n" % (self.cycle))
 			self.set_control_off()  # turn external temperature controller OFF
+			self.clear_checkpoint()  # run complete
 			self.logfile.close()  # close log-file when completely finished
+			self.announcer.close(wait=True)  # let pending announcements finish
 			sys.stdout.write('\n')
 			sys.exit()  # quit execution	
 		else:
 			self.press_q_to_exit()  # otherwise recurse
 
-#----------------------- Perform PCR cycle without trigger points ----------------------
+#------------------------------ Protocol checkpoint ------------------------------------
 
-	def pcr_wo_trigger(self):
-		"""Performs PCR cycle in gene-chip (without trigger points) consisting of the following schematics:
+	def save_checkpoint(self, protocol=None, action=None, hold=0):
+		"""Saves position of protocol run into checkpoint file: its action index, PCR cycle, hold time (s) 
+		elapsed in current action and the set point and PID gains in effect. Without protocol, the 
+		position last saved is updated with hold time, not synced to disk on the sampling path."""
 
-		1. 24-90 C -> hold for 15 s (denaturation step)
-		2. 90-40 C -> hold for 30 s (annealing step)
-		3. 40-70 C -> hold for 75 s (elongation step)
-		4. 70-4  C -> hold for infinity (final hold)
+		if self.checkpoint is None:
+			return
+
+		if protocol is not None:
+			self.position = (protocol.source, protocol.digest, action)
+		if self.position is None:
+			return  # no protocol running
+
+		gains = None
+		if '1d' in self.shadow and '1e' in self.shadow and '1f' in self.shadow:
+			gains = [self.shadow['1d'] / 50.0, self.shadow['1e'] / 100.0, self.shadow['1f'] / 100.0]
 
-		[Note: steps 1-3 are repeated 20 times.]"""
+		source, digest, action = self.position
+		self.checkpoint.save({'source': source, 'digest': digest, 'action': action, 'cycle': self.cycle, 'hold': hold,
+				      'target_temp': self.target_temp, 'gains': gains, 'time': self.clock.time()}, sync=protocol is not None)
 
-		self.logging.info("%i\t--> In polymerase chain reaction" % self.cycle)
+	def clear_checkpoint(self):
+		"Removes checkpoint of completed protocol run"
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/pcr_start.wav')
+		self.position = None
+		if self.checkpoint is not None:
+			self.checkpoint.clear()
 
-		# Step 1 - denaturation
-		self.logging.info("%i\t--> In (outer) denaturation step" % self.cycle)
-		self.logging.info("%i\t--> Set PCR solution temperature to %.2f C" % (self.cycle, self.temp1))  # set temperature: 90 C
+	def restore_checkpoint(self):
+		"""Rebuilds protocol of interrupted run from checkpoint and re-establishes its device state: PCR 
+		cycle, PID gains and set point, then turns control on. Returns (protocol, action index, elapsed 
+		hold time) to run it from."""
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/outer_denaturation.wav')
+		state = None
+		if self.checkpoint is not None:
+			state = self.checkpoint.load()
+		if state is None:
+			raise IOError("No protocol run checkpoint to resume")
 
-		self.set_P_bandwidth(self.P_bandwidth1)  # set proportional bandwidth
-		self.set_I_gain(self.I_gain1)  # set integral gain
-		self.set_D_gain(self.D_gain1)  # set derivative gain
+		source = str(state['source'])
+		if source == 'pcr_wo_trigger':
+			protocol = Protocol.from_config(self, trigger=False)
+		elif source == 'pcr_wi_trigger':
+			protocol = Protocol.from_config(self, trigger=True)
+		else:
+			protocol = Protocol.load(source, self.triggers, self.gain_table, self.calibration)
 
-		self.set_temperature(self.temp1)  # set target temperature to 90 C
-		self.wait_for_SS(self.temp1, self.temp_tolerance)  # wait until steady-state is reached
-		self.incubate_reagent(self.SS_time1)  # incubate reagent for 15 sec
+		if protocol.digest != state['digest']:
+			raise ValueError("Protocol %s changed since checkpoint, cannot resume" % source)
 
-		#------------------------------ Iteration loop -------------------------------------
-		
-		for i in range(0, self.loop_iter):
+		action = state['action']
+		self.cycle = state['cycle']
+		self.logging.warn("%i\t--> Run of %s interrupted in action %i [%s] with %0.1f s of hold elapsed, last checkpoint at %s - resuming after %0.1f minutes" % (self.cycle, source, 
+			action, protocol.plan[action][0], state['hold'], time.strftime('%m-%d-%y %H:%M:%S', time.localtime(state['time'])), (self.clock.time() - state['time']) / 60))
+		self.publish('resume', action)
 
-			self.cycle = i + 1  # update PCR cycle iteration number
+		steps = [a for a in protocol.plan[:action] if a[0] == 'step']
+		if steps:
+			self.record_step(steps[-1][3] or steps[-1][1])  # step the run was interrupted in
 
-			if self.speech_option == 1:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/cycle_' + str(self.cycle) + '.wav')
+		self.invalidate_registers()  # controller may have been reset, write every register again
+		if state['gains'] is not None:
+			self.set_P_bandwidth(state['gains'][0])
+			self.set_I_gain(state['gains'][1])
+			self.set_D_gain(state['gains'][2])
+		if 'set_temperature' in [a[0] for a in protocol.plan[:action]]:
+			self.set_temperature(state['target_temp'])
+		self.set_control_on()
 
-			if i != 0:  # not first time into loop
+		return protocol, action, state['hold']
 
-				# Step 2 - denaturation
-				self.logging.info("%i\t--> In (inner) denaturation step" % self.cycle)
-				self.logging.info("%i\t--> Set PCR solution temperature to %.2f C" % (self.cycle, self.temp2))  # set temperature: 90 C
+	def resume_protocol(self):
+		"Resumes interrupted protocol run from its checkpoint"
 
-				if self.speech_option == 1:
-					commands.getstatusoutput('mplayer -ao pulse ../speech/inner_denaturation.wav')
+		protocol, action, hold = self.restore_checkpoint()
+		protocol.run(self, action, hold)
 
-				self.set_P_bandwidth(self.P_bandwidth2)  # set proportional bandwidth
-				self.set_I_gain(self.I_gain2)  # set integral gain
-				self.set_D_gain(self.D_gain2)  # set derivative gain
+#------------------------------ Run PCR protocol ---------------------------------------
 
-				self.set_temperature(self.temp2)  # set target temperature to 90 C
-				self.wait_for_SS(self.temp2, self.temp_tolerance)  # wait until steady-state is reached
-				self.incubate_reagent(self.SS_time2)  # incubate reagent for 15 sec
+	def run_protocol(self, path):
+		"""Loads declarative PCR protocol (step list with set points, overshoot/trigger points, PID sets,
+		hold times and repeat blocks) from file, compiles it into an execution plan and runs it."""
 
-			# Step 3 - annealing
-			self.logging.info("%i\t--> In (inner) annealing step" % self.cycle)
-			self.logging.info("%i\t--> Set PCR solution temperature to %.2f C" % (self.cycle, self.temp3))  # set temperature: 40 C
+		protocol = Protocol.load(path, self.triggers, self.gain_table, self.calibration)
+		self.logging.info("%i\t--> Loaded protocol %s from %s" % (self.cycle, protocol.name, path))
+		protocol.run(self)
 
-			if self.speech_option == 1:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/annealing.wav')
+#------------------------------- Auto-tune PID gains -----------------------------------
 
-			self.set_P_bandwidth(self.P_bandwidth3)  # set proportional bandwidth
-			self.set_I_gain(self.I_gain3)  # set integral gain
-			self.set_D_gain(self.D_gain3)  # set derivative gain
+	def auto_tune(self, method=None):
+		"""Identifies the plant of every PCR transition (RT-temp1, temp2-temp3, temp3-temp4, temp4-temp2,
+		temp4-temp5) by a step or relay experiment [default: tune_method configuration parameter] of 
+		tune_time seconds, computes the PID gains of shortest settling time within overshoot_limit and 
+		saves them into the gain table loaded by following PCR runs."""
 
-			self.set_temperature(self.temp3)  # set target temperature to 40 C
-			self.wait_for_SS(self.temp3, self.temp_tolerance)  # wait until steady-state is reached
-			self.incubate_reagent(self.SS_time3)  # incubate reagent for 30 sec
+		from simulator import fit_plant
 
-			# Step 4 - elongation
-			self.logging.info("%i\t--> In (inner) elongation step" % self.cycle)
-			self.logging.info("%i\t--> Set PCR solution temperature to %.2f C" % (self.cycle, self.temp4))  # set temperature: 70 C
+		if method is None:
+			method = self.tune_method
 
-			if self.speech_option == 1:
-				commands.getstatusoutput('mplayer -ao pulse ../speech/inner_elongation.wav')
+		self.logging.info("%i\t--> Auto-tune PID gains by %s experiments" % (self.cycle, method))
 
-			self.set_P_bandwidth(self.P_bandwidth4)  # set proportional bandwidth
-			self.set_I_gain(self.I_gain4)  # set integral gain
-			self.set_D_gain(self.D_gain4)  # set derivative gain
+		criteria = (self.SS_window, self.SS_slope, self.SS_std)
+		steps = [(None, 1), (2, 3), (3, 4), (4, 2), (4, 5)]  # (start step, target step) of each transition
+		transitions = []
 
-			self.set_temperature(self.temp4)  # set target temperature to 70 C
-			self.wait_for_SS(self.temp4, self.temp_tolerance)  # wait until steady-state is reached
-			self.incubate_reagent(self.SS_time4)  # incubate reagent for 75 sec
+		for start_step, target_step in steps:
+			target = getattr(self, 'temp%i' % target_step)
+			gains = (getattr(self, 'P_bandwidth%i' % target_step), getattr(self, 'I_gain%i' % target_step), getattr(self, 'D_gain%i' % target_step))
 
-		# Step 5 - final hold
-		self.logging.info("%i\t--> In (outer) final hold" % self.cycle)
-		self.logging.info("%i\t--> Set PCR solution temperature to %.2f C" % (self.cycle, self.temp5))  # set temperature: 25 C
+			if start_step is None:
+				start = self.get_control_temperature()  # ramp from room temperature
+				name = 'RT-%g' % target
+			else:
+				start = getattr(self, 'temp%i' % start_step)
+				name = '%g-%g' % (start, target)
+				self.set_P_bandwidth(gains[0])
+				self.set_I_gain(gains[1])
+				self.set_D_gain(gains[2])
+				self.set_temperature(start)
+				self.wait_for_SS(start, self.temp_tolerance)
+
+			if method == 'relay':
+				gains = (RELAY_BAND, 0, 0)  # output switches between its limits around target
+
+			self.set_P_bandwidth(gains[0])
+			self.set_I_gain(gains[1])
+			self.set_D_gain(gains[2])
+			self.set_temperature(target)
+
+			trace = ([], [], [], [])  # recorded (time, set, control, periphery) response
+			schedule = self.schedule(self.sampling_time, 'auto_tune')
+			t0 = self.clock.time()
+			while self.clock.time() - t0 <= self.tune_time:
+				sample = self.get_temperatures()
+				self.log_temperature(sample)
+				for column, value in zip(trace, sample):
+					column.append(value)
+				schedule.sleep()
+			schedule.report(self.cycle)
+
+			parameters = fit_plant([(trace, gains)])
+			self.logging.info("%i\t--> Identified %s plant: K = %0.1f, tau = %0.2f s, L = %0.2f s" % (self.cycle, name, parameters['K'], parameters['tau'], parameters['L']))
+
+			transition = tune_gains(parameters, start, target, self.overshoot_limit, self.temp_tolerance, criteria, self.sampling_time)
+			if transition is None:
+				self.logging.warn("%i\t--> No PID gains of %s within %0.2f C overshoot" % (self.cycle, name, self.overshoot_limit))
+				continue
+
+			transition['name'] = name
+			transitions.append(transition)
+			self.logging.info("%i\t--> Tuned %s gains: P_bandwidth = %g, I_gain = %g, D_gain = %g [settling time: %0.1f s, overshoot: %0.2f C]" % (self.cycle, name, transition['P_bandwidth'], transition['I_gain'], transition['D_gain'], transition['settling_time'], transition['overshoot']))
+
+		self.gain_table = Gain_table(transitions)
+		self.gain_table.save(self.gain_path)
+		self.logging.info("%i\t--> Saved gain table: %s" % (self.cycle, self.gain_path))
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/final_hold.wav')
+#----------------------- Perform PCR cycle without trigger points ----------------------
 
-		self.set_P_bandwidth(self.P_bandwidth5)  # set proportional bandwidth
-		self.set_I_gain(self.I_gain5)  # set integral gain
-		self.set_D_gain(self.D_gain5)  # set derivative gain
+	def pcr_wo_trigger(self):
+		"""Performs PCR cycle in gene-chip (without trigger points) consisting of the following schematics:
 
-		self.set_temperature(self.temp5)  # set target temperature to 25 C
-		self.incubate_reagent(self.SS_final)  # incubate reagent for 1 minute
+		1. 24-90 C -> hold for 15 s (denaturation step)
+		2. 90-40 C -> hold for 30 s (annealing step)
+		3. 40-70 C -> hold for 75 s (elongation step)
+		4. 70-4  C -> hold for infinity (final hold)
 
-		if self.speech_option == 1:
-			commands.getstatusoutput('mplayer -ao pulse ../speech/pcr_end.wav')
+		[Note: steps 1-3 are repeated loop_iter times.]"""
 
-		self.press_q_to_exit()  # press 'Q' to exit final cooling step when desired
+		Protocol.from_config(self, trigger=False).run(self)
 
 #--------------------- Perform PCR cycle with trigger points ---------------------------
 
@@ -646,91 +992,10 @@ class Temperature_control():
 		3. 40-70 C -> hold for 75 s (elongation step)
 		4. 70-4  C -> hold for infinity (final hold)
 
-		[Note: steps 1-3 are repeated 20 times.]"""
-
-		self.logging.info("%i\t--> In polymerase chain reaction" % self.cycle)
-
-		# Step 1 - denaturation
-		self.logging.info("%i\t--> In (outer) denaturation step" % self.cycle)
-		self.logging.info("%i\t--> Set PCR solution temperature to %i C" % (self.cycle, self.temp1))  # set control temperature: 90 C
-
-		self.set_P_bandwidth(self.P_bandwidth1)  # set proportional bandwidth
-		self.set_I_gain(self.I_gain1)  # set integral gain
-		self.set_D_gain(self.D_gain1)  # set derivative gain
-
-		self.set_temperature(self.set_temp1)  # set control temperature to 100 C
-		self.poll_trigger(self.poll_temp1, self.temp_tolerance)  # wait until poll temperature 85 C reached
-
-		self.set_temperature(self.temp1)  # set control temperature to 90 C
-		self.wait_for_SS(self.temp1, self.temp_tolerance)  # wait until steady-state is reached
-		self.incubate_reagent(self.SS_time1)  # incubate reagent for 15 sec
-
-		#------------------------------ Iteration loop -------------------------------------
-		
-		for i in range(0, self.loop_iter):
-
-			self.cycle = i + 1  # update PCR cycle iteration number
-
-			# Step 2 - denaturation
-			self.logging.info("%i\t--> In (inner) denaturation step" % self.cycle)
-			self.logging.info("%i\t--> Set PCR solution temperature to %i C" % (self.cycle, self.temp2))  # set temperature: 90 C
-
-			if i == 0:  # first time into loop
-				self.incubate_reagent(self.SS_time2)  # incubate reagent for 15 sec
-
-			else:
-				self.set_P_bandwidth(self.P_bandwidth2)  # set proportional bandwidth
-				self.set_I_gain(self.I_gain2)  # set integral gain
-				self.set_D_gain(self.D_gain2)  # set derivative gain
-
-				self.set_temperature(self.set_temp2)  # set control temperature to 100 C
-				self.poll_trigger(self.poll_temp2, self.temp_tolerance)  # wait until poll temperature 85 C reached
-
-				self.set_temperature(self.temp2)  # set control temperature to 90 C
-				self.wait_for_SS(self.temp2, self.temp_tolerance)  # wait until steady-state is reached
-				self.incubate_reagent(self.SS_time2)  # incubate reagent for 15 sec
-
-			# Step 3 - annealing
-			self.logging.info("%i\t--> In (inner) annealing step" % self.cycle)
-			self.logging.info("%i\t--> Set PCR solution temperature to %i C" % (self.cycle, self.temp3))  # set temperature: 40 C
-
-			self.set_P_bandwidth(self.P_bandwidth3)  # set proportional bandwidth
-			self.set_I_gain(self.I_gain3)  # set integral gain
-			self.set_D_gain(self.D_gain3)  # set derivative gain
-
-			self.set_temperature(self.set_temp3)  # set control temperature to 0 C
-			self.poll_trigger(self.poll_temp3, self.temp_tolerance)  # wait until poll temperature 42 C reached
-
-			self.set_temperature(self.temp3)  # set control temperature to 40 C
-			self.wait_for_SS(self.temp3, self.temp_tolerance)  # wait until steady-state is reached
-			self.incubate_reagent(self.SS_time3)  # incubate reagent for 30 sec
-
-			# Step 4 - elongation
-			self.logging.info("%i\t--> In (inner) elongation step" % self.cycle)
-			self.logging.info("%i\t--> Set PCR solution temperature to %i C" % (self.cycle, self.temp4))  # set temperature: 70 C
-
-			self.set_P_bandwidth(self.P_bandwidth4)  # set proportional bandwidth
-			self.set_I_gain(self.I_gain4)  # set integral gain
-			self.set_D_gain(self.D_gain4)  # set derivative gain
-
-			self.set_temperature(self.set_temp4)  # set control temperature to 80 C
-			self.poll_trigger(self.poll_temp4, self.temp_tolerance)  # wait until poll temperature 65 C reached
-
-			self.set_temperature(self.temp4)  # set control temperature to 70 C
-			self.wait_for_SS(self.temp4, self.temp_tolerance)  # wait until steady-state is reached
-			self.incubate_reagent(self.SS_time4)  # incubate reagent for 75 sec
-
-		# Step 5 - final hold
-		self.logging.info("%i\t--> In (outer) final hold" % self.cycle)
-		self.logging.info("%i\t--> Set PCR solution temperature to %i C" % (self.cycle, self.temp6))  # set temperature: 4 C
-
-		self.set_P_bandwidth(self.P_bandwidth5)  # set proportional bandwidth
-		self.set_I_gain(self.I_gain5)  # set integral gain
-		self.set_D_gain(self.D_gain5)  # set derivative gain
-
-		self.set_temperature(self.temp5)  # set target temperature to 25 C
-		self.incubate_reagent(self.SS_final)  # incubate reagent for 1 minute
-
-		self.press_enter_to_exit()  # press 'Q' to exit final cooling step when desired
+		Each ramp of steps 1-3 first heads for the set_temp overshoot set point and switches back to 
+		the target temperature at the poll_temp trigger point. If a trigger table is found (see 
+		planner.py), its planned overshoot set points and trigger points are used instead.
 
+		[Note: steps 1-3 are repeated loop_iter times.]"""
 
+		Protocol.from_config(self, trigger=True).run(self)
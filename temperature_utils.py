@@ -10,13 +10,16 @@
  Columbia University.
 
  Purpose: given function command, this utility program performs any temperature 
- controller method contained in temperature controller module.
+ controller method contained in temperature controller module. If a temperature 
+ controller daemon is serving (see daemon.py), the method is performed by it; 
+ protocols and other long methods then run as its background job.
 
  This software may be used, modified, and distributed freely, but this
  header may not be modified and must appear at the top of this file.
 ------------------------------------------------------------------------------- 
 """
 
+import os
 import sys
 import time
 import commands
@@ -35,6 +38,11 @@ if len(sys.argv) == 1:
 
      |  Methods defined here:
      |  
+     |  auto_tune(self, method=None)
+     |      Identifies the plant of every PCR transition by a step or relay experiment, computes the
+     |      PID gains of shortest settling time within overshoot_limit and saves them into the gain
+     |      table loaded by following PCR runs.
+     |  
      |  get_config_parameters(self)
      |      Retieves all temperature controller related configuration parameters from the confi-
      |      guration file using the ConfigParser facility. It assigns each parameter to a field of 
@@ -80,11 +88,18 @@ if len(sys.argv) == 1:
      |  pcr_wo_trigger(self):
      |	    Performs PCR cycle in gene-chip (without trigger points).
      |
+     |  run_protocol(self, path):
+     |      Loads declarative PCR protocol (step list with set points, overshoot/trigger points, PID sets,
+     |      hold times and repeat blocks) from file, compiles it into an execution plan and runs it.
+     |
      |  pull_trigger(self, poll_temp, tolerance=None):
      |      Breaks out of a temperature ramping procedure defined by a previous temperature
      |	    set point at a given trigger point. This function can set a step-wise ramping,
      |      providing a steeper temperature ramping curve.
      |
+     |  quit_final_hold(self)
+     |      Ends the final cooling step hold of the protocol running on the daemon (daemon only).
+     |
      |  sample_parameters(self)
      |      Records contious target temperature related parameters of biochip into a log-file.
      |  
@@ -97,6 +112,12 @@ if len(sys.argv) == 1:
      |  set_temperature(self, temperature)
      |      Sets main temperature reference (C), a float.
      |
+     |  shutdown(self)
+     |      Stops the temperature controller daemon (daemon only).
+     |
+     |  status(self)
+     |      Reports method, state, start and end time of the daemon's background job (daemon only).
+     |
      |	set_P_bandwidth(self, pb)
      |	    Sets proportional bandwidth in PID control, a float".
      |
@@ -106,9 +127,11 @@ if len(sys.argv) == 1:
      |	set_D_gain(self, pb)
      |	    Sets derivative gain in PID control, a float".
      |  
-     |  wait_for_SS(self, set_temp, tolerance=None)
+     |  wait_for_SS(self, set_temp, tolerance=None, window=None, max_slope=None, max_std=None, channel=False)
      |      Waits until steady-state temperature is reached, or exits wait block if ramping
-     |      time exceeds time limit parameter set in configuration file."""
+     |      time exceeds time limit parameter set in configuration file. Steady state is
+     |      reached once mean, slope and standard deviation of the control temperature
+     |      window meet the SS_window, SS_slope and SS_std criteria."""
 	
 	print "\n"
 	sys.exit()
@@ -118,12 +141,8 @@ elif len(sys.argv) < 2:
 	sys.exit()
 
 else:
-	import auxil
-	import serial
+	import socket
 	import ConfigParser
-	from logger import Logger
-
-	from temperature_control import Temperature_control
 
 	#------------------------- Configuration file handling ---------------------------------
 
@@ -132,25 +151,50 @@ else:
 	config = ConfigParser.ConfigParser()  # create configuration file parser object
 	config.read('config.txt')  # fill it in with configuration parameters from file
 
-	#--------------------- Serial port / logging initialization ----------------------------
-
 	t0 = time.time()  # get current time
-	logger = Logger(config)  # create logger object
 
-	serial = serial.Serial(0)  # create serial port object
-	serial.port = config.get("communication","serial_port")  # set appropiate serial port 
-	logger.info("-\t--> Serial connection established")
+	#------------------------ Temperature controller daemon --------------------------------
+
+	logger = None
+	try:
+		from daemon import Client
+		temperature_control = Client(config.get("communication","daemon_socket"))  # daemon owns serial port, see daemon.py
+		print 'INFO\t -\t--> Connected to temperature controller daemon'
+	except socket.error:
+		temperature_control = None  # no daemon serving, open serial port here
+
+	if temperature_control is None:
+		import auxil
+		import serial
+		from logger import Logger
+		from log_writer import Log_writer
 
-	temperature_control = Temperature_control(config, serial, logger)  # initialize temperature controller object
+		from temperature_control import Temperature_control
 
-	log_dir = config.get("communication", "log_dir")  # get log directory from configuration parameters.
-	temperature_control.logfile = open(log_dir + 'pcr_temperature.log', 'w')
+		#--------------------- Serial port / logging initialization ----------------------------
+
+		writer = None
+		if config.get("communication","writer_option") == '1':
+			writer = Log_writer(config)  # perform log-file and console output on background writer thread
+			writer.start()
+
+		logger = Logger(config, writer=writer)  # create logger object
+
+		serial = serial.Serial(0)  # create serial port object
+		serial.port = config.get("communication","serial_port")  # set appropiate serial port 
+		logger.info("-\t--> Serial connection established")
+
+		temperature_control = Temperature_control(config, serial, logger)  # initialize temperature controller object
+
+		log_dir = config.get("communication", "log_dir")  # get log directory from configuration parameters.
+		temperature_control.open_logfile(log_dir, writer)  # open text or binary temperature log-file
 
 	#---------------------------------------------------------------------------------------
 	#				TEMPERATURE CONTROLLER FUNCTIONS
 	#---------------------------------------------------------------------------------------
 
-	logger.info('-\t--> Started %s method execution - temperature_utils.py' % sys.argv[1])
+	if logger is not None:
+		logger.info('-\t--> Started %s method execution - temperature_utils.py' % sys.argv[1])
 	method = sys.argv[1]  # set method to second argument
 
 	if method == 'get_config_parameters':
@@ -202,11 +246,33 @@ else:
 	elif method == 'pcr_wo_trigger':
 		temperature_control.pcr_wo_trigger()
 
+	elif method == 'auto_tune':
+		print "INFO\t -\t--> Please, enter experiment type: step | relay [string]: ",
+		experiment = sys.stdin.readline().strip()  # use stdin explicitly and remove trailing newline character
+		temperature_control.set_control_on()
+		temperature_control.auto_tune(experiment)
+
+	elif method == 'run_protocol':
+		print "INFO\t -\t--> Please, enter protocol file path [string]: ",
+		path = os.path.abspath(sys.stdin.readline().strip())  # use stdin explicitly and remove trailing newline character
+		temperature_control.run_protocol(path)
+
 	elif method == 'pull_trigger':
 		print "INFO\t -\t--> Please, enter: poll_temp, tolerance separated by single space [floats]: ",
 		v = sys.stdin.readline().strip().split(' ')  # use stdin explicitly and remove trailing newline character
 		temperature_control.pull_trigger(float(v[0]), float(v[1]))
 
+	elif method in ['quit_final_hold', 'status', 'shutdown']:
+		if logger is not None:  # not connected to daemon
+			print '\nWARN\t -\t--> Error: %s needs a running temperature controller daemon (see daemon.py)\n' % method
+			sys.exit()
+		result = temperature_control.call(method)
+		if method == 'status':
+			for key in sorted(result):
+				print "INFO\t -\t--> %s: %s" % (key, result[key])
+		else:
+			print "INFO\t -\t--> Daemon performed %s" % method
+
 	elif method == 'sample_parameters':
 		temperature_control.sample_parameters()
 
@@ -248,5 +314,6 @@ else:
 	#-------------------------- Duration of temperature_controlistry test ------------------------------
 
 	delta = (time.time() - t0) / 60  # Calculate elapsed time for flowcell flush.
-	logger.info('-\t--> Finished %s method execution - duration: %0.2f minutes\n' % (method, delta))
+	if logger is not None:
+		logger.info('-\t--> Finished %s method execution - duration: %0.2f minutes\n' % (method, delta))
 
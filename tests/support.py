@@ -0,0 +1,86 @@
+"""
+--------------------------------------------------------------------------------
+ Purpose: Shared fixtures of the tests: configuration of config.txt with all
+ paths in a scratch directory and speech, logging, writer and telemetry off,
+ and temperature controller objects driving the simulated 5R7-001 controller
+ (see simulator.py) on a virtual clock, so runs take milliseconds.
+
+ Usage: python -m unittest discover tests  (from the top-level directory)
+-------------------------------------------------------------------------------
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import StringIO
+import unittest
+import ConfigParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+	sys.path.insert(0, ROOT)
+
+import simulator
+
+from clock import Virtual_clock
+
+class Null_logger:
+
+	def __init__(self):
+		self.records = []  # (level, message) pairs
+
+	def info(self, message):
+		self.records.append(('info', message))
+
+	def warn(self, message):
+		self.records.append(('warn', message))
+
+	def error(self, message):
+		self.records.append(('error', message))
+
+	def debug(self, message):
+		self.records.append(('debug', message))
+
+	def messages(self, text):
+		"Returns logged messages containing text"
+
+		return [m for (level, m) in self.records if text in m]
+
+def test_config(directory):
+	"Returns configuration of config.txt with home, log and configuration log directory in directory"
+
+	config = ConfigParser.ConfigParser()
+	config.read(os.path.join(ROOT, 'config.txt'))
+
+	for key, value in [('speech_option', '0'), ('log_option', '0'), ('writer_option', '0'), ('telemetry_option', '0'),
+			   ('archive_option', '0'), ('sampler_option', '0'), ('home_dir', directory),
+			   ('log_dir', directory + os.sep), ('cfg_dir', directory + os.sep)]:
+		config.set('communication', key, value)
+
+	config.set('pcr_parameters', 'calibration_option', '0')  # trigger and gain tables are looked up in directory, none there
+	return config
+
+class Simulator_test(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.config = test_config(self.directory)
+		self.clock = Virtual_clock()
+		self.controller = simulator.Simulated_controller(clock=self.clock.time)
+		sys.stdout = StringIO.StringIO()  # progress lines of the step loops
+
+	def tearDown(self):
+		sys.stdout = sys.__stdout__
+		shutil.rmtree(self.directory)
+
+	def temperature_control(self):
+		"Returns temperature controller object on the simulated controller, its temperature log kept in memory"
+
+		from temperature_control import Temperature_control
+
+		logger = Null_logger()
+		tc = Temperature_control(self.config, simulator.Simulated_serial(self.controller), logger, clock=self.clock)
+		tc.logfile = StringIO.StringIO()
+		tc.press_q_to_exit = lambda: tc.clear_checkpoint()  # no operator to quit final hold
+		return tc
@@ -0,0 +1,86 @@
+import unittest
+
+import support
+
+from sampler import Sampling_policy
+
+def periods(policy, samples):
+	return [policy.update(sample) for sample in samples]
+
+class Sampling_policy_test(unittest.TestCase):
+
+	def test_backoff_while_holding(self):
+		policy = Sampling_policy(0.1, 1.0, 0.2, 2.0)
+		samples = [(0.1 * i, 60.0, 60.0, 58.0) for i in range(8)]
+		self.assertEqual(periods(policy, samples), [0.2, 0.4, 0.8, 1.0, 1.0, 1.0, 1.0, 1.0])
+
+	def test_fast_while_ramping(self):
+		"A slope beyond max_slope returns the fast period, though the set point is within max_error"
+
+		policy = Sampling_policy(0.1, 1.0, 0.2, 2.0)
+		samples = [(0.5 * i, 60.0, 59.0 + 0.5 * i, 58.0) for i in range(4)]  # 1 C/s
+		self.assertEqual(periods(policy, samples), [0.2, 0.1, 0.1, 0.1])
+
+	def test_fast_on_set_point_error(self):
+		policy = Sampling_policy(0.1, 1.0, 0.2, 2.0)
+		periods(policy, [(0.1 * i, 60.0, 60.0, 58.0) for i in range(6)])
+		self.assertEqual(policy.update((0.6, 90.0, 60.0, 58.0)), 0.1)  # new step, hold resumes backoff from fast
+
+	def test_slow_not_below_fast(self):
+		self.assertEqual(Sampling_policy(0.5, 0.2, 0.2, 2.0).slow, 0.5)
+
+	def test_slope_baseline(self):
+		"The slope spans at least one second, so a single noisy reading does not switch to fast"
+
+		policy = Sampling_policy(0.1, 1.0, 0.2, 2.0)
+		for i in range(20):
+			policy.update((0.1 * i, 60.0, 60.0, 58.0))
+		self.assertEqual(policy.update((2.0, 60.0, 60.1, 58.0)), 1.0)  # 0.1 C over 1 s
+
+class Adaptive_schedule_test(support.Simulator_test):
+
+	def test_fixed_without_option(self):
+		self.config.set('pcr_parameters', 'adaptive_option', '0')
+		schedule = self.temperature_control().adaptive_schedule('wait_for_SS')
+		self.assertEqual((schedule.period, schedule.policy), (0.1, None))
+
+	def test_periods(self):
+		self.config.set('pcr_parameters', 'adaptive_option', '1')
+		tc = self.temperature_control()
+
+		schedule = tc.adaptive_schedule('wait_for_SS', 0.75)
+		self.assertEqual((schedule.period, schedule.policy.fast, schedule.policy.slow), (0.15, 0.15, 0.75))
+
+		tc.response_time = 0.4  # slow link
+		schedule = tc.adaptive_schedule('incubate_reagent')
+		self.assertEqual((schedule.period, schedule.policy.slow), (0.4, 1.0))
+
+	def wait(self, adaptive):
+		"Returns number of samples logged and virtual time of a 25-60 C ramp to steady state"
+
+		self.controller = support.simulator.Simulated_controller(clock=self.clock.time)  # at ambient
+		self.config.set('pcr_parameters', 'adaptive_option', str(adaptive))
+		self.config.set('pcr_parameters', 'time_limit', '3')
+		tc = self.temperature_control()
+		t0 = self.clock.time()
+		tc.set_control_on()
+		tc.set_temperature(60.0)
+		tc.wait_for_SS(60.0)
+		return len(tc.logfile.getvalue().splitlines()), self.clock.time() - t0
+
+	def test_fewer_samples_same_detection(self):
+		fixed, t_fixed = self.wait(0)
+		adaptive, t_adaptive = self.wait(1)
+
+		self.assertTrue(adaptive < 0.6 * fixed)
+		self.assertTrue(abs(t_adaptive - t_fixed) < 1.0)
+
+	def test_hold_backs_off_to_slow(self):
+		self.config.set('pcr_parameters', 'adaptive_option', '1')
+		tc = self.temperature_control()
+		tc.incubate_reagent(30)
+
+		self.assertTrue(len(tc.logfile.getvalue().splitlines()) <= 30 + 4)  # sampling_slow after backoff from fast
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,118 @@
+import os
+import math
+import shutil
+import tempfile
+import warnings
+import unittest
+
+import numpy
+
+import support
+import analytics
+
+from binary_log import Binary_log
+
+SETS = [90.0] * 10 + [40.0] * 10 + [90.0] * 5
+CONTROLS = [30, 40, 50, 60, 70, 80, 90, 91, 90, 90,  # heating at 10 C/s, 1 C overshoot
+	    90, 80, 70, 60, 50, 40, 39.5, 40, 40, 40,  # cooling at 10 C/s, 0.5 C undershoot
+	    40, 60, 80, 90, 90]  # second cycle
+
+def columns(sets=SETS, controls=CONTROLS):
+	"Returns log columns sampled every second, periphery 2 C below control"
+
+	controls = numpy.array(controls, dtype=float)
+	return numpy.arange(len(sets), dtype=float), numpy.array(sets), controls, controls - 2.0
+
+class Analytics_test(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_steps(self):
+		step = analytics.steps(columns())
+
+		numpy.testing.assert_array_equal(step['start'], [0, 10, 20])
+		numpy.testing.assert_array_equal(step['set'], [90, 40, 90])
+		numpy.testing.assert_array_equal(step['duration'], [9, 9, 4])
+		numpy.testing.assert_array_almost_equal(step['ramp_rate'], [0.8 * 60 / 5, -0.8 * 50 / 4, 0.8 * 50 / 2])
+		numpy.testing.assert_array_equal(step['overshoot'], [1.0, 0.5, 0.0])
+		numpy.testing.assert_array_equal(step['settle'], [6, 5, 3])
+		numpy.testing.assert_array_almost_equal(step['hold_rms'], [0.5, math.sqrt(0.05), 0.0])
+		numpy.testing.assert_array_almost_equal(step['offset'], [2.0, 2.0, 2.0])
+		numpy.testing.assert_array_equal(step['cycle'], [1, 1, 2])
+
+	def test_unsettled_step(self):
+		step = analytics.steps(columns([60.0] * 5, [30, 35, 40, 45, 50]))
+
+		self.assertTrue(numpy.isnan(step['settle'][0]))
+		self.assertTrue(numpy.isnan(step['hold_rms'][0]))
+		self.assertTrue(numpy.isnan(step['ramp_rate'][0]))  # 90% of ramp not reached
+
+	def test_empty_log(self):
+		step = analytics.steps(columns([], []))
+		self.assertEqual(len(step['set']), 0)
+		self.assertEqual(len(analytics.cycles(step)['cycle']), 0)
+		self.assertEqual(analytics.summary(step)['steps'], 0)
+
+	def test_cycles(self):
+		cycle = analytics.cycles(analytics.steps(columns()))
+
+		numpy.testing.assert_array_equal(cycle['cycle'], [1, 2])
+		numpy.testing.assert_array_equal(cycle['duration'], [20, 4])
+		numpy.testing.assert_array_equal(cycle['overshoot'], [1.0, 0.0])
+		numpy.testing.assert_array_equal(cycle['settle'], [11, 3])
+		numpy.testing.assert_array_almost_equal(cycle['hold_rms'], [math.sqrt((0.25 + 0.05) / 2), 0.0])
+
+	def test_summary(self):
+		s = analytics.summary(analytics.steps(columns()))
+
+		self.assertEqual(s['steps'], 3)
+		self.assertAlmostEqual(s['heating'], (9.6 + 20.0) / 2)
+		self.assertAlmostEqual(s['cooling'], -10.0)
+		self.assertEqual(s['overshoot'], 1.0)
+		self.assertAlmostEqual(s['settle'], 14.0 / 3)
+		self.assertAlmostEqual(s['offset'], 2.0)
+
+	def write_text(self, name, lines):
+		path = os.path.join(self.directory, name)
+		f = open(path, 'w')
+		f.write('\n'.join(lines) + '\n')
+		f.close()
+		return path
+
+	def test_load_text(self):
+		t, st, ct, gt = columns()
+		path = self.write_text('pcr-temperature.log', ['%0.2f\t%0.2f\t%0.2f\t%0.2f' % row for row in zip(t, st, ct, gt)])
+
+		for loaded, column in zip(analytics.load(path), columns()):
+			numpy.testing.assert_array_almost_equal(loaded, column)
+
+	def test_load_ragged_text(self):
+		path = self.write_text('pcr-temperature.log', ['0.00\t90.00\t30.00\t28.00', '# resumed', '1.00\t90.00\t40.00', '2.00\t90.00\t50.00\t48.00\t0.5'])
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore')  # ConversionWarning of the short line
+			t, st, ct, gt = analytics.load(path)
+
+		numpy.testing.assert_array_equal(t, [0, 2])
+		numpy.testing.assert_array_equal(gt, [28, 48])
+
+	def test_load_binary(self):
+		path = os.path.join(self.directory, 'pcr_temperature.bin')
+		log = Binary_log(open(path, 'wb'))
+		for row in zip(*columns()):
+			log.append(row)
+		log.close()
+
+		for loaded, column in zip(analytics.load(path), columns()):
+			numpy.testing.assert_array_almost_equal(loaded, column)
+
+	def test_find_logs(self):
+		text = self.write_text('pcr-temperature.log', [])
+		self.write_text('notes.txt', [])
+		self.assertEqual(analytics.find_logs([self.directory, text]), [(self.directory, text), (text, text)])
+
+if __name__ == '__main__':
+	unittest.main()
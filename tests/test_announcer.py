@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+
+from announcer import Announcer
+
+class Announcer_test(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		for name in ['start', 'end', 'welcome', 'incubate_reagent']:
+			f = open(os.path.join(self.directory, name + '.wav'), 'wb')
+			f.write('RIFF' + name)
+			f.close()
+
+		self.output = os.path.join(self.directory, 'played')
+		self.player = "sh -c 'cat >> %s; echo >> %s'" % (self.output, self.output)  # one line per clip played
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def played(self):
+		if not os.path.exists(self.output):
+			return []
+		return open(self.output).read().split()
+
+	def test_clips_preloaded(self):
+		announcer = Announcer(self.directory, self.player)
+		self.assertEqual(sorted(announcer.clips), ['end', 'incubate_reagent', 'start', 'welcome'])
+		self.assertEqual(announcer.clips['end'], 'RIFFend')
+
+	def test_played_in_order(self):
+		announcer = Announcer(self.directory, self.player)
+		announcer.say('welcome')
+		announcer.say('start')
+		announcer.start()
+		announcer.close(wait=True)
+
+		self.assertEqual(self.played(), ['RIFFwelcome', 'RIFFstart'])
+		self.assertEqual(announcer.dropped, 0)
+
+	def test_merged_and_dropped(self):
+		announcer = Announcer(self.directory, self.player, max_pending=2)  # not started, nothing is played
+		announcer.say('welcome')
+		announcer.say('welcome')  # merged with waiting one
+		announcer.say('start')
+		announcer.say('end')  # queue full, oldest dropped
+		announcer.say('missing')  # no clip
+
+		self.assertEqual([name for (name, t) in announcer.pending], ['start', 'end'])
+		self.assertEqual(announcer.dropped, 2)
+
+		announcer.close()  # waiting ones discarded
+		self.assertEqual(announcer.dropped, 4)
+
+	def test_stale_dropped(self):
+		announcer = Announcer(self.directory, self.player, max_age=-1)  # every announcement is stale
+		announcer.say('welcome')
+		announcer.say('start')
+		announcer.start()
+		announcer.close(wait=True)
+
+		self.assertEqual(self.played(), [])
+		self.assertEqual(announcer.dropped, 2)
+
+	def test_player_failure(self):
+		logger = support.Null_logger()
+		announcer = Announcer(self.directory, 'no-such-player', logger=logger)
+		announcer.say('start')
+		announcer.start()
+		announcer.close(wait=True)
+		self.assertEqual(len(logger.messages('Speech player failed')), 1)
+
+if __name__ == '__main__':
+	unittest.main()
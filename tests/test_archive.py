@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import unittest
+
+import support
+
+from archive import Archive, name_steps
+from calibration import Calibration
+
+STEPS = ['outer_denaturation', 'denaturation', 'annealing', 'elongation', 'final_hold']
+
+class Archive_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.config.set('pcr_parameters', 'loop_iter', '2')
+		self.archive = Archive(os.path.join(self.directory, 'archive'))
+
+	def tearDown(self):
+		self.archive.close()
+		support.Simulator_test.tearDown(self)
+
+	def run_pcr(self, calibration=None):
+		"Runs pcr_wo_trigger into a temperature log-file of the scratch directory, returns controller object"
+
+		tc = self.temperature_control()
+		tc.calibration = calibration
+		tc.open_logfile(self.directory)
+		tc.set_control_on()
+		tc.pcr_wo_trigger()
+		tc.logfile.close()
+		return tc
+
+	def add_run(self, tc, **fields):
+		return self.archive.add_run(self.config, tc.logfile_path, cycles=tc.cycle, set_points=tc.set_points, **fields)
+
+	def test_steps_named_by_protocol(self):
+		tc = self.run_pcr()
+		run = self.add_run(tc, protocol='pcr_wo_trigger', chip='A17')
+
+		names = [step['name'] for step in self.archive.steps(run)]
+		self.assertEqual(names, ['outer_denaturation', 'annealing', 'elongation', 'denaturation', 'annealing', 'elongation', 'final_hold'])
+
+		run_dir = self.archive.find(['id=%i' % run])[0]['directory']
+		self.assertEqual(sorted(os.listdir(run_dir)), ['config.txt', 'pcr_temperature.log'])
+
+	def test_steps_named_on_calibrated_run(self):
+		"Set points of a calibrated run are control temperatures, none of them equals a temp1..temp5 parameter"
+
+		calibration = Calibration([-0.9, 45.5, 50.2], 6.0, 0, 120)
+		tc = self.run_pcr(calibration)
+		set_temps = [s for (s, name) in tc.set_points]
+		for i in range(1, 6):
+			self.assertFalse(float(self.config.get('pcr_parameters', 'temp%i' % i)) in set_temps)
+
+		run = self.add_run(tc)
+		names = set([step['name'] for step in self.archive.steps(run)])
+		self.assertEqual(names, set(STEPS))
+
+	def test_steps_named_by_configuration_without_record(self):
+		tc = self.run_pcr()
+		run = self.archive.add_run(self.config, tc.logfile_path)  # e.g. 'archive.py add' of a log-file
+		names = [step['name'] for step in self.archive.steps(run)]
+		self.assertEqual(set(names), set(STEPS[1:]))  # temp1 = temp2, the first step is named denaturation
+
+	def test_find(self):
+		tc = self.run_pcr()
+		first = self.add_run(tc, chip='A17', status='finished')
+		second = self.add_run(tc, chip='B02', status='interrupted')
+
+		self.assertEqual([r['id'] for r in self.archive.find([])], [first, second])
+		self.assertEqual([r['id'] for r in self.archive.find(['chip=B02'])], [second])
+		self.assertEqual([r['id'] for r in self.archive.find(['status=finished', 'cycles>=2'])], [first])
+		self.assertEqual(len(self.archive.find(['temp3=%s' % self.config.get('pcr_parameters', 'temp3')])), 2)  # configuration parameter
+		self.assertEqual(len(self.archive.find(['annealing.duration>0'])), 2)
+		self.assertEqual(self.archive.find(['annealing.duration>100000']), [])
+		self.assertRaises(ValueError, self.archive.find, ['annealing.colour=1'])
+		self.assertRaises(ValueError, self.archive.find, ['chip'])
+
+	def test_index_of_earlier_version(self):
+		"An index without chip column gets one added"
+
+		directory = os.path.join(self.directory, 'old')
+		os.makedirs(directory)
+		db = sqlite3.connect(os.path.join(directory, 'index.db'))
+		db.execute("CREATE TABLE runs (id INTEGER PRIMARY KEY, name TEXT, start REAL, end REAL, duration REAL, config_hash TEXT, protocol TEXT, cycles INTEGER, status TEXT, directory TEXT)")
+		db.execute("INSERT INTO runs (name, status) VALUES ('old', 'finished')")
+		db.commit()
+		db.close()
+
+		archive = Archive(directory)
+		runs = archive.find([])
+		archive.close()
+		self.assertEqual([(r['name'], r['chip']) for r in runs], [('old', None)])
+
+	def test_name_steps(self):
+		records = [(95.0, 'outer_denaturation'), (100.0, 'inner_denaturation'), (95.0, 'inner_denaturation'), (60.0, 'annealing')]
+		self.assertEqual(name_steps([25.0, 95.0, 100.0, 95.0, 60.0, 4.0], records),
+				 [None, 'outer_denaturation', 'denaturation', 'denaturation', 'annealing', None])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+
+import codec
+import support
+import simulator
+
+from clock import Virtual_clock, Real_clock
+from cooperative import Event_loop, Return, Sleep
+from async_control import Async_control
+
+class Silent_serial(simulator.Simulated_serial):
+
+	def write(self, data):
+		"Drops command characters, the controller never responds"
+
+def log_span(text):
+	"Returns (first, last) time stamp of text temperature log"
+
+	lines = text.splitlines()
+	return float(lines[0].split('\t')[0]), float(lines[-1].split('\t')[0])
+
+class Event_loop_test(unittest.TestCase):
+
+	def test_sleep_order_and_results(self):
+		clock = Virtual_clock()
+		loop = Event_loop(clock)
+		woken = []
+
+		def sleeper(name, seconds):
+			yield Sleep(seconds)
+			woken.append((name, clock.monotonic()))
+			raise Return(name)
+
+		def caller():
+			first = yield sleeper('sub', 1.0)  # runs sub-task, resumes with its result
+			raise Return(first + '!')
+
+		t0 = clock.monotonic()
+		tasks = loop.gather(sleeper('a', 3.0), sleeper('b', 2.0), caller())
+
+		self.assertEqual([task.result for task in tasks], ['a', 'b', 'sub!'])
+		self.assertEqual([(name, t - t0) for (name, t) in woken], [('sub', 1.0), ('b', 2.0), ('a', 3.0)])
+
+	def test_error_reaches_caller(self):
+		loop = Event_loop(Virtual_clock())
+
+		def failing():
+			yield Sleep(0.1)
+			raise IOError('port gone')
+
+		def caller():
+			try:
+				yield failing()
+			except IOError, e:
+				raise Return('caught %s' % e)
+
+		self.assertEqual(loop.run_until_complete(caller()), 'caught port gone')
+		self.assertRaises(IOError, loop.run_until_complete, failing())
+
+class Async_control_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.config.set('pcr_parameters', 'loop_iter', '2')
+
+	def async_control(self, loop=None, controller=None):
+		"Returns non-blocking driver of a temperature controller object on the simulated controller"
+
+		if controller is not None:
+			self.controller = controller
+		chip = Async_control(self.temperature_control(), loop)
+		chip.quit = True  # no final hold
+		return chip
+
+	def pcr(self, chip):
+		yield chip.set_control_on()
+		yield chip.pcr_wo_trigger()
+		raise Return(chip.cycle)
+
+	def test_pcr_matches_blocking_run(self):
+		"A PCR run on the event loop takes the virtual time of the blocking driver and logs as many samples"
+
+		tc = self.temperature_control()
+		t0 = self.clock.time()
+		tc.set_control_on()
+		tc.pcr_wo_trigger()
+		duration = self.clock.time() - t0
+		samples = len(tc.logfile.getvalue().splitlines())
+
+		chip = self.async_control(controller=simulator.Simulated_controller(clock=self.clock.time))
+		t0 = self.clock.time()
+		self.assertEqual(chip.loop.run_until_complete(self.pcr(chip)), 2)
+
+		self.assertTrue(abs(self.clock.time() - t0 - duration) < 5.0)
+		self.assertTrue(abs(len(chip.logfile.getvalue().splitlines()) - samples) < 0.05 * samples)
+		self.assertEqual(self.controller.registers['2d'], 0)  # control off after final hold
+
+	def test_concurrent_controllers(self):
+		"Two controllers and another task share one loop; the runs overlap in virtual time"
+
+		loop = Event_loop(self.clock)
+		chips = []
+		for i in range(2):
+			self.config.set('pcr_parameters', 'checkpoint_file', 'chip%i.json' % i)
+			chips.append(self.async_control(loop, simulator.Simulated_controller(clock=self.clock.time)))
+
+		ticks = []
+		def ticker():
+			while True:
+				ticks.append(self.clock.monotonic())
+				yield Sleep(1.0)
+		loop.spawn(ticker())
+
+		t0 = self.clock.time()
+		tasks = loop.gather(self.pcr(chips[0]), self.pcr(chips[1]))
+		duration = self.clock.time() - t0
+
+		self.assertEqual([(task.result, task.error) for task in tasks], [(2, None), (2, None)])
+		self.assertTrue(len(ticks) >= int(duration) - 1)  # ticker never blocked
+
+		spans = [log_span(chip.logfile.getvalue()) for chip in chips]
+		self.assertTrue(spans[1][0] < spans[0][1] and spans[0][0] < spans[1][1])
+		self.assertTrue(duration < 0.6 * sum([end - start for (start, end) in spans]))
+
+	def test_pull_trigger_passed(self):
+		chip = self.async_control()
+		chip.loop.run_until_complete(chip.set_control_on())
+		chip.loop.run_until_complete(chip.set_temperature(95.0))
+
+		t0 = self.clock.time()
+		chip.loop.run_until_complete(chip.pull_trigger(20.0))
+		self.assertTrue(self.clock.time() - t0 < 1.0)
+		self.assertEqual(chip.logging.messages('Time limit'), [])
+
+	def test_write_register_skips_shadowed_value(self):
+		chip = self.async_control()
+		run = chip.loop.run_until_complete
+
+		self.assertEqual(run(chip.write_register('1c', 4000)), True)
+		self.assertEqual(run(chip.write_register('1c', 4000)), False)
+		self.assertEqual(run(chip.read_register(codec.read_frame('03'))), 4000.0)
+
+	def test_no_response(self):
+		tc = self.temperature_control()
+		tc.serial = Silent_serial(self.controller)
+		chip = Async_control(tc)
+
+		t0 = self.clock.monotonic()
+		self.assertRaises(IOError, chip.loop.run_until_complete, chip.get_control_temperature())
+		self.assertAlmostEqual(self.clock.monotonic() - t0, tc.response_timeout, places=2)
+		self.assertFalse(chip.busy)  # next transfer not locked out
+
+	def test_sampler_owns_port(self):
+		self.clock = Real_clock()  # sampler thread sleeps for real
+		self.controller = simulator.Simulated_controller(clock=self.clock.time)
+		tc = self.temperature_control()
+		tc.start_sampler()
+		try:
+			self.assertRaises(RuntimeError, Async_control, tc)
+		finally:
+			tc.stop_sampler()
+
+if __name__ == '__main__':
+	unittest.main()
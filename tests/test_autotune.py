@@ -0,0 +1,64 @@
+import os
+import unittest
+
+import support
+
+from simulator import PLANT
+from protocol import Protocol
+from autotune import Gain_table, P_GRID, I_GRID, D_GRID, step_response, tune_gains
+
+CRITERIA = (3.0, 0.05, 0.1)  # SS_window, SS_slope, SS_std
+
+def transition(name, start, target, gains):
+	return {'name': name, 'start': start, 'target': target, 'P_bandwidth': gains[0], 'I_gain': gains[1],
+		'D_gain': gains[2], 'settling_time': 30.0, 'overshoot': 0.5}
+
+TABLE = [transition('RT-90', 25.0, 90.0, (16, 2, 0)), transition('90-40', 90.0, 40.0, (8, 5, 0.1)),
+	 transition('40-70', 40.0, 70.0, (12, 1, 0.05))]
+
+class Gain_table_test(support.Simulator_test):
+
+	def test_save_and_load(self):
+		path = os.path.join(self.directory, 'gains.txt')
+		Gain_table(TABLE).save(path)
+		self.assertEqual(Gain_table.load(path).transitions, TABLE)
+
+	def test_lookup(self):
+		table = Gain_table(TABLE)
+		self.assertEqual(table.lookup(None, 90.0), (16, 2, 0))
+		self.assertEqual(table.lookup(88.0, 43.0), (8, 5, 0.1))
+		self.assertEqual(table.lookup(70.0, 40.0), None)
+
+	def test_protocol_gains_from_table(self):
+		"Auto-tuned gains replace the numbered PID parameters of the matching steps only"
+
+		Gain_table(TABLE).save(os.path.join(self.directory, self.config.get("pcr_parameters", "gain_table")))
+		tc = self.temperature_control()
+		plan = Protocol.from_config(tc, trigger=False).plan
+
+		writes = [a[1] for a in plan if a[0] == 'set_P_bandwidth']
+		self.assertEqual(writes[:4], [16.0, 8.0, 12.0, tc.P_bandwidth2])  # step1, step3, step4, then 70-90 untuned
+
+class Tune_test(unittest.TestCase):
+
+	def test_step_response(self):
+		t, overshoot = step_response(PLANT, 40.0, 70.0, (22, 2, 0), 1.0, CRITERIA, 0.5, 300.0)
+		self.assertTrue(CRITERIA[0] < t < 300.0)
+		self.assertTrue(overshoot >= 0.0)
+		self.assertEqual(step_response(PLANT, 40.0, 70.0, (22, 2, 0), 1.0, CRITERIA, 0.5, 2.0)[0], None)
+
+	def test_tune_gains(self):
+		transition = tune_gains(PLANT, 40.0, 70.0, 1.0, 1.0, CRITERIA, 0.5)
+		gains = (transition['P_bandwidth'], transition['I_gain'], transition['D_gain'])
+
+		self.assertTrue(gains[0] in P_GRID and gains[1] in I_GRID and gains[2] in D_GRID)
+		self.assertTrue(transition['overshoot'] <= 1.0)
+		t, overshoot = step_response(PLANT, 40.0, 70.0, gains, 1.0, CRITERIA, 0.5, 300.0)
+		self.assertEqual((t, overshoot), (transition['settling_time'], transition['overshoot']))
+		self.assertTrue(t <= step_response(PLANT, 40.0, 70.0, (22, 2, 0), 1.0, CRITERIA, 0.5, 300.0)[0])
+
+	def test_no_gains_within_limit(self):
+		self.assertEqual(tune_gains(PLANT, 40.0, 70.0, -1.0, 1.0, CRITERIA, 0.5), None)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,61 @@
+import time
+import unittest
+
+import support
+import auxil
+import codec
+import simulator
+
+class Chunked_serial:
+	"Serial port stand-in returning the given chunks, one per read, and nothing once they are used up"
+
+	def __init__(self, chunks):
+		self.chunks = list(chunks)
+		self.reads = 0
+
+	def read(self, size=1):
+		self.reads += 1
+		if not self.chunks:
+			return ''
+		chunk = self.chunks.pop(0)
+		assert len(chunk) <= size  # never more than the frame still lacks
+		return chunk
+
+def response(value):
+	"Returns response frame of the simulated controller to a write of value"
+
+	return simulator.Simulated_controller().handle(codec.encode('1c', value))
+
+class Read_response_test(unittest.TestCase):
+
+	def test_frame_in_chunks(self):
+		frame = response(2500)
+		serial = Chunked_serial([frame[:3], '', frame[3:8], frame[8:]])
+		value, elapsed = auxil.read_response(serial, timeout=1.0)
+
+		self.assertEqual(value, 2500)
+		self.assertEqual(serial.reads, 4)  # returns as soon as the frame is complete
+		self.assertTrue(elapsed < 1.0)
+
+	def test_leading_noise_skipped(self):
+		serial = Chunked_serial(['\x00^', response(-150)])
+		self.assertEqual(auxil.read_response(serial)[0], -150)
+
+	def test_bad_checksum_resynchronized(self):
+		frame = response(2500)
+		corrupted = frame[:4] + ('1' if frame[4] != '1' else '2') + frame[5:]  # one data digit flipped
+		serial = Chunked_serial([corrupted] + list(response(9000)))  # next frame byte by byte
+		self.assertEqual(auxil.read_response(serial, timeout=1.0)[0], 9000)
+
+	def test_bad_checksum_times_out(self):
+		frame = response(2500)
+		bad_sum = frame[:9] + codec.HEX_BYTE[(int(frame[9:11], 16) + 1) & 255] + '^'
+		self.assertRaises(IOError, auxil.read_response, Chunked_serial([bad_sum]), 0.05)
+
+	def test_timeout(self):
+		t0 = time.time()
+		self.assertRaises(IOError, auxil.read_response, Chunked_serial([]), 0.05)
+		self.assertTrue(0.05 <= time.time() - t0 < 0.5)
+
+if __name__ == '__main__':
+	unittest.main()
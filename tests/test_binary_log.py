@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import warnings
+import unittest
+
+import numpy
+
+import support
+import binary_log
+
+from binary_log import Binary_log, RECORD
+
+SAMPLES = [(1000.0, 90.0, 25.004, 24.5), (1000.25, 90.0, 31.37, 26.12), (1000.5, -5.5, 400.0, -400.0)]
+
+class Binary_log_test(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'pcr_temperature.bin')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def write(self, samples, metadata=None):
+		log = Binary_log(open(self.path, 'wb'), metadata)
+		for sample in samples:
+			log.append(sample)
+		log.close()
+		return log
+
+	def test_round_trip(self):
+		log = self.write(SAMPLES, {'serial_port': '/dev/ttyS0'})
+		metadata, records = binary_log.load(self.path)
+
+		self.assertTrue(log.closed)
+		self.assertEqual(log.count, 3)
+		self.assertEqual(metadata, {'serial_port': '/dev/ttyS0'})
+		numpy.testing.assert_array_equal(records['time'], [1000.0, 1000.25, 1000.5])
+		numpy.testing.assert_array_equal(records['set'], [9000, 9000, -550])
+		numpy.testing.assert_array_equal(records['control'], [2500, 3137, 32767])  # clipped to int16
+		numpy.testing.assert_array_equal(records['periphery'], [2450, 2612, -32767])
+
+	def test_records_aligned(self):
+		self.write(SAMPLES, {'text': 'x' * 5})
+		metadata, offset = binary_log.read_header(self.path)
+		self.assertEqual(offset % RECORD.size, 0)
+		self.assertEqual(os.path.getsize(self.path), offset + 3 * RECORD.size)
+
+	def test_partial_record_left_out(self):
+		self.write(SAMPLES)
+		f = open(self.path, 'ab')
+		f.write(RECORD.pack(1001.0, 1, 2, 3)[:7])  # crash while writing
+		f.close()
+		self.assertEqual(len(binary_log.load(self.path)[1]), 3)
+
+	def test_empty(self):
+		self.write([])
+		self.assertEqual(len(binary_log.load(self.path)[1]), 0)
+
+	def test_not_a_log(self):
+		f = open(self.path, 'wb')
+		f.write('0.0\t25.0\t25.0\t25.0\n' * 10)
+		f.close()
+		self.assertRaises(IOError, binary_log.load, self.path)
+
+	def test_convert_text_log(self):
+		text = os.path.join(self.directory, 'pcr_temperature.log')
+		f = open(text, 'w')
+		for sample in SAMPLES[:2]:
+			f.write("%f\t%f\t%f\t%f\n" % sample)
+		f.write("not a sample\n")
+		f.close()
+
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore')  # numpy reports the line left out
+			self.assertEqual(binary_log.convert(text, self.path), 2)
+		metadata, records = binary_log.load(self.path)
+		self.assertEqual(metadata['source'], text)
+		numpy.testing.assert_array_equal(records['control'], [2500, 3137])
+
+class Controller_log_test(support.Simulator_test):
+
+	def test_binary_temperature_log(self):
+		self.config.set('communication', 'log_format', 'binary')
+		tc = self.temperature_control()
+		tc.open_logfile(self.directory)
+		for i in range(5):
+			tc.log_temperature()
+			self.clock.sleep(0.5)
+		tc.logfile.close()
+
+		metadata, records = binary_log.load(tc.logfile_path)
+		self.assertEqual(len(records), 5)
+		self.assertEqual(metadata['serial_port'], 'simulator')
+		self.assertEqual(metadata['config']['pcr_parameters']['temp1'], self.config.get('pcr_parameters', 'temp1'))
+		numpy.testing.assert_array_equal(numpy.diff(records['time']), [0.5] * 4)
+
+if __name__ == '__main__':
+	unittest.main()
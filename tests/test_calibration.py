@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import support
+import calibration
+
+from calibration import Calibration, CENTER, SCALE
+
+COEFFICIENTS = [-0.9, 45.5, 50.2]  # channel = p((control - CENTER) / SCALE)
+LAG = 6.0
+
+def trace(setpoints, hold=120.0, period=0.5, tau=8.0):
+	"""Returns (time, control, periphery) arrays of a first-order control temperature through setpoints
+	(C), each held hold seconds, and its channel temperature COEFFICIENTS polynomial LAG seconds later"""
+
+	t = numpy.arange(0, hold * len(setpoints), period)
+	control = numpy.empty(len(t))
+	temperature = 25.0
+	for i in range(len(t)):
+		temperature += (setpoints[int(t[i] // hold)] - temperature) * (1 - numpy.exp(-period / tau))
+		control[i] = temperature
+
+	delayed = numpy.interp(t - LAG, t, control)
+	periphery = numpy.polyval(COEFFICIENTS, (delayed - CENTER) / SCALE)
+	return t, control, periphery
+
+class Calibration_test(unittest.TestCase):
+
+	def test_fit_recovers_lag_and_polynomial(self):
+		traces = [trace([90, 40, 70, 95]), trace([60, 30, 80])]
+		fit = calibration.fit(traces, chip_type='test')
+
+		self.assertEqual(fit.lag, LAG)
+		self.assertTrue(fit.rms < 1e-3)
+		numpy.testing.assert_allclose(fit.coefficients, COEFFICIENTS, atol=1e-3)
+		self.assertEqual(fit.chip_type, 'test')
+
+	def test_fit_leaves_out_invalid_readings(self):
+		t, control, periphery = trace([90, 40, 70])
+		periphery[100:110] = 999.0  # disconnected sensor
+		fit = calibration.fit([(t, control, periphery)])
+		numpy.testing.assert_allclose(fit.coefficients, COEFFICIENTS, atol=1e-3)
+
+	def test_fit_without_valid_trace(self):
+		t, control, periphery = trace([90])
+		self.assertRaises(ValueError, calibration.fit, [(t, control, periphery * 0 - 100)])
+
+	def test_control_inverts_channel(self):
+		fit = Calibration(COEFFICIENTS, LAG, 20, 100)
+		for channel in [30.0, 55.5, 88.0]:
+			self.assertAlmostEqual(float(fit.channel(fit.control(channel))), channel, places=2)
+		self.assertTrue(fit.control(fit.channel_table[-1] + 5) > 100)  # extrapolated beyond table
+
+	def test_not_monotonic(self):
+		self.assertRaises(ValueError, Calibration, [-60.0, 0.0, 50.0], LAG, 0, 100)
+
+	def test_save_load(self):
+		directory = tempfile.mkdtemp()
+		try:
+			path = os.path.join(directory, 'calibration', 'test.cal')
+			Calibration(COEFFICIENTS, LAG, 20, 100, 0.05, 1000, 'test').save(path)
+			loaded = Calibration.load(path)
+		finally:
+			shutil.rmtree(directory)
+
+		numpy.testing.assert_allclose(loaded.coefficients, COEFFICIENTS)
+		self.assertEqual((loaded.lag, loaded.low, loaded.high, loaded.samples, loaded.chip_type), (LAG, 20.0, 100.0, 1000, 'test'))
+
+	def test_channel_estimate(self):
+		fit = Calibration(COEFFICIENTS, LAG, 20, 100)
+		t, control, periphery = trace([90, 40])
+		estimate = fit.estimate()
+		channel = [estimate.add(t[i], control[i]) for i in range(len(t))]
+		start = int(LAG / 0.5)  # history reaches back a lag from here on
+		numpy.testing.assert_allclose(channel[start:], periphery[start:], atol=1e-6)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,93 @@
+import os
+import unittest
+
+import support
+
+from checkpoint import Checkpoint
+
+class Checkpoint_test(support.Simulator_test):
+
+	def test_save_load_clear(self):
+		checkpoint = Checkpoint(os.path.join(self.directory, 'checkpoint.json'))
+		self.assertEqual(checkpoint.load(), None)
+
+		checkpoint.save({'action': 3, 'hold': 1.5})
+		checkpoint.save({'action': 4, 'hold': 0})
+		self.assertEqual(checkpoint.load(), {'action': 4, 'hold': 0})
+		self.assertFalse(os.path.exists(checkpoint.path + '.tmp'))
+
+		checkpoint.clear()
+		self.assertEqual(checkpoint.load(), None)
+
+	def test_hold_updates_not_synced(self):
+		"Checkpoints are synced to disk at every action of the plan, not at hold time updates on the sampling path"
+
+		synced = []
+		fsync = os.fsync
+		os.fsync = lambda fd: synced.append(fd)
+		try:
+			self.config.set('pcr_parameters', 'loop_iter', '1')
+			tc = self.temperature_control()
+			saves = []
+			save = tc.checkpoint.save
+			tc.checkpoint.save = lambda state, sync=True: (saves.append(sync), save(state, sync))
+			tc.set_control_on()
+			tc.pcr_wo_trigger()
+		finally:
+			os.fsync = fsync
+
+		self.assertTrue(saves.count(False) > 0)
+		self.assertEqual(len(synced), saves.count(True))
+
+	def interrupted_run(self, samples):
+		"Runs pcr_wo_trigger until its temperature read-out number samples fails, returns controller object"
+
+		self.config.set('pcr_parameters', 'loop_iter', '2')
+		tc = self.temperature_control()
+
+		count = [0]
+		get_temperatures = tc.get_temperatures
+		def failing():
+			count[0] += 1
+			if count[0] == samples:
+				raise IOError('serial link lost')
+			return get_temperatures()
+		tc.get_temperatures = failing
+
+		tc.set_control_on()
+		self.assertRaises(IOError, tc.pcr_wo_trigger)
+		return tc
+
+	def test_resume(self):
+		tc = self.interrupted_run(1500)
+		path = os.path.join(self.directory, self.config.get('pcr_parameters', 'checkpoint_file'))
+		state = tc.checkpoint.load()
+
+		self.assertTrue(os.path.exists(path))
+		self.assertEqual(state['source'], 'pcr_wo_trigger')
+		self.assertEqual(state['cycle'], tc.cycle)
+
+		self.clock.sleep(60)  # controller left alone before resume
+		resumed = self.temperature_control()
+		protocol, action, hold = resumed.restore_checkpoint()
+
+		self.assertEqual(action, state['action'])
+		self.assertEqual(hold, state['hold'])
+		self.assertEqual(resumed.cycle, state['cycle'])
+		self.assertAlmostEqual(self.controller.registers['03'] / 100.0, state['target_temp'], places=2)
+		self.assertEqual(self.controller.registers['2d'], 1)  # control on again
+
+		protocol.run(resumed, action, hold)
+		self.assertEqual(resumed.cycle, 2)
+		self.assertFalse(os.path.exists(path))  # run complete
+
+	def test_resume_refused_after_protocol_change(self):
+		self.interrupted_run(1500)
+		self.config.set('pcr_parameters', 'temp3', '45')
+		self.assertRaises(ValueError, self.temperature_control().restore_checkpoint)
+
+	def test_resume_without_checkpoint(self):
+		self.assertRaises(IOError, self.temperature_control().restore_checkpoint)
+
+if __name__ == '__main__':
+	unittest.main()
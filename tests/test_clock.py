@@ -0,0 +1,62 @@
+import time
+import threading
+import unittest
+
+import support
+
+from clock import Real_clock, Virtual_clock, monotonic
+
+class Virtual_clock_test(unittest.TestCase):
+
+	def test_sleep_jumps(self):
+		clock = Virtual_clock(1000.0)
+		t0 = time.time()
+		clock.sleep(3600)
+		clock.sleep(-5)  # never back
+
+		self.assertEqual(clock.time(), 4600.0)
+		self.assertEqual(clock.monotonic(), 4600.0)
+		self.assertTrue(time.time() - t0 < 0.1)
+
+	def test_wait(self):
+		clock = Virtual_clock(0)
+		event = threading.Event()
+		self.assertFalse(clock.wait(event, 2.5))
+		self.assertEqual(clock.time(), 2.5)
+
+		event.set()
+		self.assertTrue(clock.wait(event, 2.5))
+		self.assertEqual(clock.time(), 2.5)  # set event returns at once
+
+	def test_starts_at_wall_clock(self):
+		self.assertTrue(abs(Virtual_clock().time() - time.time()) < 1)
+
+class Real_clock_test(unittest.TestCase):
+
+	def test_monotonic(self):
+		clock = Real_clock()
+		t0 = clock.monotonic()
+		clock.sleep(0.02)
+		self.assertTrue(0.015 < clock.monotonic() - t0 < 0.5)
+		self.assertFalse(clock.virtual)
+		self.assertTrue(monotonic() >= t0)
+
+class Virtual_run_test(support.Simulator_test):
+
+	def test_protocol_faster_than_real_time(self):
+		self.config.set('pcr_parameters', 'loop_iter', '2')
+		tc = self.temperature_control()
+		tc.set_control_on()
+
+		t0, w0 = self.clock.time(), time.time()
+		tc.pcr_wo_trigger()
+
+		self.assertTrue(self.clock.time() - t0 > 300)  # several minutes of protocol
+		self.assertTrue(time.time() - w0 < 10)
+		self.assertEqual(tc.cycle, 2)
+
+		t, st, ct, gt = tc.get_temperatures()
+		self.assertEqual(t, self.clock.time())  # samples stamped with virtual time
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import support
+import codec
+import simulator
+
+VALUES = [0, 1, 2500, 9000, -150, -1, 0x7fffffff, -0x80000000]
+
+class Codec_test(unittest.TestCase):
+
+	def test_round_trip(self):
+		"Values written to the simulated controller come back decoded unchanged"
+
+		controller = simulator.Simulated_controller()
+		for value in VALUES:
+			response = controller.handle(codec.encode('1c', value))
+			self.assertTrue(codec.valid(response))
+			self.assertEqual(codec.decode(response), value)
+			self.assertEqual(codec.decode(bytearray(response)), value)
+
+	def test_encode_rounds_up(self):
+		self.assertEqual(codec.encode('1c', 2499.2), codec.encode('1c', 2500))
+
+	def test_encode_into(self):
+		frame = bytearray(codec.COMMAND_LENGTH)
+		for value in VALUES:
+			self.assertEqual(str(codec.encode_into(frame, '1d', value)), codec.encode('1d', value))
+
+	def test_read_frame_is_accepted(self):
+		controller = simulator.Simulated_controller()
+		self.assertEqual(codec.decode(controller.handle(codec.read_frame('51'))), 1100)
+
+	def test_checksum_rejected(self):
+		response = '*' + codec.encode_data(2500) + codec.HEX_BYTE[sum(bytearray(codec.encode_data(2500))) & 255] + '^'
+		self.assertEqual(codec.decode(response), 2500)
+
+		corrupted = response[:4] + '1' + response[5:]  # one data digit flipped
+		self.assertFalse(codec.valid(corrupted))
+		self.assertRaises(ValueError, codec.decode, corrupted)
+
+		bad_sum = response[:9] + codec.HEX_BYTE[(int(response[9:11], 16) + 1) & 255] + '^'
+		self.assertRaises(ValueError, codec.decode, bad_sum)
+
+	def test_incomplete_frame_rejected(self):
+		response = simulator.Simulated_controller().handle(codec.read_frame('03'))
+		self.assertRaises(ValueError, codec.decode, response[:-1])
+		self.assertRaises(ValueError, codec.decode, response[1:] + '^')
+
+	def test_controller_rejects_bad_command(self):
+		frame = codec.encode('1c', 2500)
+		corrupted = frame[:13] + codec.HEX_BYTE[(int(frame[13:15], 16) + 1) & 255] + '\r'
+		response = simulator.Simulated_controller().handle(corrupted)
+		self.assertEqual(response, '*XXXXXXXXc0^')  # checksum error response
+		self.assertRaises(ValueError, codec.decode, response)
+
+if __name__ == '__main__':
+	unittest.main()
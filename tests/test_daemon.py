@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+import unittest
+
+import support
+
+from daemon import Controller_daemon, Client
+
+PROTOCOL = """
+[protocol]
+
+name = short hold
+steps = hold
+exit_prompt = %s
+
+[hold]
+
+temperature = 60
+hold = 5
+"""
+
+class Daemon_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.config.set('communication', 'daemon_socket', os.path.join(self.directory, 'daemon.sock'))
+		self.config.set('communication', 'archive_dir', os.path.join(self.directory, 'archive'))
+
+		self.tc = self.temperature_control()
+		self.daemon = None
+
+	def tearDown(self):
+		if self.daemon is not None:
+			self.client.shutdown()
+			self.thread.join(5)
+			self.client.close()
+		support.Simulator_test.tearDown(self)
+
+	def serve(self):
+		"Starts daemon on the simulated controller, returns client connected to it"
+
+		self.daemon = Controller_daemon(self.config, self.tc)
+		self.thread = threading.Thread(target=self.daemon.serve_forever)
+		self.thread.daemon = True
+		self.thread.start()
+
+		self.client = Client(self.config.get('communication', 'daemon_socket'), timeout=10)
+		return self.client
+
+	def protocol(self, exit_prompt=0):
+		"Returns relative path of a one-step protocol file, run from the scratch directory"
+
+		path = os.path.join(self.directory, 'short.txt')
+		f = open(path, 'w')
+		f.write(PROTOCOL % exit_prompt)
+		f.close()
+		return os.path.relpath(path)
+
+	def wait_for_job(self):
+		"Returns status of daemon job once it stopped running"
+
+		deadline = time.time() + 10
+		while time.time() < deadline:
+			status = self.client.status()
+			if not status['running']:
+				return status
+			time.sleep(0.01)
+		self.fail('job still running')
+
+	def test_queries(self):
+		client = self.serve()
+		client.set_temperature(40)
+
+		self.assertEqual(client.get_set_temperature(), 40.0)
+		self.assertEqual(len(client.get_temperatures()), 4)
+		self.assertRaises(IOError, client.bogus)
+
+	def test_log_temperature_needs_job(self):
+		client = self.serve()
+		try:
+			client.log_temperature()
+		except IOError, e:
+			self.assertTrue('No temperature log-file' in str(e))
+		else:
+			self.fail('log_temperature without log-file')
+
+	def test_protocol_job(self):
+		client = self.serve()
+		self.assertEqual(client.run_protocol(self.protocol())['method'], 'run_protocol')
+		status = self.wait_for_job()
+
+		self.assertEqual(status['error'], None)
+		self.assertEqual(self.controller.registers['2d'], 1)  # control turned on for the job
+		self.assertEqual(self.controller.registers['03'], 6000)
+		self.assertTrue(os.path.getsize(self.tc.logfile_path) > 0)
+
+	def test_quit_final_hold(self):
+		client = self.serve()
+		client.run_protocol(self.protocol(exit_prompt=1))
+
+		deadline = time.time() + 10
+		while not self.tc.logging.messages('Holding final cooling step') and time.time() < deadline:
+			time.sleep(0.01)
+		self.assertTrue(client.status()['running'])
+
+		client.quit_final_hold()
+		self.assertEqual(self.wait_for_job()['error'], None)
+		self.assertEqual(self.controller.registers['2d'], 0)  # control off after final hold
+
+	def test_archived(self):
+		self.config.set('communication', 'archive_option', '1')
+		client = self.serve()
+		client.run_protocol(self.protocol())
+		self.wait_for_job()
+
+		from archive import Archive
+
+		archive = Archive(self.config.get('communication', 'archive_dir'))
+		runs = archive.find([])
+		archive.close()
+		self.assertEqual([run['status'] for run in runs], ['finished'])
+
+	def test_archive_failure_keeps_job_status(self):
+		self.config.set('communication', 'archive_option', '1')
+		self.config.set('communication', 'archive_dir', os.path.join(self.directory, 'short.txt'))  # a file, no directory
+		client = self.serve()
+		client.run_protocol(self.protocol())
+		status = self.wait_for_job()
+
+		self.assertEqual(status['error'], None)
+		self.assertEqual(len(self.tc.logging.messages('Cannot archive run')), 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,166 @@
+import os
+import time
+import fcntl
+import warnings
+import unittest
+
+import support
+import simulator
+
+from clock import Virtual_clock
+from job_queue import Job_queue, Job_scheduler, run_duration
+
+PROTOCOL = """
+[protocol]
+
+name = short hold
+steps = hold
+
+[hold]
+
+temperature = 60
+hold = 5
+"""
+
+class Simulated_scheduler(Job_scheduler):
+
+	def connect(self, device):
+		"Returns temperature controller object of device on a simulated controller of its own virtual clock"
+
+		from temperature_control import Temperature_control
+
+		clock = Virtual_clock()
+		controller = simulator.Simulated_controller(clock=clock.time)
+		return Temperature_control(device.config, simulator.Simulated_serial(controller), device.logging, log_config=False, clock=clock)
+
+class Job_queue_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.queue = Job_queue(os.path.join(self.directory, 'queue'))
+
+		self.path = os.path.join(self.directory, 'short.txt')
+		f = open(self.path, 'w')
+		f.write(PROTOCOL)
+		f.close()
+
+	def tearDown(self):
+		self.queue.close()
+		support.Simulator_test.tearDown(self)
+
+	def test_submit_and_claim_in_order(self):
+		first = self.queue.submit('pcr_wo_trigger', [('temp3', '42')], 'A1')
+		second = self.queue.submit(self.path)
+
+		job = self.queue.claim('chip1')
+		self.assertEqual((job['id'], job['state'], job['device'], job['chip']), (first, 'running', 'chip1', 'A1'))
+		self.assertEqual(job['overrides'], [('temp3', '42')])
+		self.assertEqual(self.queue.claim('chip2')['id'], second)
+		self.assertEqual(self.queue.claim('chip1'), None)
+
+		self.queue.finish(first, 'finished', 120.0, 3, 'run.log')
+		job = self.queue.job(first)
+		self.assertEqual((job['state'], job['duration'], job['cycles'], job['log']), ('finished', 120.0, 3, 'run.log'))
+
+	def test_claimed_once_across_connections(self):
+		job = self.queue.submit('pcr_wo_trigger')
+		other = Job_queue(self.queue.directory)
+		try:
+			claims = [self.queue.claim('chip1'), other.claim('chip2')]
+		finally:
+			other.close()
+		self.assertEqual([c and c['id'] for c in claims], [job, None])
+
+	def test_submit_missing_file(self):
+		self.assertRaises(ValueError, self.queue.submit, os.path.join(self.directory, 'missing.txt'))
+
+	def test_cancel_queued_only(self):
+		first = self.queue.submit('pcr_wo_trigger')
+		second = self.queue.submit('pcr_wo_trigger')
+		self.queue.claim('chip1')
+
+		self.assertEqual((self.queue.cancel(first), self.queue.cancel(second)), (False, True))
+		self.assertEqual([j['state'] for j in self.queue.jobs()], ['running', 'cancelled'])
+		self.assertEqual(self.queue.claim('chip1'), None)
+		self.assertRaises(ValueError, self.queue.jobs, ['done'])
+
+	def test_recover(self):
+		job = self.queue.submit('pcr_wo_trigger')
+		self.queue.claim('chip1')
+
+		self.assertEqual(self.queue.recover(), [job])
+		self.assertEqual(self.queue.job(job)['state'], 'failed')
+
+	def test_estimate_and_wait_times(self):
+		for duration in (100.0, 300.0, 200.0):
+			self.queue.finish(self.queue.submit('pcr_wo_trigger'), 'finished', duration)
+		self.assertEqual(self.queue.estimate('pcr_wo_trigger'), 200.0)
+		self.assertEqual(self.queue.estimate(self.path), None)
+
+		running = self.queue.submit('pcr_wo_trigger')
+		self.queue.claim('chip1')
+		queued = [self.queue.submit('pcr_wo_trigger'), self.queue.submit('pcr_wo_trigger'), self.queue.submit(self.path), self.queue.submit('pcr_wo_trigger')]
+
+		now = self.queue.job(running)['start'] + 50.0  # chip1 idle in 150 s
+		waits = [(job['id'], wait, duration) for (job, wait, duration) in self.queue.wait_times(['chip1', 'chip2'], now)]
+		self.assertEqual(waits, [(queued[0], 0.0, 200.0), (queued[1], 150.0, 200.0), (queued[2], 200.0, None), (queued[3], 350.0, 200.0)])
+
+	def test_run_duration(self):
+		log = os.path.join(self.directory, 'run-temperature.log')
+		f = open(log, 'w')
+		f.write('100.0\t60\t25\t25\n160.5\t60\t59\t57\n')
+		f.close()
+
+		self.assertEqual(run_duration(log, 1.0), 60.5)
+		self.assertEqual(run_duration(None, 1.0), 1.0)
+		self.assertEqual(run_duration(os.path.join(self.directory, 'missing.log'), 1.0), 1.0)
+
+	def scheduler(self):
+		self.config.set('communication', 'log_dir', os.path.join(self.directory, 'logs'))
+		self.config.set('orchestrator', 'devices', 'chip1, chip2')
+		for name in ('chip1', 'chip2'):
+			if not self.config.has_section(name):
+				self.config.add_section(name)
+			self.config.set(name, 'serial_port', '/dev/%s' % name)
+			self.config.remove_option(name, 'log_dir')
+			self.config.remove_option(name, 'protocol')
+
+		return Simulated_scheduler(self.config, self.queue, None, support.Null_logger())
+
+	def test_scheduler_dispatch(self):
+		"Jobs run on idle devices in queue order; rejected and failing jobs do not stop the others"
+
+		scheduler = self.scheduler()
+		jobs = [self.queue.submit(self.path, [('temp3', '42')], 'A1'), self.queue.submit(self.path, [('tmp3', '42')]),
+			self.queue.submit(self.path), self.queue.submit(self.path)]
+		self.queue.db.execute("UPDATE jobs SET protocol = ? WHERE id = ?", (os.path.join(self.directory, 'missing.txt'), jobs[3]))
+		self.queue.db.commit()
+
+		t0 = time.time()
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore')  # numpy reports the empty log of the failing job
+			scheduler.run()
+		self.assertTrue(time.time() - t0 < 10.0)
+
+		states = [self.queue.job(job) for job in jobs]
+		self.assertEqual([job['state'] for job in states], ['finished', 'failed', 'finished', 'failed'])
+		self.assertTrue('unknown option tmp3' in states[1]['error'])
+		self.assertTrue(states[3]['error'].startswith('IOError'))
+
+		first = states[0]
+		self.assertEqual(first['device'], 'chip1')
+		self.assertTrue(first['log'].startswith(os.path.join(self.directory, 'logs', 'job%i' % jobs[0])))
+		self.assertEqual(first['duration'], run_duration(first['log'], None))
+		self.assertTrue(first['duration'] > 5.0)
+		self.assertEqual(scheduler.running, {})
+
+	def test_single_scheduler(self):
+		lock = open(os.path.join(self.queue.directory, 'scheduler.lock'), 'w')
+		fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		try:
+			self.assertRaises(IOError, self.scheduler().run)
+		finally:
+			lock.close()
+
+if __name__ == '__main__':
+	unittest.main()
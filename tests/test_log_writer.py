@@ -0,0 +1,102 @@
+import os
+import sys
+import shutil
+import tempfile
+import StringIO
+import unittest
+
+import support
+
+from log_writer import Log_writer, Queued_file
+
+class Log_writer_test(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.writer = Log_writer(support.test_config(self.directory))
+		self.writer.start()
+
+	def tearDown(self):
+		self.writer.close()
+		shutil.rmtree(self.directory)
+
+	def open(self, name):
+		return open(os.path.join(self.directory, name), 'w')
+
+	def read(self, name):
+		return open(os.path.join(self.directory, name)).read()
+
+	def test_write_in_order_and_close(self):
+		stream = self.open('a.log')
+		log = Queued_file(self.writer, stream)
+		for i in range(1000):
+			log.write('%i\n' % i)
+		log.close()
+
+		self.assertEqual(self.writer.close(), 0)
+		self.assertTrue(stream.closed)
+		self.assertEqual(self.read('a.log'), ''.join(['%i\n' % i for i in range(1000)]))
+
+	def test_close_twice(self):
+		"A second close, of the queued file or of its stream, neither fails nor stops the writer"
+
+		stream = self.open('a.log')
+		log = Queued_file(self.writer, stream)
+		log.write('first\n')
+		log.close()
+		log.close()
+		self.writer.close_stream(stream)
+
+		other = Queued_file(self.writer, self.open('b.log'))
+		other.write('second\n')
+		other.close()
+
+		self.writer.close()
+		self.assertEqual(self.read('a.log'), 'first\n')
+		self.assertEqual(self.read('b.log'), 'second\n')
+
+	def test_failing_stream_keeps_writer_running(self):
+		stream = self.open('a.log')
+		stream.close()  # every write fails
+
+		stderr, sys.__stderr__ = sys.__stderr__, StringIO.StringIO()
+		try:
+			self.writer.write(stream, 'lost\n')
+			self.writer.write(stream, 'lost\n')
+			log = Queued_file(self.writer, self.open('b.log'))
+			log.write('kept\n')
+			log.close()
+			self.writer.close()
+			report = sys.__stderr__.getvalue()
+		finally:
+			sys.__stderr__ = stderr
+
+		self.assertEqual(self.read('b.log'), 'kept\n')
+		self.assertTrue(stream in self.writer.failed)
+		self.assertEqual(report.count('Log writer cannot write'), 1)  # reported once per stream
+
+	def test_writes_directly_once_stopped(self):
+		self.writer.close()
+		stream = self.open('a.log')
+		log = Queued_file(self.writer, stream)
+		log.write('direct\n')
+		log.close()
+		self.assertTrue(stream.closed)
+		self.assertEqual(self.read('a.log'), 'direct\n')
+
+	def test_full_queue_drops(self):
+		self.writer.close()
+		writer = Log_writer(support.test_config(self.directory))  # not started: queue is never drained
+		writer.queue.maxsize = 2
+		writer.is_alive = lambda: True
+
+		stream = StringIO.StringIO()
+		try:
+			results = [writer.write(stream, 'x') for i in range(5)]
+		finally:
+			del writer.is_alive  # its close at exit must not wait on the full queue
+		self.assertEqual(results, [True, True, False, False, False])
+		self.assertEqual(writer.dropped, 3)
+
+if __name__ == '__main__':
+	unittest.main()
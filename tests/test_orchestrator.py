@@ -0,0 +1,131 @@
+import os
+import warnings
+import unittest
+
+import support
+import simulator
+
+from clock import Virtual_clock
+from archive import Archive
+from orchestrator import Device_pool, Orchestrator, device_config
+
+PROTOCOL = """
+[protocol]
+
+name = short hold
+steps = hold
+exit_prompt = %s
+
+[hold]
+
+temperature = 60
+hold = 5
+"""
+
+class Simulated_orchestrator(Orchestrator):
+
+	def connect(self, device):
+		"Returns temperature controller object of device on a simulated controller of its own virtual clock"
+
+		from temperature_control import Temperature_control
+
+		clock = Virtual_clock()
+		device.controller = simulator.Simulated_controller(clock=clock.time)
+		return Temperature_control(device.config, simulator.Simulated_serial(device.controller), device.logging, log_config=False, clock=clock)
+
+class Orchestrator_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.config.set('communication', 'archive_dir', os.path.join(self.directory, 'archive'))
+		self.config.set('orchestrator', 'devices', 'chip1, chip2')
+		for name in ('chip1', 'chip2'):
+			if not self.config.has_section(name):
+				self.config.add_section(name)
+			self.config.set(name, 'serial_port', '/dev/%s' % name)
+			self.config.set(name, 'log_dir', os.path.join(self.directory, name))
+			self.config.set(name, 'protocol', self.protocol())
+
+		self.logger = support.Null_logger()
+
+	def protocol(self, exit_prompt=0):
+		"Returns path of a one-step protocol file"
+
+		path = os.path.join(self.directory, 'short.txt')
+		f = open(path, 'w')
+		f.write(PROTOCOL % exit_prompt)
+		f.close()
+		return path
+
+	def test_device_config(self):
+		self.config.set('chip2', 'temp3', '42')
+		config = device_config(self.config, 'chip2')
+
+		self.assertEqual(config.get('pcr_parameters', 'temp3'), '42')
+		self.assertEqual(config.get('communication', 'serial_port'), '/dev/chip2')
+		self.assertEqual(config.get('pcr_parameters', 'checkpoint_file'), 'chip2-checkpoint.json')
+		self.assertEqual(self.config.get('pcr_parameters', 'temp3'), '40')  # shared configuration untouched
+
+	def test_unknown_option(self):
+		self.config.set('chip2', 'tmp3', '42')
+		self.assertRaises(ValueError, device_config, self.config, 'chip2')
+
+	def test_missing_device_section(self):
+		self.assertRaises(ValueError, Device_pool, self.config, ['chip3'], self.logger)
+
+	def test_serial_factory(self):
+		ports = []
+		def factory(port):
+			ports.append(port)
+			return simulator.Simulated_serial(self.controller)
+
+		pool = Orchestrator(self.config, ['chip2'], self.logger, serial_factory=factory)
+		tc = pool.connect(pool.devices[0])
+
+		self.assertEqual(ports, ['/dev/chip2'])
+		self.assertEqual(tc.serial.controller, self.controller)
+
+	def test_failing_device(self):
+		"A failing device turns its control off and is archived as failed, the other one finishes"
+
+		self.config.set('communication', 'archive_option', '1')
+		self.config.set('chip2', 'protocol', os.path.join(self.directory, 'missing.txt'))
+		orchestrator = Simulated_orchestrator(self.config, None, self.logger)
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore')  # numpy reports the empty log of chip2
+			result = orchestrator.run(prompt=False)
+
+		self.assertEqual([r[:2] for r in result], [('chip1', 'finished'), ('chip2', 'failed')])
+		self.assertTrue(result[1][2].startswith('IOError'))
+		self.assertEqual(result[0][2], None)
+
+		chip1, chip2 = orchestrator.devices
+		self.assertEqual(chip2.controller.registers['2d'], 0)  # control turned off again
+		self.assertTrue(chip2.temperature_control.logfile.closed)
+		self.assertEqual(len(self.logger.messages('[chip2] -\t--> Device failed')), 1)
+
+		archive = Archive(self.config.get('communication', 'archive_dir'))
+		runs = archive.find([])
+		archive.close()
+		self.assertEqual(sorted([(run['protocol'].split(':')[0], run['status']) for run in runs]), [('chip1', 'finished'), ('chip2', 'failed')])
+
+	def test_final_hold(self):
+		self.config.set('chip1', 'protocol', self.protocol(exit_prompt=1))
+		orchestrator = Simulated_orchestrator(self.config, ['chip1'], self.logger)
+		result = orchestrator.run(prompt=False)
+
+		self.assertEqual(result, [('chip1', 'finished', None)])
+		self.assertEqual(orchestrator.devices[0].controller.registers['2d'], 0)
+
+	def test_archive_failure(self):
+		"A run that cannot be archived keeps its status"
+
+		self.config.set('communication', 'archive_option', '1')
+		self.config.set('communication', 'archive_dir', self.protocol())  # a file, no directory
+		orchestrator = Simulated_orchestrator(self.config, ['chip1'], self.logger)
+
+		self.assertEqual(orchestrator.run(prompt=False), [('chip1', 'finished', None)])
+		self.assertEqual(len(self.logger.messages('Cannot archive run')), 1)
+
+if __name__ == '__main__':
+	unittest.main()
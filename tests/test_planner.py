@@ -0,0 +1,81 @@
+import os
+import unittest
+
+import support
+
+from simulator import PLANT
+from protocol import Protocol
+from planner import Trigger_table, AMBIENT, MATCH, endpoints, ramp_time, plan_transition
+
+CRITERIA = (3.0, 0.05, 0.1)  # SS_window, SS_slope, SS_std
+
+def transition(name, start, target, overshoot, trigger):
+	return {'name': name, 'start': start, 'target': target, 'overshoot': overshoot, 'trigger': trigger,
+		'ramp_time': 60.0, 'plain_time': 80.0}
+
+TABLE = [transition('RT-90', 25.0, 90.0, 95.0, 85.0), transition('90-40', 90.0, 40.0, 35.0, 45.0),
+	 transition('40-70', 40.0, 70.0, 73.0, 68.0)]
+
+class Trigger_table_test(support.Simulator_test):
+
+	def test_save_and_load(self):
+		path = os.path.join(self.directory, 'triggers.txt')
+		Trigger_table(TABLE).save(path)
+		table = Trigger_table.load(path)
+
+		self.assertEqual([t['name'] for t in table.transitions], ['RT-90', '90-40', '40-70'])
+		self.assertEqual(table.transitions[1], TABLE[1])
+
+	def test_load_missing(self):
+		self.assertRaises(IOError, Trigger_table.load, os.path.join(self.directory, 'missing.txt'))
+
+	def test_nearest(self):
+		table = Trigger_table(TABLE)
+		self.assertEqual(table.nearest(None, 90.0)['name'], 'RT-90')  # first step ramps from AMBIENT
+		self.assertEqual(table.nearest(42.0, 68.0)['name'], '40-70')
+		self.assertEqual(table.nearest(40.0, 70.0 + MATCH + 0.1), None)
+		self.assertEqual(table.nearest(70.0, 40.0), None)  # opposite direction of 40-70
+
+	def test_lookup_offsets(self):
+		"Overshoot and trigger keep their offsets to the target of the nearest transition"
+
+		table = Trigger_table(TABLE)
+		self.assertEqual(table.lookup(AMBIENT, 92.0), (97.0, 87.0))
+		self.assertEqual(table.lookup(90.0, 42.0), (37.0, 47.0))
+		self.assertEqual(table.lookup(60.0, 20.0), None)
+
+	def test_loaded_by_temperature_control(self):
+		Trigger_table(TABLE).save(os.path.join(self.directory, self.config.get("pcr_parameters", "trigger_table")))
+		tc = self.temperature_control()
+
+		self.assertEqual(len(tc.triggers.transitions), 3)
+		plan = Protocol.from_config(tc, trigger=True).plan
+		sets = [a[1] for a in plan if a[0] == 'set_temperature']
+		self.assertEqual(sets[:2], [tc.temp1 + 5.0, tc.temp1])  # RT-90 overshoot of step1
+		self.assertTrue(('pull_trigger', tc.temp1 - 5.0, tc.temp_tolerance) in plan)
+
+class Planner_test(unittest.TestCase):
+
+	def test_endpoints(self):
+		self.assertEqual(endpoints('RT-90', None), (AMBIENT, 90.0))
+		self.assertEqual(endpoints('90-40', None), (90.0, 40.0))
+		self.assertEqual(endpoints('ramp', ([], [40.0, 70.0], [38.5, 69.0], [])), (38.5, 70.0))
+
+	def test_ramp_time_plain(self):
+		t = ramp_time(PLANT, 40.0, 70.0, (22, 2, 0), None, None, 1.0, CRITERIA, 0.5, 600.0)
+		self.assertTrue(CRITERIA[0] < t < 600.0)
+		self.assertEqual(ramp_time(PLANT, 40.0, 70.0, (22, 2, 0), None, None, 1.0, CRITERIA, 0.5, 10.0), None)
+
+	def test_plan_transition_beats_plain_ramp(self):
+		transition = plan_transition(PLANT, 40.0, 70.0, (22, 2, 0), 1.0, CRITERIA, 0.5, 600.0)
+
+		self.assertEqual((transition['start'], transition['target']), (40.0, 70.0))
+		self.assertTrue(transition['overshoot'] > 70.0)
+		self.assertTrue(40.0 < transition['trigger'] <= transition['overshoot'])
+		self.assertTrue(transition['ramp_time'] <= transition['plain_time'])
+		self.assertEqual(transition['plain_time'], ramp_time(PLANT, 40.0, 70.0, (22, 2, 0), None, None, 1.0, CRITERIA, 0.5, 600.0))
+		self.assertEqual(transition['ramp_time'], ramp_time(PLANT, 40.0, 70.0, (22, 2, 0), transition['overshoot'],
+								    transition['trigger'], 1.0, CRITERIA, 0.5, 600.0))
+
+if __name__ == '__main__':
+	unittest.main()
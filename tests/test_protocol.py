@@ -0,0 +1,97 @@
+import os
+import unittest
+
+import support
+
+from protocol import Protocol
+
+def protocol_file(name):
+	return os.path.join(support.ROOT, 'protocols', name)
+
+def step(label, temperature, hold, tolerance=1.0):
+	"Returns plan of one plain step without PID changes"
+
+	return [('step', label, temperature, None), ('set_temperature', temperature),
+		('wait_for_SS', temperature, tolerance, None, None, None), ('incubate_reagent', hold)]
+
+class Protocol_test(unittest.TestCase):
+
+	def test_compile_steps_and_repeat(self):
+		sections = {'hot': {'temperature': '90', 'hold': '10', 'tolerance': '1'},
+			    'cold': {'temperature': '40', 'hold': '20', 'tolerance': '1'},
+			    'loop': {'repeat': '2', 'steps': 'hot, cold', 'skip_first': 'hot'}}
+		protocol = Protocol('test', ['hot', 'loop'], sections)
+
+		self.assertEqual(protocol.plan, [('say', 'pcr_start')] + step('hot', 90.0, 10.0) + [('cycle', 1)] + step('cold', 40.0, 20.0) +
+				 [('cycle', 2)] + step('hot', 90.0, 10.0) + step('cold', 40.0, 20.0) + [('say', 'pcr_end')])
+
+	def test_gains_written_on_change_only(self):
+		sections = {'a': {'temperature': '90', 'P_bandwidth': '22', 'I_gain': '2'},
+			    'b': {'temperature': '40', 'P_bandwidth': '22', 'I_gain': '10'}}
+		plan = Protocol('test', ['a', 'b'], sections).plan
+		writes = [action for action in plan if action[0].startswith('set_') and action[0] != 'set_temperature']
+		self.assertEqual(writes, [('set_P_bandwidth', 22.0), ('set_I_gain', 2.0), ('set_I_gain', 10.0)])
+
+	def test_overshoot_and_trigger(self):
+		sections = {'a': {'temperature': '90', 'overshoot': '100', 'trigger': '85', 'tolerance': '0.5', 'wait': '0'}}
+		plan = Protocol('test', ['a'], sections).plan
+		self.assertEqual(plan[2:6], [('set_temperature', 100.0), ('pull_trigger', 85.0, 0.5), ('set_temperature', 90.0), ('incubate_reagent', 0.0)])
+
+	def test_three_step_file(self):
+		protocol = Protocol.load(protocol_file('three_step.txt'))
+		plan = protocol.plan
+
+		self.assertEqual(protocol.source, protocol_file('three_step.txt'))
+		self.assertEqual([a[1] for a in plan if a[0] == 'cycle'], [1, 2, 3, 4, 5])
+		self.assertEqual(len([a for a in plan if a[0] == 'step' and a[1] == '(inner) denaturation step']), 4)  # skipped in first cycle
+		self.assertEqual(plan[-1], ('press_q_to_exit',))
+		self.assertEqual(protocol.digest, Protocol.load(protocol_file('three_step.txt')).digest)
+
+	def test_touchdown_increments(self):
+		plan = Protocol.load(protocol_file('touchdown.txt')).plan
+		annealing = [a[2] for a in plan if a[0] == 'step' and a[1] == '(inner) touchdown annealing step']
+		self.assertEqual(len(annealing), 20)
+		self.assertEqual(annealing[0], 50.0)
+		self.assertEqual(annealing[-1], 50.0 - 0.5 * 19)
+
+	def test_undefined_step(self):
+		self.assertRaises(ValueError, Protocol, 'test', ['missing'], {})
+
+	def test_missing_file(self):
+		self.assertRaises(IOError, Protocol.load, protocol_file('missing.txt'))
+
+class Pull_trigger_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.tc = self.temperature_control()
+		self.tc.set_control_on()
+
+	def test_ramp_up_to_trigger(self):
+		self.tc.set_temperature(95)
+		t0 = self.clock.time()
+		self.tc.pull_trigger(80, 0.5)
+
+		self.assertTrue(self.clock.time() - t0 < self.tc.time_limit * 60)
+		self.assertTrue(79.5 <= self.controller.plant.control < 85)
+		self.assertEqual(self.tc.logging.messages('Time limit'), [])
+
+	def test_ramp_down_to_trigger(self):
+		self.tc.set_temperature(95)
+		self.tc.wait_for_SS(95)
+		self.tc.set_temperature(30)
+		self.tc.pull_trigger(60)
+		self.assertTrue(55 < self.controller.plant.control <= 61)
+
+	def test_trigger_already_passed(self):
+		"A ramp whose first reading is beyond the trigger point ends on that reading, not at the time limit"
+
+		self.tc.set_temperature(95)
+		t0 = self.clock.time()
+		self.tc.pull_trigger(20)
+
+		self.assertTrue(self.clock.time() - t0 < 1)
+		self.assertEqual(self.tc.logging.messages('Time limit'), [])
+
+if __name__ == '__main__':
+	unittest.main()
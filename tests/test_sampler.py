@@ -0,0 +1,74 @@
+import time
+import unittest
+
+import support
+import codec
+import simulator
+
+from clock import Real_clock
+from sampler import Sampler, Ring_buffer
+
+class Ring_buffer_test(unittest.TestCase):
+
+	def test_empty(self):
+		ring = Ring_buffer(3)
+		self.assertEqual(ring.latest(), None)
+		self.assertEqual(ring.window(), [])
+
+	def test_wrap_around(self):
+		ring = Ring_buffer(3)
+		for i in range(5):
+			ring.append((i, i + 0.5, i + 1.0, i + 1.5))
+
+		self.assertEqual(ring.count, 5)
+		self.assertEqual(ring.latest(), (4.0, 4.5, 5.0, 5.5))
+		self.assertEqual([row[0] for row in ring.window()], [2.0, 3.0, 4.0])  # oldest rows overwritten
+		self.assertEqual([row[0] for row in ring.window(2)], [3.0, 4.0])
+		self.assertEqual(len(ring.window(10)), 3)
+
+class Sampler_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.clock = Real_clock()  # sampler thread sleeps for real
+		self.controller = simulator.Simulated_controller(clock=self.clock.time)
+		self.config.set('communication', 'sampler_rate', '100')
+
+	def test_snapshots_and_transfers(self):
+		tc = self.temperature_control()
+		tc.start_sampler()
+		try:
+			self.assertTrue(tc.on_sampler())
+			tc.set_temperature(40)  # queued to the acquisition thread
+			self.assertEqual(tc.read_registers([codec.read_frame('03')]), [4000])
+
+			first = tc.get_temperatures()
+			second = tc.get_temperatures()
+			self.assertTrue(second[0] > first[0])  # each call consumes a new snapshot
+			self.assertEqual(second[1], 40.0)
+		finally:
+			tc.stop_sampler()
+
+		self.assertFalse(tc.on_sampler())
+		self.assertEqual(self.controller.registers['03'], 4000)
+
+	def test_read_fails_once_stopped(self):
+		sampler = Sampler(self.temperature_control(), 100, 10)  # never started
+		t0 = time.time()
+		self.assertRaises(IOError, sampler.read, [codec.read_frame('03')], 0.05)
+		self.assertTrue(time.time() - t0 < 1)
+
+	def test_read_default_timeout(self):
+		tc = self.temperature_control()
+		tc.response_timeout = 0.01
+		sampler = Sampler(tc, 100, 10)
+		t0 = time.time()
+		self.assertRaises(IOError, sampler.read, [codec.read_frame('03')])
+		self.assertTrue(time.time() - t0 < 1)
+
+	def test_next_sample_fails_once_stopped(self):
+		sampler = Sampler(self.temperature_control(), 100, 10)
+		self.assertRaises(IOError, sampler.next_sample, 0, 0.05)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,70 @@
+import threading
+import unittest
+
+import support
+
+from clock import Virtual_clock, Scheduler
+
+class Scheduler_test(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = Virtual_clock(0)
+		self.logger = support.Null_logger()
+
+	def test_no_drift(self):
+		"Work time of the loop body is absorbed, deadlines stay on the period grid"
+
+		schedule = Scheduler(self.clock, 0.5)
+		wake = []
+		for work in [0.1, 0.3, 0.0, 0.45, 0.2] * 20:
+			self.clock.sleep(work)  # loop body
+			schedule.sleep()
+			wake.append(self.clock.time())
+
+		self.assertEqual(wake, [0.5 * (k + 1) for k in range(100)])
+		self.assertEqual(schedule.overruns, 0)
+
+	def test_overrun_skips_periods(self):
+		schedule = Scheduler(self.clock, 1.0, 'test', self.logger)
+		self.clock.sleep(2.5)  # body runs past two deadlines
+		self.assertEqual(schedule.advance(), 0)
+		self.assertEqual(schedule.advance(), 0.5)  # back on grid at 3 s
+
+		self.clock.sleep(3.7)
+		schedule.advance()
+		self.assertEqual((schedule.overruns, schedule.deadlines), (2, 3))
+		self.assertAlmostEqual(schedule.late, 2.2)  # deadline at 4 s
+
+		self.assertEqual(len(self.logger.messages('overran')), 1)  # logged once per loop
+		schedule.report(4)
+		self.assertEqual(self.logger.messages('deadline(s) overrun'), ['4\t--> test: 2 of 3 sampling deadline(s) overrun, latest by 2.200 s'])
+
+	def test_set_period(self):
+		schedule = Scheduler(self.clock, 1.0)
+		schedule.sleep()
+		schedule.set_period(0.25)
+		schedule.sleep()
+		schedule.sleep()
+		self.assertEqual(self.clock.time(), 1.5)
+
+	def test_policy(self):
+		class Doubling:
+			period = 0.5
+			def update(self, sample):
+				self.period *= 2
+				return self.period
+
+		schedule = Scheduler(self.clock, 0.5, policy=Doubling())
+		for i in range(3):
+			schedule.sleep(sample=(self.clock.time(), 0, 0, 0))
+		self.assertEqual(self.clock.time(), 1.0 + 2.0 + 4.0)
+
+	def test_event_ends_wait(self):
+		event = threading.Event()
+		event.set()
+		schedule = Scheduler(self.clock, 1.0)
+		self.assertTrue(schedule.sleep(event))
+		self.assertEqual(self.clock.time(), 0)
+
+if __name__ == '__main__':
+	unittest.main()
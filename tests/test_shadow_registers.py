@@ -0,0 +1,63 @@
+import unittest
+
+import support
+
+class Shadow_register_test(support.Simulator_test):
+
+	def setUp(self):
+		support.Simulator_test.setUp(self)
+		self.tc = self.temperature_control()
+
+		self.writes = []
+		write_command = self.tc.write_command
+		def counting(frame):
+			self.writes.append(frame[3:5])  # write command
+			write_command(frame)
+		self.tc.write_command = counting
+
+	def test_loaded_from_controller(self):
+		self.assertEqual(self.tc.shadow, {'1c': 2500, '1d': 1100, '1e': 200, '1f': 0})
+
+	def test_redundant_writes_skipped(self):
+		self.tc.set_temperature(25)  # controller holds it already
+		self.tc.set_temperature(40)
+		self.tc.set_temperature(40)
+		self.tc.set_I_gain(2)
+		self.tc.set_I_gain(10)
+
+		self.assertEqual(self.writes, ['1c', '1e'])
+		self.assertEqual(self.controller.registers['03'], 4000)
+		self.assertEqual(self.controller.registers['52'], 1000)
+		self.assertEqual(len(self.tc.logging.messages('Target temperature already 40.00 C')), 1)
+
+	def test_resync_after_external_change(self):
+		self.tc.set_temperature(40)
+		self.controller.registers['03'] = 3000  # changed behind the driver's back, e.g. on the front panel
+
+		self.tc.set_temperature(40)
+		self.assertEqual(self.writes, ['1c'])  # shadow copy is stale
+
+		self.tc.resync_registers()
+		self.assertEqual(self.tc.shadow['1c'], 3000)
+		self.tc.set_temperature(40)
+		self.assertEqual(self.writes, ['1c', '1c'])
+		self.assertEqual(self.controller.registers['03'], 4000)
+
+	def test_invalidate(self):
+		self.tc.invalidate_registers()
+		self.tc.set_temperature(25)
+		self.tc.set_D_gain(0)
+		self.assertEqual(self.writes, ['1c', '1f'])
+
+	def test_protocol_writes_changes_only(self):
+		self.config.set('pcr_parameters', 'loop_iter', '3')
+		tc = self.tc
+		tc.set_control_on()
+		tc.pcr_wo_trigger()
+
+		set_points = len(tc.set_points)  # set point changes of the run
+		self.assertEqual(self.writes.count('1c'), set_points)
+		self.assertTrue(self.writes.count('1d') + self.writes.count('1e') + self.writes.count('1f') <= 3 * set_points)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,108 @@
+import math
+import unittest
+
+import support
+import codec
+import simulator
+
+from clock import Virtual_clock
+from simulator import Thermal_plant, Simulated_controller, Simulated_serial, PLANT, STEP
+
+def run(plant, seconds, setpoint, gains=(22.0, 2.0, 0.0), on=True):
+	"Advances plant by seconds under PID gains (pb, ig, dg) toward setpoint"
+
+	for i in range(int(round(seconds / STEP))):
+		plant.step(STEP, setpoint, gains[0], gains[1], gains[2], on)
+
+class Thermal_plant_test(unittest.TestCase):
+
+	def test_rests_at_ambient(self):
+		plant = Thermal_plant()
+		run(plant, 60, 90, on=False)
+		self.assertAlmostEqual(plant.control, PLANT['ambient'], places=6)
+
+	def test_unpowered_decay(self):
+		"The unpowered block relaxes to ambient with time constant tau"
+
+		plant = Thermal_plant(temperature=90.0)
+		run(plant, PLANT['tau'], 90, on=False)
+		remaining = (plant.control - PLANT['ambient']) / (90.0 - PLANT['ambient'])
+		self.assertAlmostEqual(remaining, math.exp(-1), places=2)
+
+	def test_closed_loop_set_point(self):
+		plant = Thermal_plant()
+		run(plant, 240, 90)
+		self.assertTrue(abs(plant.control - 90) < 0.1)
+
+		p = PLANT  # steady slide temperature: a Tc + b Tg + c = 0
+		self.assertAlmostEqual(plant.periphery, -(p['a'] * plant.control + p['c']) / p['b'], places=1)
+
+		run(plant, 240, 40)
+		self.assertTrue(abs(plant.control - 40) < 0.1)
+
+	def test_dead_time(self):
+		plant = Thermal_plant()
+		run(plant, PLANT['L'] - STEP, 90)
+		self.assertEqual(plant.control, PLANT['ambient'])  # output not through dead time yet
+		run(plant, 2 * STEP, 90)
+		self.assertTrue(plant.control > PLANT['ambient'])
+
+	def test_hold_presets_steady_output(self):
+		plant = Thermal_plant(temperature=60.0)
+		plant.hold(22.0, 2.0)
+		run(plant, 30, 60)
+		self.assertTrue(abs(plant.control - 60) < 0.1)
+
+class Simulated_controller_test(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = Virtual_clock()
+		self.controller = Simulated_controller(clock=self.clock.time)
+		self.serial = Simulated_serial(self.controller)
+
+	def read(self, command):
+		self.serial.write(codec.read_frame(command))
+		return codec.decode(self.serial.read(codec.RESPONSE_LENGTH))
+
+	def test_advances_with_clock(self):
+		self.serial.write(codec.encode('1c', 9000))
+		self.serial.write(codec.encode('2d', 1))
+		self.serial.flushInput()
+		self.assertEqual(self.read('01'), 2500)
+
+		self.clock.sleep(240)
+		self.assertTrue(abs(self.read('01') - 9000) < 10)
+		self.assertEqual(self.read('03'), 9000)
+
+	def test_frames_written_in_pieces(self):
+		frame = codec.encode('1c', 4000)
+		self.serial.write(frame[:7])
+		self.assertEqual(self.serial.inWaiting(), 0)
+		self.serial.write(frame[7:])
+		self.assertEqual(codec.decode(self.serial.read(codec.RESPONSE_LENGTH)), 4000)
+		self.assertEqual(self.controller.registers['03'], 4000)
+
+	def test_unknown_command(self):
+		self.assertEqual(self.controller.handle(codec.read_frame('7f')), '*XXXXXXXXc0^')
+
+class Fit_test(unittest.TestCase):
+
+	def test_fit_recovers_block(self):
+		parameters = dict(PLANT, K=80.0, tau=20.0, L=0.5)
+		plant = Thermal_plant(parameters)
+		gains = (22.0, 2.0, 0.0)
+
+		trace = ([], [], [], [])
+		for k in range(240):  # 60 s at 0.25 s, set point steps from 60 to 40 C
+			setpoint = k < 120 and 60.0 or 40.0
+			for column, value in zip(trace, (k * 0.25, setpoint, plant.control, plant.periphery)):
+				column.append(value)
+			run(plant, 0.25, setpoint, gains)
+
+		fit = simulator.fit_plant([(trace, gains)])
+		self.assertTrue(fit['rms'] < 0.05)
+		self.assertAlmostEqual(fit['K'] / 80.0, 1, places=1)
+		self.assertAlmostEqual(fit['tau'] / 20.0, 1, places=1)
+
+if __name__ == '__main__':
+	unittest.main()
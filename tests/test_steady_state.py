@@ -0,0 +1,55 @@
+import math
+import unittest
+
+import support
+
+from steady_state import Steady_state
+
+def feed(detector, temperature, duration, period=0.1):
+	"Feeds detector with samples of temperature(t) function every period (s), returns time of detection or None"
+
+	for i in range(int(duration / period) + 1):
+		t = i * period
+		if detector.add(t, temperature(t)):
+			return t
+	return None
+
+class Steady_state_test(unittest.TestCase):
+
+	def test_constant_detected_after_window(self):
+		t = feed(Steady_state(60.0, 1.0, 3.0, 0.05, 0.1), lambda t: 60.2, 10)
+		self.assertAlmostEqual(t, 3.0, places=6)
+
+	def test_outside_tolerance(self):
+		self.assertEqual(feed(Steady_state(60.0, 1.0, 3.0, 0.05, 0.1), lambda t: 61.5, 10), None)
+
+	def test_ramp_too_steep(self):
+		self.assertEqual(feed(Steady_state(60.0, 1.0, 3.0, 0.05, 0.1), lambda t: 59.5 + 0.1 * t, 10), None)
+
+	def test_noise_too_large(self):
+		self.assertEqual(feed(Steady_state(60.0, 1.0, 3.0, 0.05, 0.1), lambda t: 60.0 + 0.5 * math.sin(7 * t), 10), None)
+
+	def test_settling_ramp(self):
+		"A first-order approach is detected once its window has settled, and later than the tolerance crossing"
+
+		temperature = lambda t: 60.0 - 30.0 * math.exp(-t / 2.0)
+		detector = Steady_state(60.0, 1.0, 3.0, 0.05, 0.1)
+		t = feed(detector, temperature, 60)
+
+		self.assertNotEqual(t, None)
+		self.assertTrue(t > 2.0 * math.log(30.0) + 3.0)  # within 1 C from t = 6.8 s, then a full window
+		mean, slope, std = detector.statistics()
+		self.assertTrue(abs(mean) <= 1.0 and abs(slope) <= 0.05 and std <= 0.1)
+		self.assertTrue(detector.latency() >= 3.0)
+
+	def test_statistics(self):
+		detector = Steady_state(50.0, 1.0, 10.0, 1.0, 1.0)
+		for i in range(11):
+			detector.add(100.0 + i, 50.0 + 0.02 * i)  # large time stamps, relative sums
+		mean, slope, std = detector.statistics()
+		self.assertAlmostEqual(mean, 0.1, places=9)
+		self.assertAlmostEqual(slope, 0.02, places=9)
+		self.assertAlmostEqual(std, 0.02 * math.sqrt(10.0), places=9)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,106 @@
+import os
+import time
+import errno
+import socket
+import shutil
+import tempfile
+import unittest
+
+import support
+
+from telemetry import Telemetry, Device_telemetry, Subscriber, Null_telemetry
+
+class Failing_server:
+	"Listening socket stand-in whose accept always fails"
+
+	def __init__(self):
+		self.accepts = 0
+
+	def accept(self):
+		self.accepts += 1
+		raise socket.error(errno.EBADF, 'Bad file descriptor')
+
+	def shutdown(self, how):
+		pass
+
+	def close(self):
+		pass
+
+class Telemetry_test(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'telemetry.sock')
+		self.logger = support.Null_logger()
+		self.telemetry = Telemetry(self.path, self.logger)
+
+	def tearDown(self):
+		self.telemetry.close()
+		shutil.rmtree(self.directory)
+
+	def subscribe(self, count=1):
+		"Returns subscribers once the publisher accepted all of them"
+
+		subscribers = [Subscriber(self.path) for i in range(count)]
+		deadline = time.time() + 5
+		while len(self.telemetry.subscribers) < count and time.time() < deadline:
+			time.sleep(0.005)
+		return subscribers
+
+	def test_samples_and_events(self):
+		self.telemetry.start()
+		first, second = self.subscribe(2)
+
+		self.telemetry.sample((100.0, 95.0, 60.25, 58.5))
+		self.telemetry.event(101.5, 3, 'steady_state', '95.00')
+		Device_telemetry(self.telemetry, 'chip2').sample((102.0, 95.0, 61.0, 59.0))
+		self.telemetry.close()
+
+		expected = [('S', 100.0, 95.0, 60.25, 58.5, None), ('E', 101.5, 3, 'steady_state', '95.00', None),
+			    ('S', 102.0, 95.0, 61.0, 59.0, 'chip2')]
+		self.assertEqual(list(first), expected)
+		self.assertEqual(list(second), expected)
+		self.assertFalse(os.path.exists(self.path))
+
+	def test_slow_subscriber_dropped(self):
+		self.telemetry.start()
+		slow, = self.subscribe()
+
+		for i in range(100000):  # never read, its socket buffer fills up
+			self.telemetry.sample((i, 95.0, 60.0, 58.0))
+			if not self.telemetry.subscribers:
+				break
+
+		self.assertEqual(self.telemetry.dropped, 1)
+		self.assertEqual(self.telemetry.subscribers, [])
+
+	def test_second_publisher_refused(self):
+		self.telemetry.start()
+		self.assertRaises(socket.error, Telemetry, self.path)
+
+	def test_close_stops_accept_loop(self):
+		self.telemetry.start()
+		self.telemetry.close()
+		self.telemetry.join(5)
+		self.assertFalse(self.telemetry.is_alive())
+
+	def test_accept_error_backs_off(self):
+		self.telemetry.server.close()
+		self.telemetry.server = Failing_server()
+		self.telemetry.start()
+		time.sleep(0.2)
+		self.telemetry.close()
+		self.telemetry.join(5)
+
+		self.assertFalse(self.telemetry.is_alive())
+		self.assertTrue(self.telemetry.server.accepts < 10)  # no busy loop
+		self.assertTrue(len(self.logger.messages('Telemetry accept failed')) > 0)
+
+	def test_null_telemetry(self):
+		telemetry = Null_telemetry()
+		telemetry.sample((0, 0, 0, 0))
+		telemetry.event(0, 0, 'start')
+		self.assertFalse(telemetry.active)
+
+if __name__ == '__main__':
+	unittest.main()